@@ -0,0 +1,132 @@
+"""
+Constraint-family ablation for one payload.
+
+Builds and solves the payload once with every rule (baseline), then once per constraint
+family with that family left out (timetable_engine.CONSTRAINT_FAMILIES), each variant in
+its own process with the same time budget, and reports the change in build time, solve
+time, feasibility and objective against the baseline. A family whose removal makes the
+solve much faster is the first candidate for a reformulation.
+
+    python benchmarks/ablation.py payload.json [--time-limit 30] [--processes 4] [--threads 1]
+                                               [--families facultyBreak,gaps] [--json]
+
+Solves use the weighted objective. Variants run concurrently, so keep
+processes x threads within the cores of the machine or the timings interfere.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ortools.sat.python import cp_model
+
+from timetable_engine import CONSTRAINT_FAMILIES, build_model
+
+# A rule whose family is not active for the payload (e.g. gaps with gapPriority 0)
+# can't change anything when left out.
+_SETTING_FAMILIES = {'gaps': lambda s: s.get('gapPriority', 0.0) > 0, 'fairWorkload': lambda s: s.get('fairWorkload', False)}
+
+
+def run_variant(data, disabled, time_limit, threads):
+    """Builds and solves data without the disabled families. Returns a result dict."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        tm = build_model(data, [], disabled=disabled)
+        build = time.perf_counter() - start
+    result = {'disabled': list(disabled), 'buildSeconds': round(build, 3)}
+    if tm.contradiction:
+        result.update({'status': 'INFEASIBLE (presolve)', 'solveSeconds': 0.0, 'objective': None})
+        return result
+
+    proto = tm.model.Proto()
+    result['variables'] = len(proto.variables)
+    result['constraints'] = len(proto.constraints)
+    objectives = [term for terms in tm.objective_tiers.values() for term in terms]
+    if objectives:
+        tm.model.Minimize(sum(objectives))
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = threads
+    status = solver.Solve(tm.model)
+    result['status'] = solver.StatusName(status)
+    result['solveSeconds'] = round(solver.WallTime(), 3)
+    feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    result['objective'] = int(round(solver.ObjectiveValue())) if feasible and objectives else (0 if feasible else None)
+    result['bound'] = int(round(solver.BestObjectiveBound())) if feasible and objectives else None
+    return result
+
+
+def ablate(data, families=CONSTRAINT_FAMILIES, time_limit=30.0, processes=None, threads=1):
+    """Runs the baseline and one variant per family. Returns (baseline, [variant results])."""
+    settings = data.get('settings', {})
+    active = [f for f in families if f not in _SETTING_FAMILIES or _SETTING_FAMILIES[f](settings)]
+    variants = [()] + [(family,) for family in active]
+    processes = processes or max(1, min(len(variants), (os.cpu_count() or 1) // max(1, threads)))
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(run_variant, data, disabled, time_limit, threads) for disabled in variants]
+        results = [future.result() for future in futures]
+    baseline, rest = results[0], results[1:]
+    for family in families:
+        if family not in active:
+            rest.append({'disabled': [family], 'status': 'inactive for this payload'})
+    for result in rest:
+        if 'buildSeconds' in result:
+            result['deltaBuildSeconds'] = round(result['buildSeconds'] - baseline['buildSeconds'], 3)
+            result['deltaSolveSeconds'] = round(result['solveSeconds'] - baseline['solveSeconds'], 3)
+            if result['objective'] is not None and baseline['objective'] is not None:
+                result['deltaObjective'] = result['objective'] - baseline['objective']
+    return baseline, rest
+
+
+def _cell(value, width, fmt=''):
+    return f"{'-' if value is None else format(value, fmt):>{width}}"
+
+
+def print_report(baseline, variants):
+    header = f"{'without':<15} {'status':<22} {'build s':>8} {'Δ':>7} {'solve s':>8} {'Δ':>7} {'objective':>9} {'Δ':>7} {'vars':>8}"
+    print(header)
+    print('-' * len(header))
+    for result in [baseline] + variants:
+        name = result['disabled'][0] if result['disabled'] else '(baseline)'
+        if 'buildSeconds' not in result:
+            print(f"{name:<15} {result['status']}")
+            continue
+        print(f"{name:<15} {result['status']:<22} {_cell(result['buildSeconds'], 8, '.2f')} "
+              f"{_cell(result.get('deltaBuildSeconds'), 7, '+.2f')} {_cell(result['solveSeconds'], 8, '.2f')} "
+              f"{_cell(result.get('deltaSolveSeconds'), 7, '+.2f')} {_cell(result['objective'], 9)} "
+              f"{_cell(result.get('deltaObjective'), 7, '+')} {_cell(result.get('variables'), 8)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('payload', help='JSON file with a /generate-timetable payload')
+    parser.add_argument('--time-limit', type=float, default=30.0, help='solve budget per variant in seconds')
+    parser.add_argument('--processes', type=int, default=None, help='variants solved at once')
+    parser.add_argument('--threads', type=int, default=1, help='CP-SAT workers per solve')
+    parser.add_argument('--families', default=','.join(CONSTRAINT_FAMILIES), help='comma separated families to ablate')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    with open(args.payload) as f:
+        data = json.load(f)
+    families = [family for family in args.families.split(',') if family]
+    unknown = set(families) - set(CONSTRAINT_FAMILIES)
+    if unknown:
+        parser.error(f"unknown families: {', '.join(sorted(unknown))} (choose from {', '.join(CONSTRAINT_FAMILIES)})")
+
+    baseline, variants = ablate(data, families, args.time_limit, args.processes, args.threads)
+    if args.json:
+        print(json.dumps({'baseline': baseline, 'variants': variants}, indent=2))
+    else:
+        print_report(baseline, variants)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Model-build benchmark for the faculty-break constraint.
+
+Builds synthetic department payloads of increasing size and compares the current
+indicator formulation (timetable_engine.add_faculty_break) with the original loop, which
+scanned every task and room for each instructor slot pair and looked each placement up in
+the list of paired lab tasks. Both post on the same model; the original loop gets the
+name-keyed assign dict it used to read from, built outside the timing.
+
+    python benchmarks/faculty_break.py [--sizes 10,20,40] [--seed 1]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from timetable_engine import add_faculty_break, build_model
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
+TIMESLOTS = ['08:30 AM - 09:30 AM', '09:30 AM - 10:30 AM', '10:30 AM - 11:30 AM', '11:30 AM - 12:30 PM',
+             '01:30 PM - 02:30 PM', '02:30 PM - 03:30 PM', '03:30 PM - 04:30 PM', '04:30 PM - 05:30 PM']
+
+
+def department(n_groups, seed, instructors_per_group=1):
+    """
+    Payload with n_groups groups of 6 courses; instructors, courses and rooms scale with it.
+    With one instructor per group the teaching load is usually infeasible, which is fine for
+    build benchmarks; solve benchmarks want instructors_per_group=3.
+    """
+    rng = random.Random(seed)
+    n_instructors, n_courses = instructors_per_group * n_groups, max(6, 3 * n_groups // 4)
+    instructors = [{'id': f'I{i}', 'name': f'Instructor {i}',
+                    'availability': {d: [rng.choice([1, 1, 1, 0]) for _ in TIMESLOTS] for d in DAYS}}
+                   for i in range(n_instructors)]
+    courses = [{'id': f'C{c}', 'name': f'Course {c}', 'lectureHours': 3, 'labHours': 2 if c % 2 == 0 else 0,
+                'qualifiedInstructors': rng.sample([inst['id'] for inst in instructors], 3)}
+               for c in range(n_courses)]
+    rooms = ([{'id': f'R{r}', 'capacity': 70, 'type': 'Classroom'} for r in range(max(2, n_groups // 2))] +
+             [{'id': f'L{r}', 'capacity': 70, 'type': 'Computer Lab'} for r in range(n_groups // 4 + 1)])
+    groups = [{'id': f'G{g}', 'size': 60, 'enrolledCourses': rng.sample([c['id'] for c in courses], 6),
+               'availability': {d: [1] * len(TIMESLOTS) for d in DAYS}}
+              for g in range(n_groups)]
+    return {'days': DAYS, 'timeslots': TIMESLOTS, 'rooms': rooms, 'instructors': instructors,
+            'courses': courses, 'student_groups': groups, 'settings': {}}
+
+
+def assign_by_name(tm):
+    """{(task_id, inst_id, room_id, day, timeslot): literal}, the layout the original loop read from."""
+    assign = {}
+    for k, task_id in enumerate(tm.task_ids):
+        for v in range(tm.task_start[k], tm.task_start[k + 1]):
+            assign[(task_id, tm.inst_ids[tm.var_inst[v]], tm.room_ids[tm.var_room[v]],
+                    tm.all_days[tm.var_day[v]], tm.all_timeslots[tm.var_slot[v]])] = tm.var_lit[v]
+    return assign
+
+
+def baseline_faculty_break(tm, assign):
+    """The original formulation: a scan over tasks x rooms per instructor slot pair."""
+    model, tasks = tm.model, tm.tasks
+    paired_lab_tasks = set()
+    for k, first in enumerate(tm.task_pair_first):
+        if first >= 0:
+            paired_lab_tasks.add((tm.task_ids[first], tm.task_ids[k]))
+    count = 0
+    for inst_id in tm.all_instructors:
+        for day in tm.all_days:
+            for t_idx in range(len(tm.all_timeslots) - 1):
+                t1 = tm.all_timeslots[t_idx]
+                t2 = tm.all_timeslots[t_idx + 1]
+                if tm.ts_gaps[t_idx] >= 60:
+                    continue
+                assigns_t1 = []
+                assigns_t2 = []
+                paired_lab_start_vars = []
+                for task_id in tasks:
+                    for room_id in tm.all_rooms:
+                        if (task_id, inst_id, room_id, day, t1) in assign:
+                            var_t1 = assign[(task_id, inst_id, room_id, day, t1)]
+                            assigns_t1.append(var_t1)
+                            if any(pt1 == task_id for pt1, _ in paired_lab_tasks):
+                                paired_lab_start_vars.append(var_t1)
+                        if (task_id, inst_id, room_id, day, t2) in assign:
+                            assigns_t2.append(assign[(task_id, inst_id, room_id, day, t2)])
+                if assigns_t1 and assigns_t2:
+                    model.Add(sum(assigns_t1) + sum(assigns_t2) <= 1 + sum(paired_lab_start_vars))
+                    count += 1
+    return count
+
+
+def linear_terms(model, first):
+    return sum(len(c.linear.vars) for c in model.Proto().constraints[first:])
+
+
+def measure(post, tm):
+    """Posts one formulation on a fresh occupancy cache; returns (seconds, constraints, linear terms)."""
+    tm.inst_occupancy.indicators.clear()
+    tm.lab_start_occupancy.indicators.clear()
+    first = len(tm.model.Proto().constraints)
+    start = time.perf_counter()
+    count = post(tm)
+    seconds = time.perf_counter() - start
+    return seconds, count, linear_terms(tm.model, first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,20,40', help='comma separated student group counts')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'groups':>6} {'vars':>9} {'build s':>8} | {'baseline s':>10} {'terms':>9} | {'current s':>9} {'terms':>9} {'speedup':>7}")
+    for n_groups in (int(size) for size in args.sizes.split(',')):
+        data = department(n_groups, args.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            tm = build_model(data, [])
+            build = time.perf_counter() - start
+        if tm.contradiction:
+            print(f"{n_groups:>6} infeasible payload: {tm.contradiction}")
+            continue
+        assign = assign_by_name(tm)
+        baseline = measure(lambda tm: baseline_faculty_break(tm, assign), tm)
+        current = measure(add_faculty_break, tm)
+        print(f"{n_groups:>6} {len(tm.decision_vars):>9} {build:>8.2f} | {baseline[0]:>10.3f} {baseline[2]:>9} | "
+              f"{current[0]:>9.3f} {current[2]:>9} {baseline[0] / max(current[0], 1e-9):>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
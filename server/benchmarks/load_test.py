@@ -0,0 +1,239 @@
+"""
+Load test for POST /generate-timetable.
+
+Drives the endpoint with a weighted mix of payloads at one or more concurrency levels
+(closed loop: each client sends its next request when the previous one returns) and
+reports, per level, latency percentiles, throughput, error/rejection rates and the CPU
+utilisation of the machine over the run.
+
+    python benchmarks/load_test.py [--url http://127.0.0.1:8000] [--mix 2:3,6:1]
+                                   [--concurrency 1,2,4,8] [--requests 40] [--tenants 4] [--json]
+
+Without --url the app is driven in-process through the Flask test client, with the same
+scheduler and solver worker pool a gunicorn worker would have. With --url it targets a
+running server, e.g. `gunicorn app:app --worker-class gthread --workers 2 --threads 8`,
+so worker counts and queue settings can be compared run by run.
+
+--mix is a comma separated list of SPEC[:WEIGHT]. SPEC is either a number of student
+groups (a synthetic department from benchmarks/faculty_break.py) or the path of a JSON
+payload. Synthetic payloads come in --variants seeds each, so the model cache sees
+both hits and misses. Requests are spread over --tenants institutions (X-Institution-Id).
+
+CPU utilisation is the busy share of all cores from /proc/stat, so it includes the
+solver worker processes; it is omitted where /proc/stat is unavailable.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from faculty_break import department
+
+
+def load_mix(spec, variants, seed):
+    """[(label, [payload, ...], weight)] from a --mix string."""
+    mix = []
+    for item in filter(None, spec.split(',')):
+        name, _, weight = item.partition(':')
+        weight = float(weight) if weight else 1.0
+        if name.isdigit():
+            payloads = [department(int(name), seed + v, instructors_per_group=3) for v in range(variants)]
+            label = f"{name} groups"
+        else:
+            with open(name) as f:
+                payloads = [json.load(f)]
+            label = os.path.basename(name)
+        mix.append((label, payloads, weight))
+    return mix
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list, None when empty."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def cpu_times():
+    """(busy, total) jiffies of all cores from /proc/stat, or None."""
+    try:
+        with open('/proc/stat') as f:
+            fields = [int(x) for x in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    return sum(fields) - idle, sum(fields)
+
+
+class HttpTarget:
+    def __init__(self, url, timeout):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, payload, tenant, endpoint='/generate-timetable'):
+        """(HTTP status, decoded JSON body or None)."""
+        request = urllib.request.Request(self.url + endpoint, data=json.dumps(payload).encode('utf-8'), method='POST',
+                                         headers={'Content-Type': 'application/json', 'X-Institution-Id': tenant})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, _decode(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, _decode(e.read())
+
+
+class InProcessTarget:
+    def __init__(self):
+        from app import app
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, payload, tenant, endpoint='/generate-timetable'):
+        """(HTTP status, decoded JSON body or None)."""
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.post(endpoint, json=payload, headers={'X-Institution-Id': tenant})
+        return response.status_code, response.get_json(silent=True)
+
+
+def _decode(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Points file descriptor 1 at /dev/null, so the engine's DEBUG prints (also those of the
+    solver worker processes, which inherit it) don't bury the report."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def run_level(target, mix, concurrency, n_requests, tenants, seed):
+    """Sends n_requests from concurrency clients. Returns the stats of the run."""
+    rng = random.Random(seed)
+    weights = [weight for _, _, weight in mix]
+    plan = []
+    for i in range(n_requests):
+        label, payloads, _ = rng.choices(mix, weights)[0]
+        plan.append((label, rng.choice(payloads), f"tenant-{i % tenants}"))
+
+    samples = []  # (label, latency seconds, status or exception name)
+    lock = threading.Lock()
+    next_index = iter(range(n_requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                return
+            label, payload, tenant = plan[i]
+            start = time.perf_counter()
+            try:
+                outcome, _ = target.post(payload, tenant)
+            except Exception as e:
+                outcome = type(e).__name__
+            latency = time.perf_counter() - start
+            with lock:
+                samples.append((label, latency, outcome))
+
+    cpu_before = cpu_times()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cpu_after = cpu_times()
+
+    outcomes = Counter(outcome for _, _, outcome in samples)
+    ok = [latency for _, latency, outcome in samples if outcome == 200]
+    ok.sort()
+    stats = {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'seconds': round(elapsed, 2),
+        'throughput': round(len(ok) / elapsed, 3) if elapsed else None,
+        'errorRate': round(sum(n for o, n in outcomes.items() if o not in (200, 429)) / len(samples), 3),
+        'rejectedRate': round(outcomes.get(429, 0) / len(samples), 3),
+        'outcomes': {str(o): n for o, n in sorted(outcomes.items(), key=lambda item: str(item[0]))},
+        'latency': {f'p{q}': round(percentile(ok, q), 3) if ok else None for q in (50, 95, 99)},
+        'latencyByPayload': {},
+    }
+    for label, _, _ in mix:
+        own = sorted(latency for l, latency, outcome in samples if l == label and outcome == 200)
+        if own:
+            stats['latencyByPayload'][label] = {'count': len(own), 'p50': round(percentile(own, 50), 3),
+                                                'p95': round(percentile(own, 95), 3)}
+    if cpu_before and cpu_after and cpu_after[1] > cpu_before[1]:
+        stats['cpuPercent'] = round(100 * (cpu_after[0] - cpu_before[0]) / (cpu_after[1] - cpu_before[1]), 1)
+    return stats
+
+
+def print_report(results):
+    header = f"{'conc':>4} {'reqs':>5} {'ok/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'err %':>6} {'429 %':>6} {'cpu %':>6}"
+    print(header)
+    print('-' * len(header))
+    fmt = lambda value, spec: '-' if value is None else format(value, spec)
+    for r in results:
+        print(f"{r['concurrency']:>4} {r['requests']:>5} {fmt(r['throughput'], '.2f'):>7} "
+              f"{fmt(r['latency']['p50'], '.2f'):>7} {fmt(r['latency']['p95'], '.2f'):>7} "
+              f"{fmt(r['latency']['p99'], '.2f'):>7} {100 * r['errorRate']:>6.1f} {100 * r['rejectedRate']:>6.1f} "
+              f"{fmt(r.get('cpuPercent'), '.1f'):>6}")
+    for r in results:
+        others = {o: n for o, n in r['outcomes'].items() if o != '200'}
+        if others:
+            print(f"concurrency {r['concurrency']}: non-200 outcomes {others}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server; in-process when omitted')
+    parser.add_argument('--mix', default='2:3,6:1', help='payload mix, SPEC[:WEIGHT],...')
+    parser.add_argument('--concurrency', default='1,2,4,8', help='comma separated client counts')
+    parser.add_argument('--requests', type=int, default=40, help='requests per concurrency level')
+    parser.add_argument('--tenants', type=int, default=4, help='institutions the requests are spread over')
+    parser.add_argument('--variants', type=int, default=4, help='seeds per synthetic payload size')
+    parser.add_argument('--timeout', type=float, default=600.0, help='HTTP timeout per request in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    mix = load_mix(args.mix, args.variants, args.seed)
+    if not mix:
+        parser.error('--mix is empty')
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+    with contextlib.nullcontext() if args.url else quiet_stdout():
+        target = HttpTarget(args.url, args.timeout) if args.url else InProcessTarget()
+        results = [run_level(target, mix, c, args.requests, max(1, args.tenants), args.seed) for c in levels]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == '__main__':
+    main()
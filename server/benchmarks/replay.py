@@ -0,0 +1,149 @@
+"""
+Replays captured traffic against a server build and diffs statuses and timings.
+
+The archive is what the server writes with TIMELY_CAPTURE_DIR set (traffic_capture.py):
+JSONL files of anonymised solve requests with the status, result and seconds they got
+in production. Each request is sent again, one at a time, and compared.
+
+    python benchmarks/replay.py ARCHIVE [ARCHIVE ...] [--url http://127.0.0.1:8000]
+                                [--endpoint /generate-timetable] [--limit 100]
+                                [--slower 1.5] [--min-seconds 1] [--json]
+
+ARCHIVE is a capture file or a directory of them. Without --url the build in this
+checkout is run in-process. A request counts as a timing change when it is --slower
+times slower (or faster) than captured and either run took at least --min-seconds.
+Captured seconds exclude queue wait and replays run one at a time, so the two compare,
+as long as the replay machine is like the one that captured. The exit status is 1
+when any status changed or any request got slower, so it can gate a release.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import HttpTarget, InProcessTarget, quiet_stdout
+
+
+def read_archive(paths):
+    """Captured entries of the given files and directories, oldest file first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.jsonl')))
+        else:
+            files.append(path)
+    entries = []
+    for path in files:
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable line {number} of {path}", file=sys.stderr)
+                    continue
+                entry['source'] = f"{os.path.basename(path)}:{number}"
+                entries.append(entry)
+    return entries
+
+
+def replay(target, entries, slower=1.5, min_seconds=1.0):
+    """Sends every entry again. Returns one comparison dict per entry."""
+    results = []
+    for entry in entries:
+        start = time.perf_counter()
+        try:
+            status_code, body = target.post(entry['payload'], 'replay', entry['endpoint'])
+        except Exception as e:
+            status_code, body = type(e).__name__, None
+        seconds = time.perf_counter() - start
+        result = {
+            'source': entry['source'],
+            'endpoint': entry['endpoint'],
+            'status': [entry['status'], status_code],
+            'resultStatus': [entry.get('resultStatus'), body.get('status') if isinstance(body, dict) else None],
+            'sessions': [entry.get('sessions'), len(body['schedule']) if isinstance(body, dict) and isinstance(body.get('schedule'), list) else None],
+            'seconds': [entry['seconds'], round(seconds, 3)],
+        }
+        result['statusChanged'] = result['status'][0] != result['status'][1] or result['resultStatus'][0] != result['resultStatus'][1]
+        ratio = seconds / entry['seconds'] if entry['seconds'] > 0 else None
+        result['ratio'] = round(ratio, 3) if ratio else None
+        significant = ratio and max(seconds, entry['seconds']) >= min_seconds
+        result['timing'] = ('slower' if significant and ratio >= slower else
+                            'faster' if significant and ratio <= 1 / slower else 'same')
+        results.append(result)
+    return results
+
+
+def summarize(results):
+    ratios = [r['ratio'] for r in results if r['ratio']]
+    return {
+        'requests': len(results),
+        'statusChanged': sum(r['statusChanged'] for r in results),
+        'slower': sum(r['timing'] == 'slower' for r in results),
+        'faster': sum(r['timing'] == 'faster' for r in results),
+        'capturedSeconds': round(sum(r['seconds'][0] for r in results), 2),
+        'replaySeconds': round(sum(r['seconds'][1] for r in results), 2),
+        # Geometric mean, so one pathological request doesn't dominate.
+        'meanRatio': round(math.exp(sum(math.log(r) for r in ratios) / len(ratios)), 3) if ratios else None,
+    }
+
+
+def print_report(results, summary):
+    changed = [r for r in results if r['statusChanged'] or r['timing'] != 'same']
+    if changed:
+        header = f"{'request':<36} {'status':>11} {'result':>17} {'sessions':>11} {'seconds':>15} {'ratio':>6}"
+        print(header)
+        print('-' * len(header))
+        for r in changed:
+            print(f"{r['source']:<36} {'%s->%s' % tuple(r['status']):>11} {'%s->%s' % tuple(r['resultStatus']):>17} "
+                  f"{'%s->%s' % tuple(r['sessions']):>11} {'%.2f->%.2f' % tuple(r['seconds']):>15} "
+                  f"{'-' if r['ratio'] is None else format(r['ratio'], '.2f'):>6}")
+        print()
+    print(f"{summary['requests']} requests replayed: {summary['statusChanged']} status changes, "
+          f"{summary['slower']} slower, {summary['faster']} faster; "
+          f"{summary['capturedSeconds']}s captured vs {summary['replaySeconds']}s replayed "
+          f"(geometric mean ratio {summary['meanRatio']}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archive', nargs='+', help='capture files or directories')
+    parser.add_argument('--url', help='base URL of the server build to test; in-process when omitted')
+    parser.add_argument('--endpoint', help='only replay requests to this endpoint')
+    parser.add_argument('--limit', type=int, help='replay at most this many requests (the most recent)')
+    parser.add_argument('--slower', type=float, default=1.5, help='ratio that counts as a timing change')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='ignore timing changes of quicker requests')
+    parser.add_argument('--timeout', type=float, default=600.0, help='HTTP timeout per request in seconds')
+    parser.add_argument('--json', action='store_true', help='print every comparison as JSON')
+    args = parser.parse_args()
+
+    entries = read_archive(args.archive)
+    if args.endpoint:
+        entries = [entry for entry in entries if entry.get('endpoint') == args.endpoint]
+    if args.limit:
+        entries = entries[-args.limit:]
+    if not entries:
+        parser.error('no captured requests to replay')
+
+    with contextlib.nullcontext() if args.url else quiet_stdout():
+        target = HttpTarget(args.url, args.timeout) if args.url else InProcessTarget()
+        results = replay(target, entries, args.slower, args.min_seconds)
+    summary = summarize(results)
+    if args.json:
+        print(json.dumps({'summary': summary, 'requests': results}, indent=2))
+    else:
+        print_report(results, summary)
+    sys.exit(1 if summary['statusChanged'] or summary['slower'] else 0)
+
+
+if __name__ == '__main__':
+    main()
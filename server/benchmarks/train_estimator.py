@@ -0,0 +1,98 @@
+"""
+Trains the solve-time and infeasibility-risk predictor behind /estimate from recorded solves.
+
+The history is what the server writes with TIMELY_CAPTURE_DIR set (traffic_capture.py):
+every captured /generate-timetable request that passes pre-validation becomes one sample
+of its instance features, its solve seconds and whether it got a schedule.
+
+    python benchmarks/train_estimator.py ARCHIVE [ARCHIVE ...] --out estimator.json
+                                         [--folds 5] [--json]
+
+ARCHIVE is a capture file or a directory of them. Before fitting on everything, the
+samples are split into --folds parts and each part is predicted by a model trained on the
+others, so the report shows how far off predictions are on solves the model has not seen.
+Point TIMELY_ESTIMATOR_MODEL at the written file to use it.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import quiet_stdout
+from replay import read_archive
+from solve_estimator import SolveEstimator, instance_features
+from timetable_engine import validate_timetable
+
+
+def history_samples(entries):
+    """(features, seconds, found_schedule) of every captured solve that passed pre-validation."""
+    samples = []
+    for entry in entries:
+        if entry.get('endpoint') != '/generate-timetable' or not isinstance(entry.get('payload'), dict):
+            continue
+        try:
+            if validate_timetable(entry['payload'], []):
+                continue
+            features = instance_features(entry['payload'])
+        except Exception as e:
+            print(f"Skipping {entry['source']}: {e}", file=sys.stderr)
+            continue
+        samples.append((features, entry['seconds'], entry['status'] == 200 and entry.get('resultStatus') == 'success'))
+    return samples
+
+
+def cross_validate(samples, folds):
+    """Held-out errors: median and 90th percentile of |log(predicted / actual seconds)|, and the risk's Brier score."""
+    folds = max(2, min(folds, len(samples)))
+    errors, brier = [], []
+    for fold in range(folds):
+        test = samples[fold::folds]
+        train = [sample for i, sample in enumerate(samples) if i % folds != fold]
+        estimator = SolveEstimator.train(train)
+        for features, seconds, found in test:
+            estimate = estimator.estimate(features)
+            errors.append(abs(math.log(max(0.05, estimate['seconds']) / max(0.05, seconds))))
+            brier.append((estimate['infeasibilityRisk'] - (0.0 if found else 1.0)) ** 2)
+    errors.sort()
+    return {
+        'folds': folds,
+        'medianFactor': round(math.exp(errors[len(errors) // 2]), 2),
+        'p90Factor': round(math.exp(errors[min(len(errors) - 1, int(0.9 * len(errors)))]), 2),
+        'riskBrier': round(sum(brier) / len(brier), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archive', nargs='+', help='capture files or directories')
+    parser.add_argument('--out', required=True, help='where to write the trained model (JSON)')
+    parser.add_argument('--folds', type=int, default=5, help='cross-validation folds for the report')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    with quiet_stdout():
+        samples = history_samples(read_archive(args.archive))
+    if len(samples) < 4:
+        parser.error(f'need at least 4 captured solves that pass validation, found {len(samples)}')
+
+    report = {'samples': len(samples), 'withoutSchedule': sum(not found for _, _, found in samples),
+              'heldOut': cross_validate(samples, args.folds)}
+    estimator = SolveEstimator.train(samples)
+    estimator.save(args.out)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        held_out = report['heldOut']
+        print(f"{report['samples']} solves ({report['withoutSchedule']} without a schedule). "
+              f"Held out over {held_out['folds']} folds: predictions within x{held_out['medianFactor']} of the "
+              f"actual time for half the solves, x{held_out['p90Factor']} for 90%; risk Brier score "
+              f"{held_out['riskBrier']}.")
+        print(f"Wrote {args.out}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ortools.sat.python import cp_model
+
+from timetable_engine import (SOLVER_THREADS, _to_int, build_and_solve, build_tasks, crash_response,
+                              infeasibility_message, is_lab_room, is_valid_lab_room, make_logger, unpack_payload)
+
+# settings.solveStrategy == 'day' (see solver_pool.SOLVE_STRATEGIES):
+#   1. a small counting model distributes every group's sessions over the days, respecting
+#      per-day availability, one lecture per course per day, one lab course per day and
+#      per-day instructor, group and room capacity, and balancing the daily load;
+#   2. every day is then solved as its own placement model, in parallel;
+#   3. a day that cannot be solved is excluded from the next distribution (a no-good cut)
+#      and only the days whose sessions changed are solved again.
+# Objectives are optimised within each day model, so fairWorkload balances instructor hours
+# per day, not across the week.
+# After decompositionMaxRounds rounds the full weekly model is solved instead.
+DEFAULT_MAX_ROUNDS = 8
+
+# Budget of one distribution solve: this share of the time left, at most MASTER_MAX_SECONDS.
+MASTER_TIME_SHARE = 0.1
+MASTER_MAX_SECONDS = 10.0
+
+# Settings that only make sense for the weekly model.
+WEEKLY_ONLY_SETTINGS = ('solveStrategy', 'alternatives', 'alternativesMinDistance')
+
+
+def session_units(tasks):
+    """
+    Sessions that are placed on a day as a whole: every lecture hour on its own, and each
+    2-hour lab block (lab_{2j}, lab_{2j+1}) together, as build_hard_model pairs them.
+    Returns [(group_id, course_id, type, [task_id, ...])] in task order.
+    """
+    units = []
+    for task_id, task_info in tasks.items():
+        if task_info['type'] == 'lab':
+            prefix, index = task_id.rsplit('_', 1)
+            if int(index) % 2 == 1 and f'{prefix}_{int(index) - 1}' in tasks:
+                continue  # second hour, placed with the first
+            second_id = f'{prefix}_{int(index) + 1}'
+            ids = [task_id, second_id] if int(index) % 2 == 0 and second_id in tasks else [task_id]
+        else:
+            ids = [task_id]
+        units.append((task_info['group_id'], task_info['course_id'], task_info['type'], ids))
+    return units
+
+
+def available_slots(entity, day, n_slots):
+    """Per-slot availability of an instructor, room or group on day (missing entries are available)."""
+    slots = (entity.get('availability') or {}).get(day) or []
+    return [not (s < len(slots) and slots[s] == 0) for s in range(n_slots)]
+
+
+def teaching_capacity(available, ts_gaps):
+    """
+    Most hours an instructor can teach in a day under the faculty break: within a run of
+    back-to-back available slots, classes come in blocks of at most two hours (a lab)
+    separated by a free slot, so a run of L slots holds at most 2(L+1)//3 hours.
+    """
+    hours, run = 0, 0
+    for s, free in enumerate(available):
+        if free:
+            run += 1
+        if not free or s == len(available) - 1 or ts_gaps[s] >= 60:
+            hours += 2 * (run + 1) // 3 if run else 0
+            run = 0
+    return hours
+
+
+class DayDistribution:
+    """Counting model choosing the day of every session unit, with no-good cuts for failed days."""
+
+    def __init__(self, data, units):
+        (all_instructors, all_courses, all_rooms, all_student_groups,
+         all_days, all_timeslots, settings, ts_parsed, ts_gaps) = unpack_payload(data)
+        n_slots = len(all_timeslots)
+        self.model = cp_model.CpModel()
+        self.units = units
+        self.n_days = len(all_days)
+        model = self.model
+
+        # Day availability of every entity, and the unit's instructor candidates.
+        group_av = {g: [available_slots(group, day, n_slots) for day in all_days] for g, group in all_student_groups.items()}
+        inst_av = {i: [available_slots(inst, day, n_slots) for day in all_days] for i, inst in all_instructors.items()}
+        afternoon = [ts_parsed[s][0] >= 720 for s in range(n_slots)]
+
+        def targets(g, c):
+            # As build_hard_model: a group's preference replaces the qualified instructors, unknown ids drop out.
+            preferred = all_student_groups[g].get('instructorPreferences', {}).get(c)
+            return [i for i in ([preferred] if preferred else all_courses[c].get('qualifiedInstructors', [])) if i in inst_av]
+
+        # Units without a target instructor are left unscheduled, as build_hard_model leaves their tasks.
+        self.assign = []  # per unit: {d: BoolVar}, empty when unscheduled
+        for g, c, kind, ids in units:
+            hours = len(ids)
+            afternoon_only = kind == 'lab' and all_student_groups[g].get('labTimingPreferences', {}).get(c) == 'Afternoon'
+            days = {}
+            for d in range(self.n_days):
+                possible = False
+                for i in targets(g, c):
+                    for s in range(n_slots - hours + 1):
+                        if afternoon_only and not afternoon[s]:
+                            continue
+                        if hours == 2 and ts_gaps[s] != 0:
+                            continue
+                        if all(group_av[g][d][s + h] and inst_av[i][d][s + h] for h in range(hours)):
+                            possible = True
+                            break
+                    if possible:
+                        break
+                if possible:
+                    days[d] = model.NewBoolVar('')
+            self.assign.append(days)
+            if targets(g, c):
+                model.AddExactlyOne(days.values())
+
+        def hours_on(unit_indices, d):
+            return [(self.assign[u][d], len(units[u][3])) for u in unit_indices if d in self.assign[u]]
+
+        by_group, by_group_course, lab_courses, by_targets = {}, {}, {}, {}
+        for u, (g, c, kind, ids) in enumerate(units):
+            by_group.setdefault(g, []).append(u)
+            by_group_course.setdefault((g, c, kind), []).append(u)
+            if kind == 'lab':
+                lab_courses.setdefault(g, set()).add(c)
+            by_targets.setdefault(frozenset(targets(g, c)), []).append(u)
+
+        # One lecture per course per day; one lab course per day.
+        for (g, c, kind), us in by_group_course.items():
+            if kind == 'lecture' and len(us) > 1:
+                for d in range(self.n_days):
+                    model.Add(sum(var for var, _ in hours_on(us, d)) <= 1)
+        for g, courses in lab_courses.items():
+            if len(courses) < 2:
+                continue
+            for d in range(self.n_days):
+                active = []
+                for c in courses:
+                    placed = [var for var, _ in hours_on(by_group_course[(g, c, 'lab')], d)]
+                    if placed:
+                        is_active = model.NewBoolVar('')
+                        for var in placed:
+                            model.AddImplication(var, is_active)
+                        active.append(is_active)
+                if len(active) > 1:
+                    model.Add(sum(active) <= 1)
+
+        # Daily capacity of every group, of every set of interchangeable instructors and of the rooms.
+        self.load = {}
+        for g, us in by_group.items():
+            for d in range(self.n_days):
+                terms = hours_on(us, d)
+                if terms:
+                    load = sum(var * h for var, h in terms)
+                    model.Add(load <= sum(group_av[g][d]))
+                    self.load[(g, d)] = load
+        for insts, _ in by_targets.items():
+            covered = [u for t, us in by_targets.items() if t <= insts for u in us]
+            for d in range(self.n_days):
+                terms = hours_on(covered, d)
+                if terms:
+                    model.Add(sum(var * h for var, h in terms) <= sum(teaching_capacity(inst_av[i][d], ts_gaps) for i in insts))
+        # Rooms by the predicates the engine places sessions with: lectures in non-lab rooms, labs
+        # in the rooms valid for their lab type. The classes may share rooms (a hardware workshop
+        # takes lectures and hardware labs), so all of them together get the union's capacity too.
+        room_classes = {}
+        for u, (g, c, kind, ids) in enumerate(units):
+            key = all_courses[c].get('labType', 'Computer Lab') if kind == 'lab' else None
+            room_classes.setdefault(key, []).append(u)
+        room_sets = {key: [room_id for room_id, room in all_rooms.items()
+                           if (is_valid_lab_room(key, room) if key else not is_lab_room(room))]
+                     for key in room_classes}
+        if len(room_classes) > 1:
+            room_classes['all'] = list(range(len(units)))
+            room_sets['all'] = sorted({room_id for rooms in room_sets.values() for room_id in rooms})
+        for key, us in room_classes.items():
+            for d in range(self.n_days):
+                terms = hours_on(us, d)
+                if terms:
+                    model.Add(sum(var * h for var, h in terms) <=
+                              sum(sum(available_slots(all_rooms[room_id], all_days[d], n_slots)) for room_id in room_sets[key]))
+
+        # Weekly balancing: a short longest day for every group, and an even spread over the week.
+        peaks = []
+        for g in by_group:
+            loads = [load for (group, _), load in self.load.items() if group == g]
+            peak = model.NewIntVar(0, n_slots, '')
+            for load in loads:
+                model.Add(peak >= load)
+            peaks.append(peak)
+        busiest = model.NewIntVar(0, n_slots * max(1, len(by_group)), '')
+        for d in range(self.n_days):
+            day_load = [load for (_, day), load in self.load.items() if day == d]
+            if day_load:
+                model.Add(busiest >= sum(day_load))
+        model.Minimize(len(self.units) * sum(peaks) + busiest)
+        self.cuts = 0
+
+    def solve(self, time_limit, num_workers):
+        """
+        Day of every unit (None for units left unscheduled), or None when no distribution is
+        left (or none was found in time).
+        """
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_search_workers = num_workers
+        status = solver.Solve(self.model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None, status
+        days = [next((d for d, var in days.items() if solver.Value(var)), None) for days in self.assign]
+        # Later rounds start from this distribution, so solved days tend to stay as they are.
+        self.model.ClearHints()
+        for u, d in enumerate(days):
+            for day, var in self.assign[u].items():
+                self.model.AddHint(var, int(day == d))
+        return days, status
+
+    def exclude(self, d, unit_indices):
+        """Forbids putting all of these units (or a superset of them) on day d again."""
+        self.model.Add(sum(self.assign[u][d] for u in unit_indices) <= len(unit_indices) - 1)
+        self.cuts += 1
+
+
+def solve_by_day(data, debug_log, num_workers=None, time_limit=120.0):
+    """
+    Solves an already validated payload day by day (see the comment at the top of the module).
+    Returns (response_body, http_status) like build_and_solve, with a 'decomposition' report.
+    """
+    try:
+        log = make_logger(debug_log)
+        start = time.monotonic()
+        deadline = start + time_limit
+        num_workers = num_workers or SOLVER_THREADS
+        all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+        tasks = build_tasks(all_student_groups, all_courses)
+        units = session_units(tasks)
+        distribution = DayDistribution(data, units)
+        day_settings = {key: value for key, value in settings.items() if key not in WEEKLY_ONLY_SETTINGS}
+        max_rounds = max(1, _to_int(settings.get('decompositionMaxRounds', DEFAULT_MAX_ROUNDS)))
+        log(f"Day decomposition: {len(units)} sessions over {len(all_days)} days.")
+
+        solved = {}  # (day, task ids) -> (body, status, seconds, log)
+
+        def solve_day(d, day_tasks, day_limit, threads):
+            day_log = []
+            day_start = time.monotonic()
+            body, status_code = build_and_solve(dict(data, days=[all_days[d]], settings=day_settings), day_log,
+                                                threads, time_limit=day_limit, tasks=day_tasks)
+            return body, status_code, time.monotonic() - day_start, day_log
+
+        for round_number in range(1, max_rounds + 1):
+            master_limit = max(1.0, min(MASTER_MAX_SECONDS, MASTER_TIME_SHARE * (deadline - time.monotonic())))
+            days, status = distribution.solve(master_limit, num_workers)
+            if days is None:
+                if status == cp_model.INFEASIBLE and not distribution.cuts:
+                    # The counting model only relaxes the weekly one, so the week is infeasible too.
+                    log("Day decomposition: no way to distribute the sessions over the days.")
+                    return {'status': 'error', 'message': infeasibility_message(data), 'debug_log': debug_log}, 400
+                break
+
+            plan = {d: {} for d in range(len(all_days))}
+            plan_units = {d: [] for d in range(len(all_days))}
+            for u, d in enumerate(days):
+                if d is None:
+                    continue
+                plan_units[d].append(u)
+                for task_id in units[u][3]:
+                    plan[d][task_id] = tasks[task_id]
+            keys = {d: (d, tuple(plan[d])) for d in plan}
+            pending = [d for d in plan if plan[d] and keys[d] not in solved]
+            log(f"Day decomposition round {round_number}: sessions per day "
+                f"{', '.join(f'{all_days[d]} {len(plan[d])}' for d in plan)}; solving {len(pending)} days.")
+
+            if pending:
+                # Leave half of the remaining time for later rounds (or the weekly fallback).
+                day_limit = max(1.0, (deadline - time.monotonic()) / 2)
+                threads = max(1, num_workers // len(pending))
+                with ThreadPoolExecutor(len(pending)) as pool:
+                    futures = {d: pool.submit(solve_day, d, plan[d], day_limit, threads) for d in pending}
+                    for d, future in futures.items():
+                        solved[keys[d]] = future.result()
+                        for msg in solved[keys[d]][3]:
+                            debug_log.append(f"[{all_days[d]}] {msg}")
+
+            failed = [d for d in plan if plan[d] and solved[keys[d]][1] != 200]
+            if not failed:
+                schedule = []
+                report = []
+                for d in plan:
+                    entry = {'day': all_days[d], 'sessions': len(plan[d])}
+                    if plan[d]:
+                        body, status_code, seconds, _ = solved[keys[d]]
+                        schedule.extend(body['schedule'])
+                        entry['seconds'] = round(seconds, 3)
+                        if 'objectiveStages' in body:
+                            entry['objectiveStages'] = body['objectiveStages']
+                    report.append(entry)
+                log(f"Day decomposition solved in {round_number} rounds, {time.monotonic() - start:.2f}s.")
+                return {'status': 'success', 'schedule': schedule,
+                        'decomposition': {'strategy': 'day', 'rounds': round_number, 'days': report}}, 200
+
+            for d in failed:
+                if solved[keys[d]][1] != 400:
+                    return solved[keys[d]][:2]  # crash or resource error: no point in retrying
+                distribution.exclude(d, plan_units[d])
+            log(f"Day decomposition round {round_number}: no schedule for {', '.join(all_days[d] for d in failed)}.")
+            if time.monotonic() >= deadline:
+                break
+
+        remaining = max(1.0, deadline - time.monotonic())
+        log(f"Day decomposition gave up; solving the whole week ({remaining:.0f}s left).")
+        return build_and_solve(data, debug_log, num_workers, time_limit=remaining)
+    except Exception as e:
+        return crash_response(e, debug_log)
@@ -0,0 +1,147 @@
+def max_matching(adjacency):
+    """
+    Maximum bipartite matching (augmenting paths, greedy start).
+    adjacency[u] lists the right-hand vertices left vertex u may use.
+    Returns match_left: {u: v} for every matched u.
+    """
+    match_left = {}
+    match_right = {}
+    for u, options in enumerate(adjacency):
+        for v in options:
+            if v not in match_right:
+                match_left[u] = v
+                match_right[v] = u
+                break
+
+    for root in range(len(adjacency)):
+        if root in match_left or not adjacency[root]:
+            continue
+        # Iterative DFS for an augmenting path from root.
+        parent = {}  # right vertex -> left vertex it was reached from
+        visited = set()
+        stack = [(root, iter(adjacency[root]))]
+        end = None
+        while stack and end is None:
+            u, options = stack[-1]
+            for v in options:
+                if v in visited:
+                    continue
+                visited.add(v)
+                parent[v] = u
+                if v not in match_right:
+                    end = v
+                else:
+                    stack.append((match_right[v], iter(adjacency[match_right[v]])))
+                break
+            else:
+                stack.pop()
+        while end is not None:
+            u = parent[end]
+            previous = match_left.get(u)
+            match_left[u] = end
+            match_right[end] = u
+            end = previous
+    return match_left
+
+
+def hall_violator(adjacency, match_left):
+    """
+    For a maximum matching that leaves some left vertex unmatched, returns (left, right):
+    left vertices that together can only use the right vertices in right, with
+    len(right) < len(left) (Hall's condition fails). Returns None if all are matched.
+    """
+    match_right = {v: u for u, v in match_left.items()}
+    unmatched = next((u for u in range(len(adjacency)) if u not in match_left), None)
+    if unmatched is None:
+        return None
+    left, right = {unmatched}, set()
+    frontier = [unmatched]
+    while frontier:
+        u = frontier.pop()
+        for v in adjacency[u]:
+            if v not in right:
+                right.add(v)
+                w = match_right[v]
+                if w not in left:
+                    left.add(w)
+                    frontier.append(w)
+    return left, right
+
+
+def _hour_domains(tm, domains):
+    """(task index, [(i, r, d, s)]) for every session hour; a lab block's second hour is its start shifted by one slot."""
+    hours = []
+    for k in range(len(tm.task_ids)):
+        first = tm.task_pair_first[k]
+        domain = [(i, r, d, s + 1) for (i, r, d, s) in domains[first]] if first >= 0 else domains[k]
+        if domain:  # tasks without any qualified instructor are left unscheduled, as before
+            hours.append((k, domain))
+    return hours
+
+
+def _describe_hours(tm, tasks):
+    counts = {}
+    for k in tasks:
+        label = tm.describe_task(k)
+        counts[label] = counts.get(label, 0) + 1
+    labels = [f"{n}h {label}" if n > 1 else label for label, n in sorted(counts.items(), key=lambda kv: -kv[1])]
+    shown = ", ".join(labels[:4])
+    return shown + (f" and {len(labels) - 4} more" if len(labels) > 4 else "")
+
+
+def bottleneck_check(tm, domains):
+    """
+    Necessary-condition check for over-subscribed resources: within each resource
+    class, every session hour needs its own (resource, day, slot) cell.
+    Classes checked: each student group, each instructor (hours only that instructor
+    can teach) and lab rooms (all lab hours). Runs one bipartite matching per class
+    on the already filtered candidate domains.
+    Returns a "Scheduling Failed" message naming the bottleneck, or None.
+    """
+    hours = _hour_domains(tm, domains)
+
+    by_group = {}
+    by_instructor = {}
+    lab_hours = []
+    for k, domain in hours:
+        by_group.setdefault(tm.task_group[k], []).append((k, domain))
+        instructors = {placement[0] for placement in domain}
+        if len(instructors) == 1:
+            by_instructor.setdefault(next(iter(instructors)), []).append((k, domain))
+        if tm.task_is_lab[k]:
+            lab_hours.append((k, domain))
+
+    def check(members, cell_of):
+        adjacency = [list({cell_of(placement) for placement in domain}) for _, domain in members]
+        match = max_matching(adjacency)
+        if len(match) == len(members):
+            return None
+        left, right = hall_violator(adjacency, match)
+        return [members[u][0] for u in left], right
+
+    for i, members in by_instructor.items():
+        result = check(members, lambda p: (p[2], p[3]))
+        if result:
+            tasks, cells = result
+            instructor = tm.all_instructors[tm.inst_ids[i]]
+            return (f"Scheduling Failed: Instructor '{instructor['name']}' is the only option for {len(tasks)} hours "
+                    f"({_describe_hours(tm, tasks)}) but is available for only {len(cells)} usable slots. "
+                    f"Please add qualified instructors or increase availability.")
+
+    for g, members in by_group.items():
+        result = check(members, lambda p: (p[2], p[3]))
+        if result:
+            tasks, cells = result
+            return (f"Scheduling Failed: Student Group '{tm.group_ids[g]}' needs {len(tasks)} hours "
+                    f"({_describe_hours(tm, tasks)}) that fit into only {len(cells)} usable slots. "
+                    f"Please increase availability or reduce course load.")
+
+    if lab_hours:
+        result = check(lab_hours, lambda p: (p[1], p[2], p[3]))
+        if result:
+            tasks, cells = result
+            rooms = sorted({tm.room_ids[r] for r, _, _ in cells})
+            return (f"Scheduling Failed: {len(tasks)} lab hours ({_describe_hours(tm, tasks)}) compete for only "
+                    f"{len(cells)} usable slots in lab rooms {', '.join(rooms) or '(none)'}. "
+                    f"Please add lab rooms or increase lab room availability.")
+    return None
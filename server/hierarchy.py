@@ -0,0 +1,108 @@
+import time
+
+from rescheduler import match_schedule
+from timetable_engine import (SOLVER_THREADS, _to_int, build_and_solve, build_tasks, crash_response,
+                              make_logger, unpack_payload)
+
+# settings.solveStrategy == 'hierarchical' (see solver_pool.SOLVE_STRATEGIES): student groups
+# are solved in tiers, in the order of settings.cohortPriority, e.g.
+#   "cohortPriority": [["CS-4A", "CS-4B"], ["CS-3*"], "EE-*"]
+# (a tier is a list of group ids, or a single one; a trailing '*' matches an id prefix;
+# groups in no tier form a last one). Each tier is solved with the placements of the tiers
+# before it fixed, so their instructors and rooms stay reserved. When a tier has no
+# solution, up to settings.cohortBacktrack earlier tiers (default 1) are reopened and
+# solved together with it.
+DEFAULT_BACKTRACK = 1
+
+# Settings that only make sense for the final schedule.
+FINAL_ONLY_SETTINGS = ('solveStrategy', 'alternatives', 'alternativesMinDistance')
+
+
+def cohort_tiers(group_ids, priority):
+    """Group ids split into tiers by priority (see the comment at the top of the module)."""
+    tiers = []
+    left = list(group_ids)
+    for tier in priority or []:
+        patterns = [tier] if isinstance(tier, str) else list(tier)
+        picked = [g for g in left if any(
+            str(g).startswith(p[:-1]) if p.endswith('*') else str(g) == p for p in map(str, patterns))]
+        if picked:
+            tiers.append(picked)
+            left = [g for g in left if g not in picked]
+    if left:
+        tiers.append(left)
+    return tiers
+
+
+def solve_hierarchical(data, debug_log, num_workers=None, time_limit=120.0):
+    """
+    Solves an already validated payload tier by tier (see the comment at the top of the module).
+    Returns (response_body, http_status) like build_and_solve, with a 'hierarchy' report.
+    """
+    try:
+        log = make_logger(debug_log)
+        start = time.monotonic()
+        deadline = start + time_limit
+        num_workers = num_workers or SOLVER_THREADS
+        all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+        tiers = cohort_tiers(list(all_student_groups), settings.get('cohortPriority'))
+        if len(tiers) < 2:
+            log("Hierarchical solve: a single tier; solving the full model.")
+            return build_and_solve(data, debug_log, num_workers, time_limit=time_limit)
+
+        tasks = build_tasks(all_student_groups, all_courses)
+        tier_of = {group_id: i for i, tier in enumerate(tiers) for group_id in tier}
+        tier_tasks = [{} for _ in tiers]
+        for task_id, task_info in tasks.items():
+            tier_tasks[tier_of[task_info['group_id']]][task_id] = task_info
+        tier_settings = {key: value for key, value in settings.items() if key not in FINAL_ONLY_SETTINGS}
+        max_backtrack = max(0, _to_int(settings.get('cohortBacktrack', DEFAULT_BACKTRACK)))
+        log(f"Hierarchical solve: {len(tiers)} tiers of {', '.join(str(len(t)) for t in tier_tasks)} sessions.")
+
+        committed = {}  # task id -> (inst_id, room_id, day, timeslot) of the solved tiers
+        report = [{'groups': tier, 'sessions': len(tier_tasks[i]), 'solves': 0, 'seconds': 0.0}
+                  for i, tier in enumerate(tiers)]
+        backtracks = 0
+        i = 0
+        while i < len(tiers):
+            first = i  # tiers first..i are solved together
+            while True:
+                # An equal share of the time left for every tier still to solve.
+                tier_limit = max(1.0, (deadline - time.monotonic()) / (len(tiers) - i))
+                subset = {task_id: info for t in range(i + 1) for task_id, info in tier_tasks[t].items()}
+                fixed = {task_id: p for task_id, p in committed.items() if tier_of[tasks[task_id]['group_id']] < first}
+                hints = {task_id: p for task_id, p in committed.items() if task_id not in fixed}
+                final = i == len(tiers) - 1
+                tier_data = data if final else dict(data, settings=tier_settings)
+                tier_start = time.monotonic()
+                tier_log = []
+                body, status_code = build_and_solve(tier_data, tier_log, num_workers, fixed_assignments=fixed,
+                                                    hint_assignments=hints, time_limit=tier_limit, tasks=subset)
+                seconds = time.monotonic() - tier_start
+                debug_log.extend(f"[tier {i + 1}] {msg}" for msg in tier_log)
+                report[i]['solves'] += 1
+                report[i]['seconds'] = round(report[i]['seconds'] + seconds, 3)
+                if status_code == 200:
+                    break
+                if status_code != 400 or first == 0 or i - first >= max_backtrack:
+                    log(f"Hierarchical solve: no schedule for tier {i + 1} ({', '.join(map(str, tiers[i]))}).")
+                    body['hierarchy'] = {'tiers': report, 'backtracks': backtracks, 'failedTier': i + 1}
+                    return body, status_code
+                first -= 1
+                backtracks += 1
+                log(f"Hierarchical solve: tier {i + 1} has no schedule; reopening tier {first + 1}.")
+
+            # Sessions the engine leaves unscheduled (no qualified instructor) have no placement to fix.
+            placements = match_schedule(body['schedule'], subset, all_instructors, all_days, all_timeslots)
+            for t in range(first, i + 1):
+                for task_id in tier_tasks[t]:
+                    if placements.get(task_id):
+                        committed[task_id] = placements[task_id]
+            log(f"Hierarchical solve: tier {i + 1} solved in {seconds:.2f}s.")
+            i += 1
+
+        log(f"Hierarchical solve: {len(tiers)} tiers in {time.monotonic() - start:.2f}s, {backtracks} backtracks.")
+        body['hierarchy'] = {'tiers': report, 'backtracks': backtracks}
+        return body, 200
+    except Exception as e:
+        return crash_response(e, debug_log)
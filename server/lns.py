@@ -0,0 +1,301 @@
+import random
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from ortools.sat.python import cp_model
+
+from decomposition import solve_by_day
+from rescheduler import match_schedule
+from timetable_engine import (SOLVER_THREADS, build_and_solve, build_model_cached, crash_response,
+                              infeasibility_message, is_lab_room, make_logger, symmetry_classes)
+
+# settings.solveStrategy == 'lns' (see solver_pool.SOLVE_STRATEGIES): large-neighbourhood search
+# over the timetable's own structure. From a first feasible schedule, rounds of sub-solves each
+# free the sessions of one neighbourhood and keep every other placement fixed; the best result of
+# a round is accepted when it is at least as good as the current schedule.
+#   group      - a student group's week
+#   instructor - the sessions an instructor currently teaches
+#   day        - everything on one day
+#   roomDay    - one room's day
+#   labRoom    - one lab room's week
+NEIGHBOURHOODS = ('group', 'instructor', 'day', 'roomDay', 'labRoom')
+
+# Share of the budget the first solution may take, and the budget of one sub-solve.
+INITIAL_TIME_SHARE = 0.5
+DEFAULT_SUB_TIME_LIMIT = 5.0
+# Sub-solves run in parallel, each on its own copy of the model.
+MAX_PARALLEL_SUB_SOLVES = 4
+# A neighbourhood grows to several entities while its sub-solves finish well inside their
+# budget without improving, and shrinks again when they time out.
+MAX_NEIGHBOURHOOD_SIZE = 8
+
+
+def schedule_entries(tm, schedule):
+    """{task index: entry} for the sessions of schedule that match one of the model's placements."""
+    placements = match_schedule(schedule, tm.tasks, tm.all_instructors, tm.all_days, tm.all_timeslots)
+    placed = {}
+    for task_id, (inst_id, room_id, day, timeslot) in placements.items():
+        k = tm.task_index[task_id]
+        target = (tm.inst_index.get(inst_id), tm.room_index.get(room_id), tm.day_index.get(day), tm.slot_index.get(timeslot))
+        for e in tm.entries(k):
+            if (tm.var_inst[e], tm.var_room[e], tm.var_day[e], tm.var_slot[e]) == target:
+                placed[k] = e
+                break
+    return placed
+
+
+def canonical_entries(tm, placed):
+    """
+    placed ({task index: entry}) renumbered into the order the model's symmetry breaking requires
+    (see timetable_engine.symmetry_classes): a group's interchangeable sessions in (day, slot)
+    order, then identical groups by where their first session lands. Placements only move between
+    tasks; placed is returned as it is when one has no matching entry on the task it moves to.
+    """
+    if not tm.settings.get('symmetryBreaking', True):
+        return placed
+    interchangeable, group_classes = symmetry_classes(tm)
+    second = {first: k for k, first in enumerate(tm.task_pair_first) if first >= 0}
+
+    def position(k):
+        e = placed[source[k]]
+        return tm.var_day[e] * tm.n_slots + tm.var_slot[e]
+
+    source = {k: k for k in placed}  # task -> task whose placement it takes
+    for ks in interchangeable:
+        if all(k in placed for k in ks):
+            order = sorted(ks, key=position)
+            for k, from_k in zip(ks, order):
+                source[k] = from_k
+                if k in second:  # the second hour of a lab block moves with the first
+                    source[second[k]] = second[from_k]
+    for sessions in group_classes:
+        anchor = next(iter(sessions[0]))
+        if any(group[anchor] not in placed for group in sessions):
+            continue
+        order = sorted(sessions, key=lambda group: position(group[anchor]))
+        moved = {k: source.get(from_group[session]) for group, from_group in zip(sessions, order)
+                 for session, k in group.items()}
+        source.update({k: from_k for k, from_k in moved.items() if from_k is not None})
+
+    result = {}
+    for k, from_k in source.items():
+        e = placed[from_k]
+        target = (tm.var_inst[e], tm.var_room[e], tm.var_day[e], tm.var_slot[e])
+        match = next((f for f in tm.entries(k) if (tm.var_inst[f], tm.var_room[f], tm.var_day[f], tm.var_slot[f]) == target), None)
+        if match is None:
+            return placed
+        result[k] = match
+    return result
+
+
+class SubSolver:
+    """A copy of the weekly model on which all placements outside a neighbourhood get fixed."""
+
+    def __init__(self, tm, lit_index):
+        self.tm = tm
+        self.lit_index = lit_index
+        self.model = cp_model.CpModel()
+        self.model.Proto().CopyFrom(tm.model.Proto())
+        self.fixed = []
+
+    def solve(self, free, chosen, time_limit):
+        """
+        Re-solves the tasks in free with every other task at its chosen entry (-1 for a task
+        without placements, which stays unscheduled). Returns (objective, chosen entries) of the result, or (None, None) when no solution
+        was found, and whether the sub-solve ran into its time limit.
+        """
+        tm, proto = self.tm, self.model.Proto()
+        for index in self.fixed:
+            proto.variables[index].domain[:] = [0, 1]
+        self.fixed = []
+        hinted = set()
+        for k, e in enumerate(chosen):
+            if e < 0:
+                continue
+            index = self.lit_index[e]
+            if k in free:
+                hinted.add(index)  # the two hours of a lab block share one literal
+            elif proto.variables[index].domain[0] == 0:
+                proto.variables[index].domain[:] = [1, 1]
+                self.fixed.append(index)
+        del proto.solution_hint.vars[:]
+        del proto.solution_hint.values[:]
+        proto.solution_hint.vars.extend(hinted)
+        proto.solution_hint.values.extend([1] * len(hinted))
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_search_workers = 1
+        status = solver.Solve(self.model)
+        timed_out = status != cp_model.OPTIMAL
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None, None, timed_out
+        values = solver.ResponseProto().solution
+        result = array('i', chosen)
+        for k in free:
+            result[k] = next((e for e in tm.entries(k) if values[self.lit_index[e]]), -1)
+        return round(solver.ObjectiveValue()), result, timed_out
+
+
+class NeighbourhoodPicker:
+    """Draws neighbourhoods, favouring kinds that have produced improvements."""
+
+    def __init__(self, tm, rng):
+        self.tm = tm
+        self.rng = rng
+        self.lab_rooms = [r for r, room_id in enumerate(tm.room_ids) if is_lab_room(tm.all_rooms[room_id])]
+        self.kinds = [kind for kind in NEIGHBOURHOODS if kind != 'labRoom' or self.lab_rooms]
+        self.stats = {kind: {'tries': 0, 'improvements': 0, 'size': 1} for kind in self.kinds}
+
+    def draw(self, chosen):
+        """(kind, description, set of free tasks) of a random neighbourhood of the current schedule."""
+        tm, rng = self.tm, self.rng
+        weights = [(s['improvements'] + 1) / (s['tries'] + 2) for s in (self.stats[kind] for kind in self.kinds)]
+        kind = rng.choices(self.kinds, weights)[0]
+        size = self.stats[kind]['size']
+        if kind == 'group':
+            picked = rng.sample(range(len(tm.group_ids)), min(size, len(tm.group_ids)))
+            free = {k for k in range(len(chosen)) if tm.task_group[k] in picked}
+            names = [tm.group_ids[g] for g in picked]
+        elif kind == 'instructor':
+            busy = sorted({tm.var_inst[e] for e in chosen if e >= 0})
+            picked = rng.sample(busy, min(size, len(busy)))
+            free = {k for k, e in enumerate(chosen) if e >= 0 and tm.var_inst[e] in picked}
+            names = [tm.inst_ids[i] for i in picked]
+        elif kind == 'day':
+            picked = rng.sample(range(tm.n_days), min(max(1, size // 4), tm.n_days))
+            free = {k for k, e in enumerate(chosen) if e >= 0 and tm.var_day[e] in picked}
+            names = [tm.all_days[d] for d in picked]
+        else:
+            rooms = self.lab_rooms if kind == 'labRoom' else sorted({tm.var_room[e] for e in chosen if e >= 0})
+            picked = rng.sample(rooms, min(size, len(rooms)))
+            free = {k for k, e in enumerate(chosen) if e >= 0 and tm.var_room[e] in picked}
+            names = [tm.room_ids[r] for r in picked]
+            if kind == 'roomDay':
+                d = rng.randrange(tm.n_days)
+                free = {k for k in free if tm.var_day[chosen[k]] == d}
+                names = [f'{name} on {tm.all_days[d]}' for name in names]
+        # Both hours of a lab block move together.
+        for k in list(free):
+            partner = tm.task_pair_first[k]
+            if partner >= 0:
+                free.add(partner)
+        for k in range(len(chosen)):
+            if tm.task_pair_first[k] in free:
+                free.add(k)
+        return kind, ', '.join(map(str, names)), free
+
+    def record(self, kind, improved, timed_out, time_limit, seconds):
+        stats = self.stats[kind]
+        stats['tries'] += 1
+        if improved:
+            stats['improvements'] += 1
+        elif timed_out:
+            stats['size'] = max(1, stats['size'] - 1)
+        elif seconds < time_limit / 4:
+            stats['size'] = min(MAX_NEIGHBOURHOOD_SIZE, stats['size'] + 1)
+
+
+def solve_lns(data, debug_log, num_workers=None, time_limit=120.0):
+    """
+    Solves an already validated payload by large-neighbourhood search (see the comment at the
+    top of the module). A 'schedule' in the payload is the starting point when it fits;
+    otherwise the day decomposition (decomposition.solve_by_day) provides one.
+    Returns (response_body, http_status) like build_and_solve, with an 'lns' report.
+    """
+    try:
+        log = make_logger(debug_log)
+        settings = data.get('settings', {})
+        if settings.get('optimizationMode', 'weighted') == 'lexicographic':
+            log("LNS works on the weighted objective; solving lexicographically with the full model instead.")
+            return build_and_solve(data, debug_log, num_workers, time_limit=time_limit)
+
+        start = time.monotonic()
+        deadline = start + time_limit
+        num_workers = num_workers or SOLVER_THREADS
+        tm, _ = build_model_cached(data, debug_log)
+        if tm.contradiction:
+            return {'status': 'error', 'message': tm.contradiction, 'debug_log': debug_log}, 400
+        objectives = [term for terms in tm.objective_tiers.values() for term in terms]
+        if objectives:
+            tm.model.Minimize(sum(objectives))
+        lit_index = array('i', (lit.Index() for lit in tm.var_lit))
+
+        # --- FIRST SCHEDULE ---
+        # The supplied schedule, else the day decomposition's, laid onto the weekly model and
+        # scored with every placement fixed; the weekly model's first solution if neither fits.
+        solvers = [SubSolver(tm, lit_index) for _ in range(max(1, min(num_workers, MAX_PARALLEL_SUB_SOLVES)))]
+        seed, source = data.get('schedule'), 'the supplied schedule'
+        if not isinstance(seed, list):
+            body, status_code = solve_by_day(data, debug_log, num_workers, time_limit=max(1.0, INITIAL_TIME_SHARE * time_limit))
+            seed, source = body.get('schedule'), 'the day decomposition'
+        placed = canonical_entries(tm, schedule_entries(tm, seed)) if isinstance(seed, list) else {}
+        # Tasks without placements (no qualified instructor) stay unscheduled: -1 in chosen.
+        placeable = [k for k in range(len(tm.task_ids)) if tm.entries(k)]
+        objective = None
+        if len(placed) == len(placeable):
+            chosen = array('i', (placed.get(k, -1) for k in range(len(tm.task_ids))))
+            objective, chosen, _ = solvers[0].solve(set(), chosen, max(1.0, deadline - time.monotonic()))
+        if objective is None:
+            if placed:
+                log(f"LNS: {source} does not fit ({len(placed)} of {len(placeable)} sessions placeable); "
+                    f"using it as a hint.")
+            tm.model.ClearHints()
+            for e in set(placed.values()):
+                tm.model.AddHint(tm.var_lit[e], 1)
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = max(1.0, deadline - time.monotonic())
+            solver.parameters.num_search_workers = num_workers
+            solver.parameters.stop_after_first_solution = True
+            status = solver.Solve(tm.model)
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                return {'status': 'error', 'message': infeasibility_message(data), 'debug_log': debug_log}, 400
+            values = solver.ResponseProto().solution
+            chosen = array('i', (next((e for e in tm.entries(k) if values[lit_index[e]]), -1)
+                                 for k in range(len(tm.task_ids))))
+            objective, source = round(solver.ObjectiveValue()) if objectives else 0, 'the weekly model'
+        initial = objective
+        log(f"LNS: first schedule from {source} with objective {objective} after {time.monotonic() - start:.2f}s.")
+
+        # --- NEIGHBOURHOOD SEARCH ---
+        rng = random.Random(0)
+        picker = NeighbourhoodPicker(tm, rng)
+        sub_time_limit = float(settings.get('lnsSubTimeLimit', DEFAULT_SUB_TIME_LIMIT))
+        rounds = tries = improvements = 0
+        with ThreadPoolExecutor(len(solvers)) as pool:
+            while objectives and objective > 0 and time.monotonic() + 0.5 < deadline:
+                rounds += 1
+                budget = min(sub_time_limit, deadline - time.monotonic())
+                drawn = [picker.draw(chosen) for _ in solvers]
+                started = time.monotonic()
+                futures = [pool.submit(sub.solve, free, chosen, budget) for sub, (_, _, free) in zip(solvers, drawn)]
+                results = [future.result() for future in futures]
+                seconds = time.monotonic() - started
+                best = None
+                for (kind, names, free), (value, result, timed_out) in zip(drawn, results):
+                    tries += 1
+                    improved = value is not None and value < objective
+                    picker.record(kind, improved, timed_out, budget, seconds)
+                    if value is not None and value <= objective and (best is None or value < best[0]):
+                        best = (value, result, kind, names, len(free))
+                if best:
+                    value, result, kind, names, n_free = best
+                    if value < objective:
+                        improvements += 1
+                        log(f"LNS round {rounds}: {objective} -> {value} by re-solving {n_free} sessions ({kind} {names}).")
+                    objective, chosen = value, result
+
+        log(f"LNS: objective {initial} -> {objective} in {rounds} rounds ({tries} sub-solves), {time.monotonic() - start:.2f}s.")
+        report = {
+            'initialObjective': initial,
+            'objective': objective,
+            'rounds': rounds,
+            'subSolves': tries,
+            'improvements': improvements,
+            'neighbourhoods': {kind: {'tries': s['tries'], 'improvements': s['improvements']}
+                               for kind, s in picker.stats.items()},
+        }
+        return {'status': 'success', 'schedule': tm.schedule_from_entries(chosen), 'lns': report}, 200
+    except Exception as e:
+        return crash_response(e, debug_log)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+# Payload keys that never change the model.
+_IGNORED_KEYS = ('settings', 'async', 'institutionId', 'problemRef')
+# Master data of a stored problem (see problem_store), already covered by its hash.
+_PROBLEM_KEYS = ('instructors', 'courses', 'rooms', 'student_groups', 'days', 'timeslots')
+# Settings read while building the hard constraints; all other settings only shape the objective.
+STRUCTURAL_SETTINGS = ('symmetryBreaking',)
+
+
+def structure_key(data):
+    """
+    Hash of everything the hard-constraint model depends on (the payload minus soft settings).
+    Payloads resolved from the problem store reuse the stored version's hash instead of
+    re-encoding the master data.
+    """
+    settings = data.get('settings') or {}
+    problem_hash = (data.get('problemRef') or {}).get('hash')
+    skipped = _IGNORED_KEYS + (_PROBLEM_KEYS if problem_hash else ())
+    structure = {key: value for key, value in data.items() if key not in skipped}
+    if problem_hash:
+        structure['problem'] = problem_hash
+    structure['settings'] = {name: settings[name] for name in STRUCTURAL_SETTINGS if name in settings}
+    encoded = json.dumps(structure, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class _Entry:
+    def __init__(self, tm):
+        self.tm = tm
+        self.hint_vars = None  # model indices of tm.decision_vars
+        self.hint_values = None
+
+
+class ModelCache:
+    """
+    LRU of built hard-constraint models (TimetableModel) keyed by structure_key, so a request
+    that only changes soft settings skips the model build. Each entry also keeps the last
+    solution found on it, used to warm-start the next solve.
+    The cache is per process; with the solver pool every worker process has its own.
+    """
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max(0, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """TIMELY_MODEL_CACHE_SIZE models per process (default 4; 0 disables the cache)."""
+        return cls(max_entries=int(os.environ.get('TIMELY_MODEL_CACHE_SIZE', 4)))
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """The cached TimetableModel for key (do not modify it; fork() it), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.tm
+
+    def put(self, key, tm):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = _Entry(tm)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_solution(self, key, decision_vars, solver):
+        """Remembers the decision variable values of a solution found on a model built from key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            solution = solver.ResponseProto().solution
+            entry.hint_vars = array('i', (var.Index() for var in decision_vars))
+            entry.hint_values = array('b', (solution[index] for index in entry.hint_vars))
+
+    def apply_hints(self, key, model):
+        """Adds the last recorded solution for key as a solution hint. Returns whether there was one."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.hint_vars is None:
+                return False
+            hint = model.Proto().solution_hint
+            del hint.vars[:]
+            del hint.values[:]
+            hint.vars.extend(entry.hint_vars)
+            hint.values.extend(entry.hint_values)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+# Master-data lists whose entries are addressed by 'id' in patches.
+COLLECTIONS = ('instructors', 'courses', 'rooms', 'student_groups')
+PROBLEM_KEYS = COLLECTIONS + ('days', 'timeslots', 'settings')
+
+_SAFE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class ProblemNotFound(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    """The patch was based on an older version than the latest one."""
+    def __init__(self, message, latest):
+        super().__init__(message)
+        self.latest = latest
+
+
+def _merge(target, patch):
+    """RFC 7396 JSON merge patch: dicts merge recursively, null deletes, anything else replaces."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge(result.get(key), value)
+    return result
+
+
+def apply_patch(data, patch):
+    """
+    Applies a delta to a problem and returns the new problem (data is not modified).
+
+    Collections (instructors, courses, rooms, student_groups) are patched by id:
+    {"instructors": {"I1": {"availability": {"Mon": [1, 0, 1]}}, "I9": null, "I10": {...}}}
+    merges into I1, removes I9 and appends I10 (new entries get their id filled in).
+    days and timeslots are replaced, settings are merged; both follow JSON merge patch rules.
+    Raises ValueError for malformed deltas.
+    """
+    if not isinstance(patch, dict):
+        raise ValueError("A patch must be a JSON object.")
+    unknown = set(patch) - set(PROBLEM_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown keys in patch: {', '.join(sorted(unknown))}.")
+
+    result = dict(data)
+    for key, value in patch.items():
+        if key in COLLECTIONS:
+            if not isinstance(value, dict):
+                raise ValueError(f"'{key}' in a patch must map ids to changes (or null to remove).")
+            entries = OrderedDict((entry['id'], entry) for entry in result.get(key, []))
+            for entity_id, change in value.items():
+                if change is None:
+                    entries.pop(entity_id, None)
+                elif not isinstance(change, dict):
+                    raise ValueError(f"Change for {key} '{entity_id}' must be an object or null.")
+                else:
+                    merged = _merge(entries.get(entity_id, {}), change)
+                    merged['id'] = entity_id
+                    entries[entity_id] = merged
+            result[key] = list(entries.values())
+        elif value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge(result.get(key), value)
+    return result
+
+
+def check_problem(data):
+    """Raises ValueError unless data looks like problem master data."""
+    if not isinstance(data, dict):
+        raise ValueError("A problem must be a JSON object.")
+    for key in COLLECTIONS:
+        entries = data.get(key, [])
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) and entry.get('id') for entry in entries):
+            raise ValueError(f"'{key}' must be a list of objects with an 'id'.")
+    for key in ('days', 'timeslots'):
+        if not isinstance(data.get(key, []), list):
+            raise ValueError(f"'{key}' must be a list.")
+
+
+def problem_hash(data):
+    """Content hash of a problem's master data (settings excluded)."""
+    master = {key: data[key] for key in PROBLEM_KEYS if key in data and key != 'settings'}
+    encoded = json.dumps(master, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ProblemStore:
+    """
+    Versioned master data (instructors, courses, rooms, student groups, days, timeslots
+    and default settings) on disk, one JSON snapshot per version under
+    <directory>/<tenant>/<problem id>/<version>.json. Versions are immutable; a patch
+    writes the next one. Recently used versions stay parsed in memory.
+    """
+
+    def __init__(self, directory, max_cached=32):
+        self.directory = directory
+        self.max_cached = max_cached
+        self._cache = OrderedDict()  # (tenant, problem_id, version) -> (data, meta)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        directory = os.environ.get('TIMELY_PROBLEM_STORE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'problem_store')
+        return cls(directory, max_cached=int(os.environ.get('TIMELY_PROBLEM_STORE_CACHE', 32)))
+
+    def _problem_dir(self, tenant, problem_id):
+        if not _SAFE_ID.match(problem_id or ''):
+            raise ProblemNotFound(f"Unknown problem '{problem_id}'.")
+        tenant = tenant or 'default'
+        if not _SAFE_ID.match(tenant):
+            tenant = hashlib.sha256(tenant.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, tenant, problem_id)
+
+    def _versions(self, tenant, problem_id):
+        path = self._problem_dir(tenant, problem_id)
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:
+            raise ProblemNotFound(f"Unknown problem '{problem_id}'.")
+        return sorted(int(name[:-5]) for name in names if name.endswith('.json') and name[:-5].isdigit())
+
+    def _write(self, tenant, problem_id, version, data, meta):
+        path = self._problem_dir(tenant, problem_id)
+        os.makedirs(path, exist_ok=True)
+        # Written to a temp file, then linked into place: readers never see a partial
+        # version, and of two writers racing for the same version only one wins.
+        tmp_path = os.path.join(path, f'.{version}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'meta': meta, 'data': data}, f)
+        try:
+            os.link(tmp_path, os.path.join(path, f'{version}.json'))
+        except FileExistsError:
+            raise VersionConflict(f"Problem '{problem_id}' was changed concurrently; version {version} already exists.", version)
+        finally:
+            os.unlink(tmp_path)
+        self._remember((tenant, problem_id, version), data, meta)
+
+    def _remember(self, key, data, meta):
+        with self._lock:
+            self._cache[key] = (data, meta)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def create(self, tenant, data):
+        """Stores data as version 1 of a new problem. Returns its metadata."""
+        check_problem(data)
+        data = {key: data[key] for key in PROBLEM_KEYS if key in data}
+        problem_id = uuid.uuid4().hex
+        meta = {'problemId': problem_id, 'version': 1, 'hash': problem_hash(data)}
+        self._write(tenant, problem_id, 1, data, meta)
+        return meta
+
+    def get(self, tenant, problem_id, version=None):
+        """Returns (data, meta) of a version (the latest by default). Treat data as read-only."""
+        if version is None:
+            versions = self._versions(tenant, problem_id)
+            if not versions:
+                raise ProblemNotFound(f"Unknown problem '{problem_id}'.")
+            version = versions[-1]
+        key = (tenant, problem_id, int(version))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        try:
+            with open(os.path.join(self._problem_dir(tenant, problem_id), f'{int(version)}.json')) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            raise ProblemNotFound(f"Unknown version {version} of problem '{problem_id}'.")
+        self._remember(key, stored['data'], stored['meta'])
+        return stored['data'], stored['meta']
+
+    def patch(self, tenant, problem_id, delta, base_version=None):
+        """
+        Writes the latest version with delta applied as a new version. Returns its metadata.
+        With base_version, raises VersionConflict unless that is still the latest version.
+        """
+        data, meta = self.get(tenant, problem_id)
+        if base_version is not None and int(base_version) != meta['version']:
+            raise VersionConflict(f"Problem '{problem_id}' is at version {meta['version']}, not {base_version}.", meta['version'])
+        new_data = apply_patch(data, delta)
+        check_problem(new_data)
+        new_meta = {'problemId': problem_id, 'version': meta['version'] + 1, 'hash': problem_hash(new_data),
+                    'baseVersion': meta['version']}
+        self._write(tenant, problem_id, new_meta['version'], new_data, new_meta)
+        return new_meta
+
+    def history(self, tenant, problem_id):
+        return [self.get(tenant, problem_id, version)[1] for version in self._versions(tenant, problem_id)]
+
+    def resolve(self, tenant, request_data):
+        """
+        Expands a request that references a stored problem ({"problemId", "version"?, "patch"?,
+        "settings"?, ...}) into a full payload. Request settings are merged over the stored
+        ones; an inline patch applies to this request only. Other request fields are kept.
+        The payload's problemRef carries the stored version's hash for the model cache
+        (omitted when an inline patch changes the master data).
+        Requests without problemId are returned unchanged.
+        """
+        problem_id = request_data.get('problemId')
+        if not problem_id:
+            return request_data
+        data, meta = self.get(tenant, str(problem_id), request_data.get('version'))
+        payload = {key: value for key, value in request_data.items() if key not in ('problemId', 'version', 'patch')}
+        patch = request_data.get('patch')
+        base = apply_patch(data, patch) if patch else data
+        payload.update(base)
+        payload['settings'] = _merge(base.get('settings') or {}, request_data.get('settings') or {})
+        ref = {'problemId': meta['problemId'], 'version': meta['version']}
+        if not patch or set(patch) <= {'settings'}:
+            ref['hash'] = meta['hash']
+        payload['problemRef'] = ref
+        return payload
@@ -0,0 +1,89 @@
+import cProfile
+import importlib
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+
+# Rows returned per table unless the request asks for another number.
+DEFAULT_LIMIT = 30
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in / native call, e.g. the CP-SAT solve itself
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def summarize_stats(profile, limit=DEFAULT_LIMIT):
+    """Top functions of a cProfile run by cumulative time."""
+    stats = pstats.Stats(profile)
+    rows = []
+    for func, (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': _function_label(func),
+            'calls': calls,
+            'totalSeconds': round(total, 4),
+            'cumulativeSeconds': round(cumulative, 4),
+        })
+    rows.sort(key=lambda row: -row['cumulativeSeconds'])
+    return {'totalSeconds': round(stats.total_tt, 4), 'functions': rows[:limit]}
+
+
+def summarize_allocations(snapshot, peak, limit=DEFAULT_LIMIT):
+    """Top allocation sites (file:line) of a tracemalloc snapshot by size still allocated."""
+    sites = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        sites.append({
+            'site': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            'sizeKB': round(stat.size / 1024, 1),
+            'count': stat.count,
+        })
+    return {'peakMB': round(peak / (1024 * 1024), 2), 'sites': sites}
+
+
+def profile_call(fn_path, options, *args):
+    """
+    Runs module:function(*args), which returns (response_body, http_status), under cProfile
+    and, with options['memory'], tracemalloc. Adds the summaries to the body under 'profile'.
+    With TIMELY_PROFILE_DIR set, the raw cProfile stats are also written there (pstats format).
+    """
+    module_name, fn_name = fn_path.split(':')
+    fn = getattr(importlib.import_module(module_name), fn_name)
+    limit = int(options.get('limit') or DEFAULT_LIMIT)
+    memory = bool(options.get('memory'))
+
+    profile = cProfile.Profile()
+    if memory:
+        tracemalloc.start(int(options.get('frames') or 1))
+    start = time.perf_counter()
+    try:
+        profile.enable()
+        body, status_code = fn(*args)
+    finally:
+        profile.disable()
+        wall = time.perf_counter() - start
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    summary = {'wallSeconds': round(wall, 4), 'cpu': summarize_stats(profile, limit)}
+    if memory:
+        summary['memory'] = summarize_allocations(snapshot, peak, limit)
+    profile_dir = os.environ.get('TIMELY_PROFILE_DIR')
+    if profile_dir:
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.prof")
+            profile.dump_stats(path)
+            summary['file'] = path
+        except OSError as e:
+            summary['fileError'] = str(e)
+
+    body = dict(body)
+    body['profile'] = summary
+    return body, status_code
@@ -0,0 +1,191 @@
+from timetable_engine import build_and_solve, build_tasks, crash_response, make_logger, unpack_payload
+
+# Neighbourhoods tried in order until the local model is feasible:
+#   affected  - sessions that clash with the event (plus their lab partners)
+#   same_day  - + other sessions of the affected groups on the affected days
+#   same_week - + every session of the affected groups
+NEIGHBOURHOOD_LEVELS = ['affected', 'same_day', 'same_week']
+
+DEFAULT_MAX_FREE_SESSIONS = 40
+DEFAULT_LOCAL_TIME_LIMIT = 10.0
+
+
+def apply_event(data, event):
+    """
+    Marks the event's instructor or room unavailable for the given days/timeslots
+    (all of them if omitted). Returns (new_data, blocked) where blocked is the set of
+    (kind, entity_id, day, timeslot) placements that are no longer allowed, kind being
+    'instructor' or 'room'.
+    Raises ValueError for unknown event types or ids.
+    """
+    kind = event.get('type')
+    if kind == 'instructorAbsence':
+        entity_key, entity_id = 'instructors', event.get('instructorId')
+    elif kind == 'roomOutage':
+        entity_key, entity_id = 'rooms', event.get('roomId')
+    else:
+        raise ValueError(f"Unknown event type '{kind}'. Expected 'instructorAbsence' or 'roomOutage'.")
+
+    all_timeslots = data.get('timeslots', [])
+    days = event.get('days') or data.get('days', [])
+    timeslots = set(event.get('timeslots') or all_timeslots)
+
+    # Copy only the entity we modify; the rest of the payload is shared.
+    entities = []
+    found = False
+    for entity in data.get(entity_key, []):
+        if entity.get('id') == entity_id:
+            found = True
+            entity = dict(entity)
+            availability = dict(entity.get('availability') or {})
+            for day in days:
+                slots = list(availability.get(day, []))
+                slots += [1] * (len(all_timeslots) - len(slots))
+                for t_idx, ts in enumerate(all_timeslots):
+                    if ts in timeslots:
+                        slots[t_idx] = 0
+                availability[day] = slots
+            entity['availability'] = availability
+        entities.append(entity)
+    if not found:
+        raise ValueError(f"Unknown {entity_key[:-1]} '{entity_id}' in event.")
+
+    new_data = dict(data)
+    new_data[entity_key] = entities
+    blocked = {(entity_key[:-1], entity_id, day, ts) for day in days for ts in timeslots}
+    return new_data, blocked
+
+
+def match_schedule(schedule, tasks, all_instructors, all_days, all_timeslots):
+    """
+    Maps an existing schedule back onto task ids.
+    Sessions of the same group/course/type are numbered in day/slot order, which keeps
+    lab halves paired as lab_0/lab_1, lab_2/lab_3...
+    Returns {task_id: (inst_id, room_id, day, timeslot)}.
+    """
+    name_to_inst = {i.get('name'): inst_id for inst_id, i in all_instructors.items()}
+    day_index = {d: i for i, d in enumerate(all_days)}
+    ts_index = {ts: i for i, ts in enumerate(all_timeslots)}
+
+    sessions = {}
+    for entry in schedule:
+        inst_id = entry.get('instructorId') or name_to_inst.get(entry.get('instructor'))
+        key = (entry.get('group'), entry.get('courseId'), entry.get('type'))
+        sessions.setdefault(key, []).append((inst_id, entry.get('room'), entry.get('day'), entry.get('timeslot')))
+
+    placements = {}
+    for (sg_id, course_id, session_type), entries in sessions.items():
+        entries.sort(key=lambda e: (day_index.get(e[2], len(all_days)), ts_index.get(e[3], len(all_timeslots))))
+        prefix = 'lec' if session_type == 'lecture' else 'lab'
+        for i, placement in enumerate(entries):
+            task_id = f'{sg_id}_{course_id}_{prefix}_{i}'
+            if task_id in tasks:
+                placements[task_id] = placement
+    return placements
+
+
+def lab_partner(task_id, tasks):
+    """The other half of a 2-hour lab block, or None."""
+    if tasks[task_id]['type'] != 'lab':
+        return None
+    prefix, index = task_id.rsplit('_', 1)
+    index = int(index)
+    partner = f'{prefix}_{index + 1}' if index % 2 == 0 else f'{prefix}_{index - 1}'
+    return partner if partner in tasks else None
+
+
+def neighbourhood(level, affected, placements, tasks, max_free):
+    """Tasks freed at the given level, always including every affected task."""
+    free = set(affected)
+    if level != 'affected':
+        groups = {tasks[tid]['group_id'] for tid in affected}
+        days = {placements[tid][2] for tid in affected if tid in placements}
+        for task_id, task_info in tasks.items():
+            if len(free) >= max_free:
+                break
+            if task_id in free or task_info['group_id'] not in groups:
+                continue
+            if level == 'same_week' or (task_id in placements and placements[task_id][2] in days):
+                free.add(task_id)
+
+    # Lab halves always move together.
+    for task_id in list(free):
+        partner = lab_partner(task_id, tasks)
+        if partner:
+            free.add(partner)
+    return free
+
+
+def entry_key(entry):
+    return (entry.get('group'), entry.get('courseId'), entry.get('type'), entry.get('day'),
+            entry.get('timeslot'), entry.get('room'), entry.get('instructor'))
+
+
+def reschedule(data, debug_log, num_workers=None):
+    """
+    Repairs an existing schedule after an instructor absence or room outage.
+    Only the sessions that clash with the event (and a bounded neighbourhood around
+    them) are re-solved; everything else stays pinned to its current placement.
+    Returns (response_body, http_status).
+    """
+    try:
+        log = make_logger(debug_log)
+        schedule = data.get('schedule')
+        event = data.get('event')
+        if not isinstance(schedule, list) or not isinstance(event, dict):
+            return {'status': 'error', 'message': "Rescheduling needs the current 'schedule' and an 'event'."}, 400
+
+        try:
+            new_data, blocked = apply_event(data, event)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        try:
+            max_free = int(data.get('maxFreeSessions', DEFAULT_MAX_FREE_SESSIONS))
+            time_limit = float(data.get('timeLimit', DEFAULT_LOCAL_TIME_LIMIT))
+        except (ValueError, TypeError):
+            return {'status': 'error', 'message': "'maxFreeSessions' and 'timeLimit' must be numbers."}, 400
+
+        all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(new_data)
+        tasks = build_tasks(all_student_groups, all_courses)
+        placements = match_schedule(schedule, tasks, all_instructors, all_days, all_timeslots)
+
+        affected = set()
+        for task_id in tasks:
+            placement = placements.get(task_id)
+            if placement is None:
+                affected.add(task_id)  # missing from the supplied schedule: place it now
+                continue
+            inst_id, room_id, day, timeslot = placement
+            if ('instructor', inst_id, day, timeslot) in blocked or ('room', room_id, day, timeslot) in blocked:
+                affected.add(task_id)
+
+        if not affected:
+            return {'status': 'success', 'schedule': schedule, 'changed': [], 'freedSessions': 0, 'neighbourhood': None}, 200
+
+        original_keys = {entry_key(entry) for entry in schedule}
+
+        previous_free = None
+        result = None
+        for level in NEIGHBOURHOOD_LEVELS:
+            free = neighbourhood(level, affected, placements, tasks, max(max_free, len(affected)))
+            if free == previous_free:
+                continue
+            previous_free = free
+            log(f"Rescheduling: freeing {len(free)} of {len(tasks)} sessions ({level}).")
+
+            fixed = {tid: p for tid, p in placements.items() if tid not in free}
+            hints = {tid: placements[tid] for tid in free if tid in placements}
+            result = build_and_solve(new_data, debug_log, num_workers,
+                                     fixed_assignments=fixed, hint_assignments=hints, time_limit=time_limit)
+            body, status_code = result
+            if status_code == 200:
+                body['changed'] = [entry for entry in body['schedule'] if entry_key(entry) not in original_keys]
+                body['freedSessions'] = len(free)
+                body['neighbourhood'] = level
+                return body, 200
+            if status_code != 400:
+                return result
+
+        return result
+    except Exception as e:
+        return crash_response(e, debug_log)
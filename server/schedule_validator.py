@@ -0,0 +1,222 @@
+from timetable_engine import is_lab_room, is_valid_lab_room, unpack_payload
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+def _available(entity, day, t_idx):
+    """Mirrors the generator: missing availability (entity, day or index) means available."""
+    slots = (entity.get('availability') or {}).get(day)
+    if not slots or t_idx >= len(slots):
+        return True
+    return slots[t_idx] != 0
+
+
+def validate_schedule(data):
+    """
+    Checks a (possibly hand-edited) schedule against every hard rule the generator
+    enforces and totals the soft penalties the objective would assign to it.
+    Runs in time linear in the schedule size, without building a solver model.
+    Returns (response_body, http_status).
+    """
+    schedule = data.get('schedule')
+    if not isinstance(schedule, list):
+        return {'status': 'error', 'message': "Expected the timetable to check in 'schedule'."}, 400
+
+    all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+    ts_index = {ts: i for i, ts in enumerate(all_timeslots)}
+    name_to_inst = {i.get('name'): inst_id for inst_id, i in all_instructors.items()}
+
+    violations = []
+    def violation(rule, message, *entries):
+        violations.append({'rule': rule, 'message': message, 'entries': list(entries)})
+
+    # --- RESOLVE ENTRIES ---
+    # Each usable entry becomes (index, inst_id, room_id, group_id, course_id, type, day, t_idx).
+    sessions = []
+    for idx, entry in enumerate(schedule):
+        inst_id = entry.get('instructorId') or name_to_inst.get(entry.get('instructor'))
+        room_id = entry.get('room')
+        sg_id = entry.get('group')
+        course_id = entry.get('courseId')
+        day = entry.get('day')
+        t_idx = ts_index.get(entry.get('timeslot'))
+        session_type = entry.get('type')
+
+        missing = []
+        if inst_id not in all_instructors: missing.append(f"instructor '{entry.get('instructorId') or entry.get('instructor')}'")
+        if room_id not in all_rooms: missing.append(f"room '{room_id}'")
+        if sg_id not in all_student_groups: missing.append(f"group '{sg_id}'")
+        if course_id not in all_courses: missing.append(f"course '{course_id}'")
+        if day not in all_days: missing.append(f"day '{day}'")
+        if t_idx is None: missing.append(f"timeslot '{entry.get('timeslot')}'")
+        if session_type not in ('lecture', 'lab'): missing.append(f"type '{session_type}'")
+        if missing:
+            violation('unknown_reference', f"Entry {idx} refers to unknown " + ", ".join(missing) + ".", idx)
+            continue
+        sessions.append((idx, inst_id, room_id, sg_id, course_id, session_type, day, t_idx))
+
+    # --- PER-SESSION RULES ---
+    by_instructor = {}
+    by_room = {}
+    by_group = {}
+    by_group_course = {}
+    for idx, inst_id, room_id, sg_id, course_id, session_type, day, t_idx in sessions:
+        instructor = all_instructors[inst_id]
+        room = all_rooms[room_id]
+        group = all_student_groups[sg_id]
+        course = all_courses[course_id]
+        timeslot = all_timeslots[t_idx]
+
+        by_instructor.setdefault((inst_id, day, t_idx), []).append(idx)
+        by_room.setdefault((room_id, day, t_idx), []).append(idx)
+        by_group.setdefault((sg_id, day, t_idx), []).append(idx)
+        by_group_course.setdefault((sg_id, course_id, session_type), []).append((day, t_idx, idx, inst_id, room_id))
+
+        if course_id not in group.get('enrolledCourses', []):
+            violation('session_count', f"Group '{sg_id}' is not enrolled in '{course['name']}'.", idx)
+
+        preferred_inst_id = group.get('instructorPreferences', {}).get(course_id)
+        if preferred_inst_id:
+            if inst_id != preferred_inst_id:
+                violation('instructor', f"'{course['name']}' for group '{sg_id}' must be taught by '{preferred_inst_id}', not '{instructor['name']}'.", idx)
+        elif inst_id not in course.get('qualifiedInstructors', []):
+            violation('instructor', f"'{instructor['name']}' is not qualified to teach '{course['name']}'.", idx)
+
+        if not _available(instructor, day, t_idx):
+            violation('availability', f"Instructor '{instructor['name']}' is unavailable on {day} at {timeslot}.", idx)
+        if not _available(group, day, t_idx):
+            violation('availability', f"Group '{sg_id}' is unavailable on {day} at {timeslot}.", idx)
+        if not _available(room, day, t_idx):
+            violation('availability', f"Room '{room_id}' is unavailable on {day} at {timeslot}.", idx)
+
+        if _int(group.get('size', 0)) > _int(room.get('capacity', 0)):
+            violation('capacity', f"Group '{sg_id}' ({group.get('size')}) does not fit in room '{room_id}' (capacity {room.get('capacity')}).", idx)
+
+        required_equipment = set(course.get('equipment', []))
+        if required_equipment and not required_equipment.issubset(set(room.get('equipment', []))):
+            missing_equipment = ", ".join(sorted(required_equipment - set(room.get('equipment', []))))
+            violation('equipment', f"Room '{room_id}' lacks equipment for '{course['name']}': {missing_equipment}.", idx)
+
+        if session_type == 'lab':
+            preferred_room_id = group.get('labRoomPreferences', {}).get(course_id)
+            if preferred_room_id and room_id != preferred_room_id:
+                violation('lab_room', f"Lab '{course['name']}' for group '{sg_id}' must use room '{preferred_room_id}'.", idx)
+            elif not is_valid_lab_room(course.get('labType', 'Computer Lab'), room):
+                violation('lab_room', f"Room '{room_id}' is not a valid {course.get('labType', 'Computer Lab')} for '{course['name']}'.", idx)
+            if group.get('labTimingPreferences', {}).get(course_id) == 'Afternoon' and ts_parsed[t_idx][0] < 720:
+                violation('afternoon_lab', f"Lab '{course['name']}' for group '{sg_id}' must be in the afternoon.", idx)
+        elif is_lab_room(room):
+            violation('lab_room', f"Lecture '{course['name']}' cannot use lab room '{room_id}'.", idx)
+
+    # --- DOUBLE BOOKING ---
+    for label, index in (('Instructor', by_instructor), ('Room', by_room), ('Group', by_group)):
+        for (entity_id, day, t_idx), entries in index.items():
+            if len(entries) > 1:
+                violation('double_booking', f"{label} '{entity_id}' is double booked on {day} at {all_timeslots[t_idx]}.", *entries)
+
+    # --- SESSION COUNTS, LECTURE-PER-DAY AND LAB CONTINUITY ---
+    # Which entries open a 2-hour lab block (the generator's lab_0, lab_2, ... tasks).
+    lab_block_start = {}
+    for sg_id, group in all_student_groups.items():
+        for course_id in group.get('enrolledCourses', []):
+            course = all_courses.get(course_id)
+            if not course: continue
+            for session_type, required in (('lecture', _int(course.get('lectureHours', 0))), ('lab', _int(course.get('labHours', 0)))):
+                scheduled = len(by_group_course.get((sg_id, course_id, session_type), []))
+                if scheduled != required:
+                    violation('session_count', f"Group '{sg_id}' has {scheduled} {session_type} hour(s) of '{course['name']}' but needs {required}.")
+
+    for (sg_id, course_id, session_type), placed in by_group_course.items():
+        course = all_courses[course_id]
+        placed.sort()
+        if session_type == 'lecture':
+            per_day = {}
+            for day, t_idx, idx, inst_id, room_id in placed:
+                per_day.setdefault(day, []).append(idx)
+            for day, entries in per_day.items():
+                if len(entries) > 1:
+                    violation('lecture_per_day', f"Group '{sg_id}' has more than one '{course['name']}' lecture on {day}.", *entries)
+            continue
+
+        lab_hours = _int(course.get('labHours', 0))
+        for i in range(0, len(placed) - 1, 2):
+            if i + 1 >= lab_hours:
+                break
+            first, second = placed[i], placed[i + 1]
+            day, t_idx, idx, inst_id, room_id = first
+            contiguous = (second[0] == day and second[1] == t_idx + 1 and ts_gaps[t_idx] == 0)
+            if not contiguous or second[3] != inst_id or second[4] != room_id:
+                violation('lab_continuity', f"Lab '{course['name']}' for group '{sg_id}' must be one continuous 2-hour block with the same instructor and room.", idx, second[2])
+            else:
+                lab_block_start[idx] = second[2]
+
+    # --- FACULTY BREAK ---
+    for (inst_id, day, t_idx), entries in by_instructor.items():
+        if t_idx + 1 >= len(all_timeslots) or ts_gaps[t_idx] >= 60:
+            continue
+        following = by_instructor.get((inst_id, day, t_idx + 1))
+        if not following:
+            continue
+        if len(entries) == 1 and len(following) == 1 and lab_block_start.get(entries[0]) == following[0]:
+            continue
+        violation('faculty_break', f"Instructor '{all_instructors[inst_id]['name']}' has back-to-back classes on {day} at {all_timeslots[t_idx]} and {all_timeslots[t_idx + 1]}.", *(entries + following))
+
+    # --- ONE LAB PER DAY ---
+    lab_courses_per_day = {}
+    for idx, inst_id, room_id, sg_id, course_id, session_type, day, t_idx in sessions:
+        if session_type == 'lab':
+            lab_courses_per_day.setdefault((sg_id, day), {}).setdefault(course_id, []).append(idx)
+    for (sg_id, day), courses in lab_courses_per_day.items():
+        if len(courses) > 1:
+            entries = [idx for course_entries in courses.values() for idx in course_entries]
+            violation('one_lab_per_day', f"Group '{sg_id}' has more than one lab course on {day}.", *entries)
+
+    penalties = soft_penalties(sessions, all_instructors, all_rooms, all_student_groups, all_timeslots, settings, ts_parsed)
+    return {
+        'status': 'success',
+        'valid': not violations,
+        'violations': violations,
+        'penalties': penalties,
+    }, 200
+
+
+def soft_penalties(sessions, all_instructors, all_rooms, all_student_groups, all_timeslots, settings, ts_parsed):
+    """Objective value of the schedule per tier, using the generator's weights."""
+    penalties = {'lab830': 0, 'gaps': 0, 'workload': 0, 'preferences': 0}
+
+    disallow_830 = settings.get('disallow830Labs', False)
+    gap_weight = int(settings.get('gapPriority', 0.0) * 10) if settings.get('gapPriority', 0.0) > 0 else 0
+    preferred_courses = set(settings.get('preferredMorningCourses', []))
+
+    group_day_slots = {}
+    instructor_hours = {inst_id: 0 for inst_id in all_instructors}
+    for idx, inst_id, room_id, sg_id, course_id, session_type, day, t_idx in sessions:
+        start_min, end_min = ts_parsed[t_idx]
+        timeslot = all_timeslots[t_idx]
+
+        if disallow_830 and session_type == 'lab' and start_min >= 510 and end_min <= 630:
+            penalties['lab830'] += 1000
+        if preferred_courses and course_id in preferred_courses:
+            if 'PM' in timeslot and not timeslot.startswith('12') and 'AM' not in timeslot:
+                penalties['preferences'] += 2
+        preferred_room_id = all_student_groups[sg_id].get('preferredRoomId')
+        if preferred_room_id and preferred_room_id in all_rooms and room_id != preferred_room_id:
+            penalties['preferences'] += 5
+
+        group_day_slots.setdefault((sg_id, day), set()).add(t_idx)
+        instructor_hours[inst_id] += 1
+
+    if gap_weight:
+        for slots in group_day_slots.values():
+            penalties['gaps'] += (max(slots) - min(slots) + 1 - len(slots)) * gap_weight
+
+    if settings.get('fairWorkload', False) and instructor_hours:
+        penalties['workload'] = (max(instructor_hours.values()) - min(instructor_hours.values())) * 5
+
+    penalties['total'] = sum(penalties.values())
+    return penalties
@@ -0,0 +1,215 @@
+import json
+import os
+import re
+import time
+
+# Caps on what goes into a response; the raw log only goes to the dump file.
+MAX_SOLUTION_EVENTS = 100
+MAX_BOUND_EVENTS = 50
+MAX_PRESOLVE_RULES = 15
+
+_EVENT = re.compile(r"^#(\d+|Bound|Done)\s+([\d.]+)s\s*(.*)$")
+_BEST_NEXT = re.compile(r"best:(\S+)\s+next:\[([^\]]*)\]\s*(.*)$")
+_VARIABLES = re.compile(r"^#Variables: ([\d']+)")
+_CONSTRAINT = re.compile(r"^#k\w+: ([\d']+)")
+_RULE = re.compile(r"^\s+- rule '(.+)' was applied ([\d']+) times?\.")
+_AFFINE = re.compile(r"^\s+- ([\d']+) affine relations were detected\.")
+_PRESOLVE_START = re.compile(r"^Starting presolve at ([\d.]+)s")
+_SEARCH_START = re.compile(r"^Starting (?:sequential )?search at ([\d.]+)s(?: with (\d+) workers?)?")
+_LNS_ROW = re.compile(r"^\s+'([^']+)':\s+([\d']+)/([\d']+)\s+(\d+)%\s+([\d.]+)\s+([\d.]+)")
+
+
+def _number(text):
+    """Parses CP-SAT's numbers ("1'836", "inf", "120") into int/float; None if it isn't one."""
+    text = text.replace("'", '')
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+        return None if value != value or value in (float('inf'), float('-inf')) else value
+
+
+def _thin(events, limit):
+    """Keeps the first and last events when there are more than limit of them."""
+    if len(events) <= limit:
+        return events
+    head = limit // 2
+    return events[:head] + events[len(events) - (limit - head):]
+
+
+def parse_search_log(lines):
+    """
+    Turns the log of one CP-SAT Solve() call into a JSON-friendly summary:
+    model size before/after presolve, presolve time and most applied rules,
+    every improving solution and bound with its timestamp and worker, LNS
+    neighbourhood stats and the final response summary.
+    """
+    run = {
+        'presolve': {'startedAt': None, 'seconds': None, 'affineRelations': 0, 'rules': {}},
+        'model': {},
+        'search': {'startedAt': None, 'workers': None},
+        'solutions': [],
+        'bounds': [],
+        'lns': {},
+        'response': {},
+    }
+    section = None
+    table = None
+    rules = {}
+    for line in lines:
+        if not line.strip():
+            section = table = None
+            continue
+
+        # Model statistics follow the "Initial ..." / "Presolved ..." headers up to a blank line.
+        if line.startswith('Initial '):
+            section = 'initial'
+            continue
+        if line.startswith('Presolved '):
+            section = 'presolved'
+            continue
+        if section:
+            match = _VARIABLES.match(line)
+            if match:
+                run['model'].setdefault(section, {})['variables'] = _number(match.group(1))
+                continue
+            match = _CONSTRAINT.match(line)
+            if match:
+                counts = run['model'].setdefault(section, {})
+                counts['constraints'] = counts.get('constraints', 0) + _number(match.group(1))
+                continue
+
+        match = _PRESOLVE_START.match(line)
+        if match:
+            run['presolve']['startedAt'] = float(match.group(1))
+            continue
+        match = _SEARCH_START.match(line)
+        if match:
+            run['search'] = {'startedAt': float(match.group(1)), 'workers': int(match.group(2) or 1)}
+            if run['presolve']['startedAt'] is not None:
+                run['presolve']['seconds'] = round(float(match.group(1)) - run['presolve']['startedAt'], 3)
+            continue
+        match = _RULE.match(line)
+        if match:
+            rules[match.group(1)] = _number(match.group(2))
+            continue
+        match = _AFFINE.match(line)
+        if match:
+            run['presolve']['affineRelations'] = _number(match.group(1))
+            continue
+
+        match = _EVENT.match(line)
+        if match:
+            kind, at, rest = match.group(1), float(match.group(2)), match.group(3)
+            if kind == 'Done':
+                run['search']['doneAt'] = at
+                run['search']['closedBy'] = rest.strip() or None
+                continue
+            event = {'time': at}
+            best = _BEST_NEXT.match(rest)
+            if best:
+                event['objective'] = _number(best.group(1))
+                event['bound'] = _number(best.group(2).split(',')[0]) if best.group(2) else event['objective']
+                rest = best.group(3)
+            event['worker'] = rest.split(' (')[0].strip() or None
+            run['bounds' if kind == 'Bound' else 'solutions'].append(event)
+            continue
+
+        if line.startswith('LNS stats'):
+            table = 'lns'
+            continue
+        if line.startswith('CpSolverResponse summary'):
+            table = 'response'
+            continue
+        if table == 'lns':
+            match = _LNS_ROW.match(line)
+            if match:
+                run['lns'][match.group(1)] = {
+                    'improvements': _number(match.group(2)),
+                    'calls': _number(match.group(3)),
+                    'closedPercent': int(match.group(4)),
+                    'difficulty': float(match.group(5)),
+                    'timeLimit': float(match.group(6)),
+                }
+            continue
+        if table == 'response' and ':' in line:
+            key, value = line.split(':', 1)
+            value = value.strip()
+            number = _number(value)
+            run['response'][key.strip()] = number if number is not None else value
+
+    run['presolve']['rules'] = dict(sorted(rules.items(), key=lambda kv: -kv[1])[:MAX_PRESOLVE_RULES])
+    if run['solutions']:
+        run['firstSolutionAt'] = run['solutions'][0]['time']
+        run['bestSolutionAt'] = run['solutions'][-1]['time']
+    run['numSolutions'] = len(run['solutions'])
+    run['solutions'] = _thin(run['solutions'], MAX_SOLUTION_EVENTS)
+    run['bounds'] = _thin(run['bounds'], MAX_BOUND_EVENTS)
+    return run
+
+
+class SearchLog:
+    """
+    Captures the CP-SAT search log of one request through the solver's log callback.
+    Several Solve() calls (e.g. lexicographic stages) can share one SearchLog;
+    each becomes a separate run in the summary.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self._runs = []  # (label, index of the run's first line)
+
+    def attach(self, solver, label=None):
+        """Turns on log_search_progress for solver and routes its log here instead of stdout."""
+        solver.parameters.log_search_progress = True
+        solver.parameters.log_to_stdout = False
+        solver.log_callback = self._append
+        self._runs.append((label, len(self.lines)))
+
+    def _append(self, message):
+        # One callback message can hold several log lines (e.g. the final response summary).
+        self.lines.extend(message.split('\n'))
+
+    def summary(self):
+        runs = []
+        bounds = [start for _, start in self._runs[1:]] + [len(self.lines)]
+        for (label, start), end in zip(self._runs, bounds):
+            run = parse_search_log(self.lines[start:end])
+            if label:
+                run['stage'] = label
+            runs.append(run)
+        return {'runs': runs}
+
+    def describe(self):
+        """One-line progress summary per run for the debug log."""
+        messages = []
+        for run in self.summary()['runs']:
+            prefix = f"Search log ({run['stage']})" if 'stage' in run else 'Search log'
+            parts = []
+            if run['presolve']['seconds'] is not None:
+                parts.append(f"presolve {run['presolve']['seconds']:.2f}s")
+            if run['numSolutions']:
+                last = run['solutions'][-1]
+                parts.append(f"first solution at {run['firstSolutionAt']:.2f}s")
+                parts.append(f"{run['numSolutions']} improvements, best {last.get('objective')} at {run['bestSolutionAt']:.2f}s")
+            else:
+                parts.append('no solution')
+            response = run['response']
+            if 'status' in response:
+                parts.append(f"{response['status']} (bound {response.get('best_bound')}, {response.get('walltime')}s)")
+            messages.append(f"{prefix}: " + ", ".join(parts))
+        return messages
+
+    def dump(self, directory, data):
+        """
+        Writes the request payload, the raw solver log and the parsed summary to
+        directory so a slow solve can be replayed and compared later. Returns the path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"search-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self) & 0xffff:04x}.json")
+        with open(path, 'w') as f:
+            json.dump({'payload': data, 'searchLog': self.summary(), 'rawLog': self.lines}, f)
+        return path
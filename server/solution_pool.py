@@ -0,0 +1,86 @@
+from array import array
+
+from ortools.sat.python import cp_model
+
+
+def _linear_terms(terms):
+    """({variable index: coefficient}, constant) of a sum of objective terms."""
+    coeffs, constant = {}, 0
+    for term in terms:
+        if isinstance(term, int):
+            constant += term
+            continue
+        term_coeffs, term_constant = term.GetIntegerVarValueMap()
+        constant += term_constant
+        for var, coeff in term_coeffs.items():
+            coeffs[var.Index()] = coeffs.get(var.Index(), 0) + coeff
+    return coeffs, constant
+
+
+def hamming_distance(a, b):
+    """Number of session hours placed differently in two placement vectors."""
+    return sum(1 for x, y in zip(a, b) if x != y)
+
+
+class SolutionPool(cp_model.CpSolverSolutionCallback):
+    """
+    Keeps up to k good solutions that differ pairwise in the placement of at least
+    min_distance session hours, from the solutions CP-SAT reports during one solve
+    (solution callback plus the response's additional_solutions pool).
+
+    A solution is stored as its placement vector (the chosen entry of every task) with
+    its objective value and per-tier breakdown. When a new solution is within
+    min_distance of kept ones, it replaces them only if it is better than all of them.
+    """
+
+    def __init__(self, tm, objective_tiers, k, min_distance):
+        super().__init__()
+        self.tm = tm
+        self.k = k
+        self.min_distance = max(1, min_distance)
+        self.lit_index = array('i', (lit.Index() for lit in tm.var_lit))
+        self.tiers = {name: _linear_terms(terms) for name, terms in objective_tiers.items() if terms}
+        self.kept = []  # (objective, placements, breakdown), best first
+        self.seen = 0
+
+    def on_solution_callback(self):
+        self.offer(self.Response().solution)
+
+    def harvest(self, response):
+        """Offers the solutions CP-SAT left in response.additional_solutions."""
+        for solution in response.additional_solutions:
+            self.offer(solution.values)
+
+    def offer(self, values):
+        self.seen += 1
+        tm = self.tm
+        placements = array('i', [-1] * len(tm.task_ids))
+        for k in range(len(tm.task_ids)):
+            for e in tm.entries(k):
+                if values[self.lit_index[e]]:
+                    placements[k] = e
+                    break
+        breakdown = {name: constant + sum(coeff * values[index] for index, coeff in coeffs.items())
+                     for name, (coeffs, constant) in self.tiers.items()}
+        objective = sum(breakdown.values())
+
+        close = [item for item in self.kept if hamming_distance(item[1], placements) < self.min_distance]
+        if any(item[0] <= objective for item in close):
+            return  # a kept solution like this one is at least as good
+        self.kept = [item for item in self.kept if not any(item is other for other in close)]
+        self.kept.append((objective, placements, breakdown))
+        self.kept.sort(key=lambda item: item[0])
+        del self.kept[self.k:]
+
+    def alternatives(self):
+        """The kept solutions, best first, as response entries with their schedules."""
+        if not self.kept:
+            return []
+        best = self.kept[0][1]
+        return [{
+            'rank': rank,
+            'objective': objective,
+            'objectiveBreakdown': breakdown,
+            'distanceFromBest': hamming_distance(best, placements),
+            'schedule': self.tm.schedule_from_entries(e for e in placements if e >= 0),
+        } for rank, (objective, placements, breakdown) in enumerate(self.kept, 1)]
@@ -0,0 +1,244 @@
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+from timetable_engine import _to_int, build_tasks, is_lab_room, is_valid_lab_room, unpack_payload
+
+# Solves run with build_and_solve's default time limit, so predictions are capped at it;
+# building and encoding even the smallest model takes about MIN_SOLVE_SECONDS.
+SOLVE_TIME_LIMIT = 120.0
+MIN_SOLVE_SECONDS = 0.1
+
+# Instance features the predictor uses; all come from the payload without building the model.
+#   logTasks            - log(1 + session hours)
+#   logVariables        - log(1 + estimated placement variables: instructor x room x slot
+#                         candidates per session, before presolve)
+#   labShare            - share of session hours that are lab hours
+#   availabilityDensity - share of (day, slot) cells instructors and groups are available
+#   maxInstructorLoad   - hours an instructor is expected to teach (a session's hours split
+#   meanInstructorLoad    over its qualified instructors) per available slot; worst and mean
+#   maxGroupLoad        - session hours of the busiest group per available slot
+#   labRoomLoad         - lab hours per lab room slot
+#   lectureRoomLoad     - lecture hours per lecture room slot
+FEATURES = ('logTasks', 'logVariables', 'labShare', 'availabilityDensity', 'maxInstructorLoad',
+            'meanInstructorLoad', 'maxGroupLoad', 'labRoomLoad', 'lectureRoomLoad')
+
+# Used until a model trained on this server's own history is configured (TIMELY_ESTIMATOR_MODEL):
+# rough coefficients on the raw features, from solves of the benchmark departments on one core.
+DEFAULT_MODEL = {
+    'trained': False,
+    'means': {name: 0.0 for name in FEATURES},
+    'scales': {name: 1.0 for name in FEATURES},
+    'seconds': {'intercept': -11.35, 'weights': {'logVariables': 1.0, 'lectureRoomLoad': 2.0, 'maxInstructorLoad': 4.0}},
+    'risk': {'intercept': -11.0, 'weights': {'maxInstructorLoad': 5.0, 'maxGroupLoad': 4.0, 'lectureRoomLoad': 4.0,
+                                             'labRoomLoad': 4.0}},
+}
+
+# Ridge penalty of both fits; keeps them stable on a few dozen solves.
+RIDGE = 1.0
+
+
+def _available_mask(entity, all_days, n_slots):
+    """Bit d * n_slots + s is set when entity is available on day d, slot s (missing entries are available)."""
+    availability = entity.get('availability') or {}
+    mask = 0
+    for d, day in enumerate(all_days):
+        slots = availability.get(day) or []
+        for s in range(n_slots):
+            if not (s < len(slots) and slots[s] == 0):
+                mask |= 1 << (d * n_slots + s)
+    return mask
+
+
+def instance_features(data):
+    """
+    Features of an already validated payload (see FEATURES), plus the raw counts they
+    come from under 'counts'. Cheap: no model is built.
+    """
+    all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+    tasks = build_tasks(all_student_groups, all_courses)
+    n_slots = len(all_timeslots)
+    cells = max(1, len(all_days) * n_slots)
+    inst_masks = {inst_id: _available_mask(inst, all_days, n_slots) for inst_id, inst in all_instructors.items()}
+    group_masks = {group_id: _available_mask(group, all_days, n_slots) for group_id, group in all_student_groups.items()}
+
+    rooms_cache = {}
+
+    def rooms_for(group, course, kind):
+        key = (group.get('id'), course.get('id'), kind)
+        if key not in rooms_cache:
+            size = _to_int(group.get('size', 0))
+            equipment = set(course.get('equipment', []))
+            preferred = group.get('labRoomPreferences', {}).get(course.get('id'))
+            lab_type = course.get('labType', 'Computer Lab')
+            rooms_cache[key] = sum(
+                1 for room_id, room in all_rooms.items()
+                if size <= _to_int(room.get('capacity', 0))
+                and equipment.issubset(set(room.get('equipment', [])))
+                and (is_valid_lab_room(lab_type, room) and (not preferred or room_id == preferred)
+                     if kind == 'lab' else not is_lab_room(room)))
+        return rooms_cache[key]
+
+    variables = 0
+    lab_hours = 0
+    demand = {inst_id: 0.0 for inst_id in all_instructors}
+    group_hours = {group_id: 0 for group_id in all_student_groups}
+    for task_info in tasks.values():
+        group = all_student_groups[task_info['group_id']]
+        course = all_courses[task_info['course_id']]
+        preferred = group.get('instructorPreferences', {}).get(task_info['course_id'])
+        targets = [i for i in dict.fromkeys([preferred] if preferred else course.get('qualifiedInstructors', []))
+                   if i in all_instructors]
+        group_mask = group_masks[task_info['group_id']]
+        rooms = rooms_for(group, course, task_info['type'])
+        for inst_id in targets:
+            variables += bin(inst_masks[inst_id] & group_mask).count('1') * rooms
+            demand[inst_id] += 1.0 / len(targets)
+        lab_hours += task_info['type'] == 'lab'
+        group_hours[task_info['group_id']] += 1
+
+    inst_loads = [demand[i] / max(1, bin(inst_masks[i]).count('1')) for i in all_instructors if demand[i]]
+    group_loads = [group_hours[g] / max(1, bin(group_masks[g]).count('1')) for g in all_student_groups]
+    masks = list(inst_masks.values()) + list(group_masks.values())
+    n_lab_rooms = sum(1 for room in all_rooms.values() if is_lab_room(room))
+    n_lecture_rooms = len(all_rooms) - n_lab_rooms
+    lecture_hours = len(tasks) - lab_hours
+    features = {
+        'logTasks': math.log1p(len(tasks)),
+        'logVariables': math.log1p(variables),
+        'labShare': lab_hours / len(tasks) if tasks else 0.0,
+        'availabilityDensity': sum(bin(m).count('1') for m in masks) / (cells * len(masks)) if masks else 1.0,
+        'maxInstructorLoad': max(inst_loads, default=0.0),
+        'meanInstructorLoad': sum(inst_loads) / len(inst_loads) if inst_loads else 0.0,
+        'maxGroupLoad': max(group_loads, default=0.0),
+        'labRoomLoad': lab_hours / (n_lab_rooms * cells) if n_lab_rooms else float(lab_hours > 0),
+        'lectureRoomLoad': lecture_hours / (n_lecture_rooms * cells) if n_lecture_rooms else float(lecture_hours > 0),
+    }
+    features = {name: round(value, 4) for name, value in features.items()}
+    features['counts'] = {'tasks': len(tasks), 'estimatedVariables': variables, 'instructors': len(all_instructors),
+                          'groups': len(all_student_groups), 'rooms': len(all_rooms), 'cells': cells}
+    return features
+
+
+def _solve_linear(matrix, vector):
+    """Solves matrix @ x = vector by Gaussian elimination with partial pivoting (small dense systems)."""
+    n = len(vector)
+    a = [list(row) + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        if abs(a[col][col]) < 1e-12:
+            continue
+        for r in range(n):
+            if r != col and a[r][col]:
+                factor = a[r][col] / a[col][col]
+                a[r] = [x - factor * y for x, y in zip(a[r], a[col])]
+    return [a[i][n] / a[i][i] if abs(a[i][i]) >= 1e-12 else 0.0 for i in range(n)]
+
+
+def _fit(rows, targets, weights=None):
+    """Ridge least squares with an unpenalised intercept: (intercept, [coefficients])."""
+    n = len(rows[0]) + 1
+    weights = weights or [1.0] * len(rows)
+    xtx = [[0.0] * n for _ in range(n)]
+    xty = [0.0] * n
+    for row, target, weight in zip(rows, targets, weights):
+        x = [1.0] + list(row)
+        for i in range(n):
+            xty[i] += weight * x[i] * target
+            for j in range(n):
+                xtx[i][j] += weight * x[i] * x[j]
+    for i in range(1, n):
+        xtx[i][i] += RIDGE
+    solution = _solve_linear(xtx, xty)
+    return solution[0], solution[1:]
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, z))))
+
+
+class SolveEstimator:
+    """
+    Predicts a solve's duration and the chance it ends without a schedule (proven
+    infeasible or out of time), from
+    instance_features. Seconds are a linear model of the features on the log scale,
+    the risk a logistic one; both are fitted by train() from recorded solves.
+    """
+
+    def __init__(self, model=None):
+        self.model = model or DEFAULT_MODEL
+
+    @classmethod
+    def from_env(cls):
+        """The model in TIMELY_ESTIMATOR_MODEL (written by benchmarks/train_estimator.py), else the default."""
+        path = os.environ.get('TIMELY_ESTIMATOR_MODEL')
+        if not path:
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _linear(self, part, features):
+        model = self.model
+        coefficients = model[part]
+        return coefficients['intercept'] + sum(
+            weight * (features[name] - model['means'][name]) / model['scales'][name]
+            for name, weight in coefficients['weights'].items())
+
+    def estimate(self, features):
+        """{'seconds', 'infeasibilityRisk', 'trained'} for the features of one payload."""
+        seconds = min(SOLVE_TIME_LIMIT, max(MIN_SOLVE_SECONDS, math.exp(self._linear('seconds', features))))
+        return {
+            'seconds': round(seconds, 1),
+            'infeasibilityRisk': round(_sigmoid(self._linear('risk', features)), 3),
+            'trained': self.model.get('trained', False),
+        }
+
+    @classmethod
+    def train(cls, samples):
+        """
+        Fits an estimator to samples of (features, seconds, found_schedule) from past solves.
+        Features are standardised; a constant feature gets no weight.
+        """
+        if len(samples) < 2:
+            raise ValueError(f"Need at least 2 recorded solves to train, got {len(samples)}.")
+        means, scales = {}, {}
+        for name in FEATURES:
+            values = [features[name] for features, _, _ in samples]
+            means[name] = sum(values) / len(values)
+            scales[name] = math.sqrt(sum((v - means[name]) ** 2 for v in values) / len(values)) or 1.0
+        rows = [[(features[name] - means[name]) / scales[name] for name in FEATURES] for features, _, _ in samples]
+
+        intercept, coefficients = _fit(rows, [math.log(max(0.05, seconds)) for _, seconds, _ in samples])
+        seconds_model = {'intercept': intercept, 'weights': dict(zip(FEATURES, coefficients))}
+
+        # Logistic regression by iteratively reweighted least squares.
+        labels = [0.0 if found else 1.0 for _, _, found in samples]
+        if 0 < sum(labels) < len(labels):
+            intercept, coefficients = math.log(sum(labels) / (len(labels) - sum(labels))), [0.0] * len(FEATURES)
+            for _ in range(25):
+                z = [intercept + sum(c * x for c, x in zip(coefficients, row)) for row in rows]
+                p = [_sigmoid(v) for v in z]
+                w = [max(1e-6, q * (1 - q)) for q in p]
+                working = [v + (y - q) / wq for v, y, q, wq in zip(z, labels, p, w)]
+                intercept, coefficients = _fit(rows, working, w)
+            risk_model = {'intercept': intercept, 'weights': dict(zip(FEATURES, coefficients))}
+        else:
+            # Every solve ended the same way: a constant, softened by one imagined opposite outcome.
+            rate = (sum(labels) + 0.5) / (len(labels) + 1)
+            risk_model = {'intercept': math.log(rate / (1 - rate)), 'weights': {}}
+
+        return cls({
+            'trained': True,
+            'trainedAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'samples': len(samples),
+            'means': means,
+            'scales': scales,
+            'seconds': seconds_model,
+            'risk': risk_model,
+        })
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.model, f, indent=2)
@@ -0,0 +1,250 @@
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a solve cannot be queued.
+    retry_after is the suggested wait in seconds (sent back as the Retry-After header).
+    """
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SolveJob:
+    """A single queued/running/finished solve."""
+
+    def __init__(self, tenant, fn, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.tenant = tenant
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Optional prediction for this solve ({'seconds', 'infeasibilityRisk', ...}, see
+        # solve_estimator); when set, it replaces the average solve time in the job's ETA.
+        self.estimate = None
+        self.done_event = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+
+class SolveScheduler:
+    """
+    Admission control for CP-SAT solves.
+
+    At most max_concurrent solves run at once (sized from the CPU budget and the
+    number of search workers per solve). Further solves wait in per-tenant queues
+    which are drained round-robin, so one institution submitting many requests
+    cannot starve the others. When the queue is full, submit() raises
+    QueueFullError instead of piling more work onto the box.
+    """
+
+    def __init__(self, max_concurrent=1, max_queue=20, max_queue_per_tenant=5,
+                 initial_solve_seconds=30.0, job_ttl_seconds=600):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.max_queue_per_tenant = max(1, int(max_queue_per_tenant))
+        self.job_ttl_seconds = job_ttl_seconds
+
+        # Exponential moving average of solve durations, used for ETA and Retry-After.
+        self.avg_solve_seconds = float(initial_solve_seconds)
+
+        self._lock = threading.Condition()
+        self._queues = OrderedDict()  # tenant -> deque of jobs; order is the round-robin rotation
+        self._queued_count = 0
+        self._running = {}
+        self._jobs = {}
+        self._workers = []
+
+    @classmethod
+    def from_env(cls, solver_threads):
+        """
+        Builds a scheduler from environment settings.
+        The CPU budget defaults to the cores available to this process divided by
+        the number of gunicorn workers (WEB_CONCURRENCY) sharing the box.
+        """
+        cpu_count = os.cpu_count() or 1
+        web_workers = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+        cpu_budget = int(os.environ.get('TIMELY_SOLVE_CPU_BUDGET', max(1, cpu_count // web_workers)))
+        default_concurrent = max(1, cpu_budget // max(1, solver_threads))
+        return cls(
+            max_concurrent=int(os.environ.get('TIMELY_MAX_CONCURRENT_SOLVES', default_concurrent)),
+            max_queue=int(os.environ.get('TIMELY_MAX_QUEUED_SOLVES', 20)),
+            max_queue_per_tenant=int(os.environ.get('TIMELY_MAX_QUEUED_SOLVES_PER_TENANT', 5)),
+        )
+
+    # --- SUBMISSION ---
+
+    def submit(self, tenant, fn, *args, estimate=None, **kwargs):
+        """
+        Queues fn(*args, **kwargs) for tenant and returns its SolveJob.
+        estimate is the job's predicted solve (see SolveJob.estimate).
+        """
+        tenant = tenant or 'default'
+        with self._lock:
+            self._ensure_workers()
+            self._expire_jobs()
+
+            # A free worker means the job starts immediately and never counts against the queue.
+            idle = len(self._running) + self._queued_count < self.max_concurrent
+            if not idle:
+                if self._queued_count >= self.max_queue:
+                    raise QueueFullError(
+                        f"Solver is busy ({self._queued_count} timetables queued). Please retry later.",
+                        self._retry_after(self._queued_count))
+                tenant_queue = self._queues.get(tenant)
+                if tenant_queue is not None and len(tenant_queue) >= self.max_queue_per_tenant:
+                    raise QueueFullError(
+                        f"Too many timetables queued for '{tenant}' ({len(tenant_queue)}). Please retry later.",
+                        self._retry_after(self._queued_count))
+
+            job = SolveJob(tenant, fn, args, kwargs)
+            job.estimate = estimate
+            self._jobs[job.id] = job
+            self._queues.setdefault(tenant, deque()).append(job)
+            self._queued_count += 1
+            self._lock.notify()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # --- REPORTING ---
+
+    def position(self, job):
+        """
+        1-based position of a queued job in dispatch order (0 if it is no longer queued).
+        Mirrors the round-robin in _next_job: a job at index k of its tenant's queue is
+        preceded by up to k+1 jobs of tenants ahead of it in the rotation and up to k
+        jobs of tenants behind it.
+        """
+        with self._lock:
+            if job.status != 'queued':
+                return 0
+            tenants = list(self._queues.keys())
+            own_queue = self._queues.get(job.tenant)
+            if own_queue is None or job not in own_queue:
+                return 0
+            k = own_queue.index(job)
+            own_rank = tenants.index(job.tenant)
+            ahead = k
+            for rank, tenant in enumerate(tenants):
+                if tenant == job.tenant:
+                    continue
+                limit = k + 1 if rank < own_rank else k
+                ahead += min(len(self._queues[tenant]), limit)
+            return ahead + 1
+
+    def eta_seconds(self, job):
+        """Rough estimate of seconds until the job finishes."""
+        if job.status in ('done', 'failed'):
+            return 0
+        own_seconds = job.estimate['seconds'] if job.estimate else self.avg_solve_seconds
+        if job.status == 'running':
+            elapsed = time.time() - job.started_at
+            return max(1, int(math.ceil(own_seconds - elapsed)))
+        waves = int(math.ceil(self.position(job) / self.max_concurrent))
+        return max(1, int(math.ceil(waves * self.avg_solve_seconds + own_seconds)))
+
+    def wait_seconds(self):
+        """Rough estimate of seconds before a solve submitted now would start."""
+        with self._lock:
+            if len(self._running) + self._queued_count < self.max_concurrent:
+                return 0
+            return self._retry_after(self._queued_count)
+
+    def describe(self, job):
+        """JSON-friendly status of a job for the polling endpoint."""
+        info = {
+            'jobId': job.id,
+            'state': job.status,
+            'tenant': job.tenant,
+            'position': self.position(job),
+            'etaSeconds': self.eta_seconds(job),
+        }
+        if job.estimate:
+            info['estimate'] = job.estimate
+        if job.status == 'failed':
+            info['error'] = job.error
+        return info
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': len(self._running),
+                'queued': self._queued_count,
+                'maxConcurrent': self.max_concurrent,
+                'maxQueue': self.max_queue,
+                'avgSolveSeconds': round(self.avg_solve_seconds, 2),
+                'queuedByTenant': {t: len(q) for t, q in self._queues.items()},
+            }
+
+    # --- DISPATCH ---
+
+    def _retry_after(self, queued):
+        waves = int(math.ceil((queued + 1) / self.max_concurrent))
+        return max(1, int(math.ceil(waves * self.avg_solve_seconds)))
+
+    def _ensure_workers(self):
+        # Workers are started lazily so importing the app (e.g. in tests or tools) starts no threads.
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._worker_loop, name=f'solve-worker-{len(self._workers)}', daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job(self):
+        # Round-robin across tenants: take the head of the first tenant's queue,
+        # then rotate that tenant to the back.
+        tenant, tenant_queue = next(iter(self._queues.items()))
+        job = tenant_queue.popleft()
+        del self._queues[tenant]
+        if tenant_queue:
+            self._queues[tenant] = tenant_queue
+        self._queued_count -= 1
+        return job
+
+    def _worker_loop(self):
+        while True:
+            with self._lock:
+                while not self._queued_count:
+                    self._lock.wait()
+                job = self._next_job()
+                job.status = 'running'
+                job.started_at = time.time()
+                self._running[job.id] = job
+
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                job.status = 'done'
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+
+            with self._lock:
+                job.finished_at = time.time()
+                self._running.pop(job.id, None)
+                duration = job.finished_at - job.started_at
+                self.avg_solve_seconds = 0.8 * self.avg_solve_seconds + 0.2 * duration
+                # Drop references to the payload; only the result is needed from here on.
+                job.args = job.kwargs = None
+            job.done_event.set()
+
+    def _expire_jobs(self):
+        cutoff = time.time() - self.job_ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,301 @@
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Solve entry points by settings.solveStrategy; unknown values use the weekly model.
+SOLVE_STRATEGIES = {
+    'full': 'timetable_engine:build_and_solve',
+    'day': 'decomposition:solve_by_day',
+    'lns': 'lns:solve_lns',
+    'hierarchical': 'hierarchy:solve_hierarchical',
+}
+
+
+def solve_path(data):
+    """module:function that solves data, chosen by settings.solveStrategy."""
+    settings = data.get('settings') if isinstance(data, dict) else None
+    strategy = settings.get('solveStrategy') if isinstance(settings, dict) else None
+    return SOLVE_STRATEGIES.get(strategy, SOLVE_STRATEGIES['full'])
+
+
+class SolverProcessError(Exception):
+    """A worker process was killed (time/memory limit) or died while running a job."""
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _resolve(fn_path):
+    module_name, fn_name = fn_path.split(':')
+    return getattr(importlib.import_module(module_name), fn_name)
+
+
+class _StreamedLog(list):
+    """
+    A job's debug_log inside a worker: every entry is also sent to the parent as it is
+    added, so the log survives the worker being killed mid-solve. Pickles as a plain list.
+    """
+
+    def __init__(self, entries, conn, lock):
+        super().__init__(entries)
+        self._conn = conn
+        self._lock = lock
+
+    def _send(self, entries):
+        with self._lock:  # strategies may log from several threads
+            self._conn.send(('log', entries))
+
+    def append(self, entry):
+        super().append(entry)
+        self._send([entry])
+
+    def extend(self, entries):
+        entries = list(entries)
+        super().extend(entries)
+        self._send(entries)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def _worker_main(conn, max_vmem_mb):
+    # Optional address-space cap as a backstop; the parent also watches RSS.
+    if max_vmem_mb and resource is not None:
+        limit = max_vmem_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    # Warm up: pay the ortools import and first model setup once per worker, not per solve.
+    from ortools.sat.python import cp_model
+    import timetable_engine
+    cp_model.CpModel().NewBoolVar('warmup')
+
+    send_lock = threading.Lock()
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        fn_path, args, log_index = message
+        if log_index is not None:
+            args = list(args)
+            args[log_index] = _StreamedLog(args[log_index], conn, send_lock)
+        try:
+            conn.send(('ok', _resolve(fn_path)(*args)))
+        except MemoryError:
+            conn.send(('memory', 'Solver ran out of memory while building or solving the model.'))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            conn.send(('error', str(e)))
+
+
+class _Worker:
+    def __init__(self, ctx, max_vmem_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, max_vmem_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    def rss_mb(self):
+        """Resident memory of the worker in MB, or None where /proc isn't available."""
+        try:
+            with open(f'/proc/{self.process.pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        self.kill()
+
+
+class SolverPool:
+    """
+    Runs solves in separate, pre-warmed worker processes.
+
+    The request process only parses, validates and encodes responses; the CP-SAT
+    model lives in a worker. A worker whose RSS goes over max_rss_mb or that runs
+    past timeout_seconds is killed and replaced, and the caller gets a clean error
+    instead of the web worker going down with it.
+    """
+
+    def __init__(self, processes=1, max_rss_mb=2048, timeout_seconds=180, max_jobs_per_worker=50,
+                 max_vmem_mb=None, num_workers=None, poll_interval=0.2):
+        self.processes = max(1, int(processes))
+        self.max_rss_mb = max_rss_mb
+        self.timeout_seconds = timeout_seconds
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_vmem_mb = max_vmem_mb
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.processes)
+        self._idle = []
+
+    @classmethod
+    def from_env(cls, processes, num_workers=None):
+        max_vmem_mb = int(os.environ.get('TIMELY_SOLVER_MAX_VMEM_MB', 0)) or None
+        return cls(
+            processes=processes,
+            max_rss_mb=int(os.environ.get('TIMELY_SOLVER_MAX_RSS_MB', 2048)),
+            timeout_seconds=float(os.environ.get('TIMELY_SOLVER_HARD_TIMEOUT', 180)),
+            max_jobs_per_worker=int(os.environ.get('TIMELY_SOLVER_MAX_JOBS_PER_WORKER', 50)),
+            max_vmem_mb=max_vmem_mb,
+            num_workers=num_workers,
+        )
+
+    def warm_up(self):
+        """Starts all worker processes now instead of on first use."""
+        with self._lock:
+            while len(self._idle) < self.processes:
+                self._idle.append(_Worker(self._ctx, self.max_vmem_mb))
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+    def solve(self, data, debug_log, profile=None):
+        """Runs the solve strategy of the payload (solve_path) in a worker. Returns (response_body, http_status)."""
+        return self.run(solve_path(data), data, debug_log, profile)
+
+    def run(self, fn_path, data, debug_log, profile=None):
+        """
+        Runs a solve entry point fn(data, debug_log, num_workers) in a worker.
+        With profile options, it runs under profiler.profile_call in the worker.
+        Returns its (response_body, http_status), or an error body if the worker was killed.
+        """
+        try:
+            if profile:
+                return self.call('profiler:profile_call', fn_path, profile, data, debug_log, self.num_workers,
+                                 debug_log=debug_log)
+            return self.call(fn_path, data, debug_log, self.num_workers, debug_log=debug_log)
+        except SolverProcessError as e:
+            return {'status': 'error', 'message': str(e), 'debug_log': debug_log}, e.status_code
+
+    def call(self, fn_path, *args, debug_log=None):
+        """
+        Runs module:function(*args) in a worker process and returns its result.
+        debug_log, one of args, is extended with the worker's entries as they are logged,
+        so it holds them even when the worker is killed.
+        Raises SolverProcessError if the worker is killed or dies.
+        """
+        log_index = next((i for i, arg in enumerate(args) if arg is debug_log), None) if debug_log is not None else None
+        with self._slots:
+            worker = self._checkout()
+            try:
+                result = self._run(worker, fn_path, args, log_index, debug_log)
+            except SolverProcessError:
+                worker.kill()
+                raise
+            except (EOFError, OSError):
+                worker.kill()
+                raise SolverProcessError('Solver process crashed unexpectedly.', 500)
+            self._checkin(worker)
+            return result
+
+    def _run(self, worker, fn_path, args, log_index=None, debug_log=None):
+        worker.conn.send((fn_path, args, log_index))
+        deadline = time.monotonic() + self.timeout_seconds
+        while True:
+            while not worker.conn.poll(self.poll_interval):
+                if time.monotonic() > deadline:
+                    raise SolverProcessError(
+                        f"Solver exceeded the hard time limit of {self.timeout_seconds:g} seconds and was stopped.", 504)
+                rss = worker.rss_mb()
+                if self.max_rss_mb and rss is not None and rss > self.max_rss_mb:
+                    raise SolverProcessError(
+                        f"Solver exceeded the memory limit ({rss:.0f} MB > {self.max_rss_mb} MB). The problem is too large; try splitting it into smaller requests.", 413)
+                if not worker.process.is_alive():
+                    raise SolverProcessError('Solver process crashed unexpectedly.', 500)
+            kind, value = worker.conn.recv()
+            if kind != 'log':
+                break
+            debug_log.extend(value)
+        worker.jobs_done += 1
+        if kind == 'memory':
+            raise SolverProcessError(value, 413)
+        if kind == 'error':
+            raise SolverProcessError(f"Server crashed: {value}", 500)
+        return value
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+        return _Worker(self._ctx, self.max_vmem_mb)
+
+    def _checkin(self, worker):
+        # Recycle long-lived workers so fragmentation or leaks in the native solver can't accumulate.
+        if self.max_jobs_per_worker and worker.jobs_done >= self.max_jobs_per_worker:
+            worker.stop()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+
+class InlineSolver:
+    """Same interface as SolverPool but solves in the calling thread (TIMELY_SOLVER_ISOLATION=inline)."""
+
+    def __init__(self, num_workers=None):
+        self.num_workers = num_workers
+
+    def solve(self, data, debug_log, profile=None):
+        return self.run(solve_path(data), data, debug_log, profile)
+
+    def run(self, fn_path, data, debug_log, profile=None):
+        import timetable_engine
+        try:
+            if profile:
+                import profiler
+                return profiler.profile_call(fn_path, profile, data, debug_log, self.num_workers)
+            return _resolve(fn_path)(data, debug_log, self.num_workers)
+        except Exception as e:
+            return timetable_engine.crash_response(e, debug_log)
+
+    def warm_up(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+def make_solver_backend(processes, num_workers=None):
+    """Process pool by default; TIMELY_SOLVER_ISOLATION=inline keeps solves in the web process."""
+    if os.environ.get('TIMELY_SOLVER_ISOLATION', 'process') == 'inline':
+        return InlineSolver(num_workers)
+    backend = SolverPool.from_env(processes, num_workers)
+    if os.environ.get('TIMELY_SOLVER_PREWARM', '') in ('1', 'true', 'yes'):
+        backend.warm_up()
+    return backend
@@ -0,0 +1,166 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ortools.sat.python import cp_model
+
+from timetable_engine import build_model, identical_group_classes
+
+
+class TestCompactModel(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM'],
+            'rooms': [
+                {'id': 'R1', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab'},
+                {'id': 'R2', 'capacity': 10, 'type': 'Classroom'},
+            ],
+            'instructors': [
+                {'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': [0, 1, 1]}},
+                {'id': 'I2', 'name': 'Inst2'},
+            ],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 2, 'qualifiedInstructors': ['I1']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1']}],
+            'settings': {}
+        }
+
+    def test_domains_are_filtered_instead_of_constrained(self):
+        tm = build_model(self.data, [])
+        lecture = tm.task_index['G1_C1_lec_0']
+        placements = {(tm.inst_ids[tm.var_inst[e]], tm.room_ids[tm.var_room[e]],
+                       tm.all_days[tm.var_day[e]], tm.var_slot[e]) for e in tm.entries(lecture)}
+        # Only I1 is qualified, R2 is too small, L1 is a lab and I1 is away Monday 9:00.
+        self.assertEqual(placements, {('I1', 'R1', day, s) for day in ('Mon', 'Tue') for s in range(3)} - {('I1', 'R1', 'Mon', 0)})
+
+    def test_lab_second_hour_shares_first_hour_literal(self):
+        tm = build_model(self.data, [])
+        first, second = tm.task_index['G1_C1_lab_0'], tm.task_index['G1_C1_lab_1']
+        self.assertEqual(len(tm.entries(first)), len(tm.entries(second)))
+        for e1, e2 in zip(tm.entries(first), tm.entries(second)):
+            self.assertIs(tm.var_lit[e1], tm.var_lit[e2])
+            self.assertEqual(tm.var_slot[e2], tm.var_slot[e1] + 1)
+            self.assertEqual(tm.room_ids[tm.var_room[e1]], 'L1')
+        # Second hours add no variables of their own.
+        self.assertEqual(len(tm.decision_vars), len(tm.var_lit) - len(tm.entries(second)))
+
+    def test_interchangeable_lectures_are_ordered(self):
+        self.data['courses'][0].update({'lectureHours': 3, 'labHours': 0})
+        self.data['days'] = ['Mon', 'Tue', 'Wed', 'Thu']
+
+        def enumerate_days(settings):
+            self.data['settings'] = settings
+            tm = build_model(self.data, [])
+            lectures = [tm.task_index[f'G1_C1_lec_{i}'] for i in range(3)]
+            found = []
+            class Collector(cp_model.CpSolverSolutionCallback):
+                def on_solution_callback(cb):
+                    found.append([next(tm.var_day[e] for e in tm.entries(k) if cb.Value(tm.var_lit[e])) for k in lectures])
+            solver = cp_model.CpSolver()
+            solver.parameters.enumerate_all_solutions = True
+            solver.parameters.num_search_workers = 1
+            solver.Solve(tm.model, Collector())
+            return found
+
+        ordered = enumerate_days({})
+        unordered = enumerate_days({'symmetryBreaking': False})
+        self.assertTrue(all(days == sorted(days) for days in ordered))
+        # Each ordered schedule stands for all 3! permutations of the lectures.
+        self.assertEqual(len(unordered), 6 * len(ordered))
+
+    def test_unstaffed_lectures_are_not_ordered(self):
+        # No qualified instructor: the lectures stay unscheduled and must not make the model infeasible.
+        self.data['courses'].append({'id': 'C2', 'name': 'Course2', 'lectureHours': 2, 'labHours': 0,
+                                     'qualifiedInstructors': []})
+        self.data['student_groups'][0]['enrolledCourses'].append('C2')
+        tm = build_model(self.data, [])
+        self.assertIsNone(tm.contradiction)
+        self.assertEqual(cp_model.CpSolver().Solve(tm.model), cp_model.OPTIMAL)
+
+    def test_identical_groups_are_detected(self):
+        groups = {
+            'A': {'id': 'A', 'size': 30, 'enrolledCourses': ['C1', 'C2']},
+            'B': {'id': 'B', 'name': 'Section B', 'size': 30, 'enrolledCourses': ['C2', 'C1']},
+            'C': {'id': 'C', 'size': 31, 'enrolledCourses': ['C1', 'C2']},
+            'D': {'id': 'D', 'size': 30, 'enrolledCourses': ['C1', 'C2'], 'preferredRoomId': 'R1'},
+            'E': {'id': 'E', 'size': 30, 'enrolledCourses': ['C1', 'C2']},
+        }
+        self.assertEqual(identical_group_classes(groups), [['A', 'B', 'E']])
+
+    def test_identical_groups_are_ordered(self):
+        self.data['rooms'][2]['capacity'] = 50
+        self.data['courses'][0]['labHours'] = 0
+        self.data['student_groups'] = [{'id': sg_id, 'size': 20, 'enrolledCourses': ['C1']} for sg_id in ('G1', 'G2')]
+        self.data['instructors'][1]['id'] = 'I2'
+        self.data['courses'][0]['qualifiedInstructors'] = ['I1', 'I2']
+
+        def count_solutions(settings):
+            self.data['settings'] = settings
+            tm = build_model(self.data, [])
+            anchors = [tm.task_index['G1_C1_lec_0'], tm.task_index['G2_C1_lec_0']]
+            found = []
+            class Collector(cp_model.CpSolverSolutionCallback):
+                def on_solution_callback(cb):
+                    found.append([next(tm.var_day[e] * tm.n_slots + tm.var_slot[e] for e in tm.entries(k) if cb.Value(tm.var_lit[e])) for k in anchors])
+            solver = cp_model.CpSolver()
+            solver.parameters.enumerate_all_solutions = True
+            solver.parameters.num_search_workers = 1
+            solver.Solve(tm.model, Collector())
+            return found
+
+        ordered = count_solutions({})
+        self.assertTrue(ordered)
+        self.assertTrue(all(first <= second for first, second in ordered))
+        self.assertLess(len(ordered), len(count_solutions({'symmetryBreaking': False})))
+
+    def test_gap_encodings_agree(self):
+        # I1 can only teach at 9:00 and 11:00 on Monday, so the group has a one-slot gap.
+        self.data['days'] = ['Mon']
+        self.data['courses'] = [
+            {'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+            {'id': 'C2', 'name': 'Course2', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+        ]
+        self.data['instructors'][0]['availability'] = {'Mon': [1, 0, 1]}
+        self.data['student_groups'][0]['enrolledCourses'] = ['C1', 'C2']
+
+        def gaps(encoding):
+            self.data['settings'] = {'gapPriority': 1.0, 'gapEncoding': encoding}
+            tm = build_model(self.data, [])
+            model = tm.model
+            model.Minimize(sum(tm.objective_tiers['gaps']))
+            solver = cp_model.CpSolver()
+            self.assertEqual(solver.Solve(model), cp_model.OPTIMAL)
+            return solver.ObjectiveValue()
+
+        self.assertEqual(gaps('prefix'), 10)
+        self.assertEqual(gaps('span'), 10)
+
+    def test_disabled_families_are_left_out(self):
+        # One instructor, two lectures, two consecutive slots: only the faculty break forbids it.
+        self.data['days'] = ['Mon']
+        self.data['timeslots'] = ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM']
+        self.data['courses'] = [
+            {'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+            {'id': 'C2', 'name': 'Course2', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+        ]
+        self.data['instructors'][0].pop('availability', None)
+        self.data['student_groups'][0]['enrolledCourses'] = ['C1', 'C2']
+
+        def status(disabled):
+            tm = build_model(self.data, [], disabled=disabled)
+            if tm.contradiction:
+                return cp_model.INFEASIBLE
+            return cp_model.CpSolver().Solve(tm.model)
+
+        self.assertEqual(status(()), cp_model.INFEASIBLE)
+        self.assertEqual(status(('facultyBreak',)), cp_model.OPTIMAL)
+        with self.assertRaises(ValueError):
+            build_model(self.data, [], disabled=('noSuchRule',))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import decomposition
+from app import app
+from decomposition import session_units, solve_by_day, teaching_capacity
+from schedule_validator import validate_schedule
+from timetable_engine import build_tasks, unpack_payload
+
+
+class TestDayDecomposition(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        days = ['Mon', 'Tue', 'Wed']
+        available = {day: [1, 1, 1, 1] for day in days}
+        self.data = {
+            'days': days,
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}, {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available},
+                            {'id': 'I2', 'name': 'Inst2', 'availability': available}],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 3, 'labHours': 2, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1', 'C2'], 'availability': available},
+                               {'id': 'G2', 'size': 20, 'enrolledCourses': ['C2'], 'availability': available}],
+            'settings': {'solveStrategy': 'day'}
+        }
+
+    def test_session_units_keep_lab_blocks_together(self):
+        all_instructors, all_courses, all_rooms, all_student_groups, *_ = unpack_payload(self.data)
+        units = session_units(build_tasks(all_student_groups, all_courses))
+        self.assertIn(('G1', 'C1', 'lab', ['G1_C1_lab_0', 'G1_C1_lab_1']), units)
+        self.assertEqual(sum(len(ids) for *_, ids in units), 3 + 2 + 2 + 2)
+
+    def test_teaching_capacity_allows_two_hour_blocks(self):
+        gaps = [0, 0, 0, 60, 0, 0]
+        self.assertEqual(teaching_capacity([True] * 7, gaps), 3 + 2)  # runs of 4 and 3 slots
+        self.assertEqual(teaching_capacity([True, False, True, True, True, True, True], gaps), 1 + 2 + 2)
+
+    def test_day_strategy_returns_a_valid_week(self):
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['decomposition']['strategy'], 'day')
+        self.assertEqual(len(body['schedule']), 9)
+        self.assertEqual(sum(day['sessions'] for day in body['decomposition']['days']), 9)
+        result, status = validate_schedule(dict(self.data, schedule=body['schedule']))
+        self.assertTrue(result['valid'], result['violations'])
+
+    def test_failed_day_is_redistributed(self):
+        calls = []
+        real = decomposition.build_and_solve
+
+        def first_monday_fails(data, debug_log, num_workers=None, time_limit=120.0, **kwargs):
+            calls.append(data['days'])
+            if data['days'] == ['Mon'] and calls.count(['Mon']) == 1:
+                return {'status': 'error', 'message': 'No solution found.'}, 400
+            return real(data, debug_log, num_workers, time_limit=time_limit, **kwargs)
+
+        with mock.patch.object(decomposition, 'build_and_solve', side_effect=first_monday_fails):
+            body, status = solve_by_day(self.data, [], 1, time_limit=30)
+        self.assertEqual(status, 200)
+        self.assertEqual(body['decomposition']['rounds'], 2)
+        self.assertEqual(len(body['schedule']), 9)
+        # Days whose sessions did not change are not solved again.
+        self.assertLess(len(calls), 6)
+
+    def test_hardware_labs_count_non_lab_rooms(self):
+        # A hardware lab can run in any room whose type mentions hardware, lab room or not.
+        days = ['Mon', 'Tue']
+        available = {day: [1, 1, 1] for day in days}
+        data = {
+            'days': days,
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'},
+                      {'id': 'H1', 'capacity': 50, 'type': 'Hardware Workshop'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available}],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 2, 'labType': 'Hardware Lab',
+                         'qualifiedInstructors': ['I1']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1'], 'availability': available}],
+            'settings': {},
+        }
+        body, status = solve_by_day(data, [], 1, time_limit=30)
+        self.assertEqual(status, 200, body.get('message'))
+        self.assertEqual(body['decomposition']['strategy'], 'day')
+        self.assertEqual({entry['room'] for entry in body['schedule'] if entry['type'] == 'lab'}, {'H1'})
+
+    def test_sessions_without_an_instructor_stay_unscheduled(self):
+        # Like the weekly model: an unknown preferred instructor or an empty qualified list leaves them out.
+        self.data['student_groups'][1]['instructorPreferences'] = {'C2': 'I9'}
+        self.data['courses'].append({'id': 'C3', 'name': 'Course3', 'lectureHours': 1, 'labHours': 0,
+                                     'qualifiedInstructors': []})
+        self.data['student_groups'][0]['enrolledCourses'].append('C3')
+        body, status = solve_by_day(self.data, [], 1, time_limit=30)
+        self.assertEqual(status, 200, body.get('message'))
+        self.assertEqual(len(body['schedule']), 7)
+        self.assertEqual({entry['group'] for entry in body['schedule']}, {'G1'})
+        self.assertNotIn('C3', {entry['courseId'] for entry in body['schedule']})
+
+    def test_impossible_distribution_is_reported(self):
+        # Three lectures of C1 but only two days: one lecture per course per day can't hold.
+        self.data['days'] = ['Mon', 'Tue']
+        body, status = solve_by_day(self.data, [], 1, time_limit=10)
+        self.assertEqual(status, 400)
+        self.assertEqual(body['status'], 'error')
+
+
+if __name__ == '__main__':
+    unittest.main()
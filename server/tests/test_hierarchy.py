@@ -0,0 +1,95 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import hierarchy
+from app import app
+from hierarchy import cohort_tiers, solve_hierarchical
+from schedule_validator import validate_schedule
+
+
+class TestHierarchicalSolve(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        days = ['Mon', 'Tue', 'Wed']
+        available = {day: [1, 1, 1, 1] for day in days}
+        self.data = {
+            'days': days,
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}, {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available},
+                            {'id': 'I2', 'name': 'Inst2', 'availability': available}],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 3, 'labHours': 2, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [{'id': 'Y4-A', 'size': 20, 'enrolledCourses': ['C1', 'C2'], 'availability': available},
+                               {'id': 'Y3-A', 'size': 20, 'enrolledCourses': ['C2'], 'availability': available},
+                               {'id': 'Y1-A', 'size': 20, 'enrolledCourses': ['C2'], 'availability': available}],
+            'settings': {'solveStrategy': 'hierarchical', 'cohortPriority': ['Y4-*', ['Y3-A']]},
+        }
+
+    def test_cohort_tiers_follow_the_priority(self):
+        groups = ['Y1-A', 'Y4-A', 'Y4-B', 'Y3-A']
+        self.assertEqual(cohort_tiers(groups, ['Y4-*', ['Y3-A', 'Y9-A']]), [['Y4-A', 'Y4-B'], ['Y3-A'], ['Y1-A']])
+        self.assertEqual(cohort_tiers(groups, None), [groups])
+
+    def test_hierarchical_strategy_returns_a_valid_week(self):
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual([tier['groups'] for tier in body['hierarchy']['tiers']], [['Y4-A'], ['Y3-A'], ['Y1-A']])
+        self.assertEqual(len(body['schedule']), 11)
+        result, status = validate_schedule(dict(self.data, schedule=body['schedule']))
+        self.assertTrue(result['valid'], result['violations'])
+
+    def test_unstaffed_sessions_are_left_out_of_later_tiers(self):
+        # The engine leaves sessions without a qualified instructor unscheduled.
+        self.data['courses'].append({'id': 'C3', 'name': 'Course3', 'lectureHours': 1, 'labHours': 0,
+                                     'qualifiedInstructors': []})
+        self.data['student_groups'][0]['enrolledCourses'].append('C3')
+        body, status = solve_hierarchical(self.data, [], 1, time_limit=30)
+        self.assertEqual(status, 200, body.get('message'))
+        self.assertEqual(len(body['schedule']), 11)
+        self.assertNotIn('C3', {entry['courseId'] for entry in body['schedule']})
+
+    def test_failed_tier_reopens_the_one_before(self):
+        calls = []
+        real = hierarchy.build_and_solve
+
+        def second_tier_fails_once(data, debug_log, num_workers=None, fixed_assignments=None, hint_assignments=None,
+                                   time_limit=120.0, tasks=None):
+            calls.append((len(tasks), len(fixed_assignments)))
+            if len(calls) == 2:
+                return {'status': 'error', 'message': 'No solution found.'}, 400
+            return real(data, debug_log, num_workers, fixed_assignments, hint_assignments, time_limit, tasks)
+
+        with mock.patch.object(hierarchy, 'build_and_solve', side_effect=second_tier_fails_once):
+            body, status = solve_hierarchical(self.data, [], 1, time_limit=30)
+        self.assertEqual(status, 200)
+        self.assertEqual(body['hierarchy']['backtracks'], 1)
+        # Tier 2 retried with tier 1 reopened, then tier 3 with tiers 1 and 2 fixed.
+        self.assertEqual(calls, [(7, 0), (9, 7), (9, 0), (11, 9)])
+
+    def test_backtracking_can_be_switched_off(self):
+        self.data['settings']['cohortBacktrack'] = 0
+        real = hierarchy.build_and_solve
+
+        def second_tier_fails(data, debug_log, num_workers=None, fixed_assignments=None, **kwargs):
+            if fixed_assignments:
+                return {'status': 'error', 'message': 'No solution found.'}, 400
+            return real(data, debug_log, num_workers, fixed_assignments, **kwargs)
+
+        with mock.patch.object(hierarchy, 'build_and_solve', side_effect=second_tier_fails):
+            body, status = solve_hierarchical(self.data, [], 1, time_limit=10)
+        self.assertEqual(status, 400)
+        self.assertEqual(body['hierarchy']['failedTier'], 2)
+        self.assertEqual(body['hierarchy']['backtracks'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
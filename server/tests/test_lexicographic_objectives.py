@@ -0,0 +1,66 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import the engine
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from timetable_engine import solve_timetable
+
+
+class TestLexicographicObjectives(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['08:30 AM - 09:30 AM', '09:30 AM - 10:30 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [
+                {'id': 'R1', 'capacity': 50, 'type': 'Lab'},
+                {'id': 'CR1', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'CR2', 'capacity': 50, 'type': 'Classroom'},
+            ],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 1, 1]}}],
+            'courses': [
+                {'id': 'C1', 'name': 'LabCourse', 'lectureHours': 0, 'labHours': 2, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Lecture', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+            ],
+            'student_groups': [{
+                'id': 'G1',
+                'size': 20,
+                'enrolledCourses': ['C1', 'C2'],
+                'availability': {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 1, 1]},
+                'preferredRoomId': 'CR2',
+            }],
+            'settings': {'disallow830Labs': True, 'gapPriority': 1.0, 'optimizationMode': 'lexicographic'}
+        }
+
+    def test_stages_follow_priority(self):
+        body, status_code = solve_timetable(self.data)
+        self.assertEqual(status_code, 200, body.get('message'))
+
+        stages = body['objectiveStages']
+        self.assertEqual([s['objective'] for s in stages], ['lab830', 'gaps', 'preferences'])
+        self.assertEqual(stages[0]['value'], 0)
+        # Only the two lab hours are penalised: labs can't use the preferred classroom.
+        self.assertEqual(stages[2]['value'], 10)
+
+        lab_times = {s['timeslot'] for s in body['schedule'] if s['courseId'] == 'C1'}
+        self.assertNotIn('08:30 AM - 09:30 AM', lab_times)
+        lecture_rooms = {s['room'] for s in body['schedule'] if s['courseId'] == 'C2'}
+        self.assertEqual(lecture_rooms, {'CR2'})
+
+    def test_custom_priority(self):
+        self.data['settings']['objectivePriority'] = ['preferences', 'lab830']
+        body, status_code = solve_timetable(self.data)
+        self.assertEqual(status_code, 200, body.get('message'))
+        # Tiers missing from objectivePriority still run, after the listed ones.
+        self.assertEqual([s['objective'] for s in body['objectiveStages']], ['preferences', 'lab830', 'gaps'])
+
+    def test_weighted_mode_has_no_stages(self):
+        self.data['settings']['optimizationMode'] = 'weighted'
+        body, status_code = solve_timetable(self.data)
+        self.assertEqual(status_code, 200, body.get('message'))
+        self.assertNotIn('objectiveStages', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import random
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from lns import NeighbourhoodPicker, schedule_entries, solve_lns
+from schedule_validator import validate_schedule
+from timetable_engine import MODEL_CACHE, build_model_cached
+
+
+class TestLargeNeighbourhoodSearch(unittest.TestCase):
+    def setUp(self):
+        MODEL_CACHE.clear()
+        self.client = app.test_client()
+        days = ['Mon', 'Tue', 'Wed']
+        available = {day: [1, 1, 1, 1] for day in days}
+        self.data = {
+            'days': days,
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}, {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available},
+                            {'id': 'I2', 'name': 'Inst2', 'availability': available}],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 3, 'labHours': 2, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1', 'C2'], 'availability': available},
+                               {'id': 'G2', 'size': 20, 'enrolledCourses': ['C2'], 'availability': available}],
+            'settings': {'solveStrategy': 'lns', 'preferredMorningCourses': ['C2'], 'lnsSubTimeLimit': 1},
+        }
+
+    def test_lns_strategy_returns_a_valid_week(self):
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(len(body['schedule']), 9)
+        report = body['lns']
+        self.assertLessEqual(report['objective'], report['initialObjective'])
+        result, status = validate_schedule(dict(self.data, schedule=body['schedule']))
+        self.assertTrue(result['valid'], result['violations'])
+
+    def test_supplied_schedule_is_the_starting_point(self):
+        first, status = solve_lns(self.data, [], 1, time_limit=10)
+        self.assertEqual(status, 200)
+        body, status = solve_lns(dict(self.data, schedule=first['schedule']), [], 1, time_limit=10)
+        self.assertEqual(status, 200)
+        self.assertEqual(body['lns']['initialObjective'], first['lns']['objective'])
+
+    def test_unstaffed_sessions_stay_unscheduled(self):
+        self.data['courses'].append({'id': 'C3', 'name': 'Course3', 'lectureHours': 1, 'labHours': 0,
+                                     'qualifiedInstructors': []})
+        self.data['student_groups'][0]['enrolledCourses'].append('C3')
+        log = []
+        body, status = solve_lns(self.data, log, 1, time_limit=10)
+        self.assertEqual(status, 200, body.get('message'))
+        self.assertEqual(len(body['schedule']), 9)
+        self.assertFalse(any('does not fit' in msg for msg in log), log)
+
+    def test_seed_is_renumbered_for_the_symmetry_breaking(self):
+        # G3 is a parallel section of G1: swapping their timetables breaks the group order the model expects.
+        days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
+        available = {day: [1, 1, 1, 1] for day in days}
+        self.data['days'] = days
+        for entity in self.data['instructors'] + self.data['student_groups']:
+            entity['availability'] = available
+        self.data['student_groups'].append(dict(self.data['student_groups'][0], id='G3'))
+        first, status = solve_lns(self.data, [], 1, time_limit=10)
+        self.assertEqual(status, 200, first.get('message'))
+        swapped = [dict(entry, group={'G1': 'G3', 'G3': 'G1'}.get(entry['group'], entry['group']))
+                   for entry in first['schedule']]
+        log = []
+        body, status = solve_lns(dict(self.data, schedule=swapped), log, 1, time_limit=10)
+        self.assertEqual(status, 200)
+        self.assertIn('LNS: first schedule from the supplied schedule', ' '.join(log))
+        self.assertEqual(body['lns']['initialObjective'], first['lns']['objective'])
+
+    def test_neighbourhoods_move_lab_blocks_together(self):
+        tm, _ = build_model_cached(self.data, [])
+        body, status = solve_lns(self.data, [], 1, time_limit=10)
+        placed = schedule_entries(tm, body['schedule'])
+        self.assertEqual(len(placed), len(tm.task_ids))
+        chosen = [placed[k] for k in range(len(tm.task_ids))]
+        picker = NeighbourhoodPicker(tm, random.Random(1))
+        for _ in range(20):
+            kind, names, free = picker.draw(chosen)
+            for k in free:
+                partner = tm.task_pair_first[k]
+                self.assertTrue(partner < 0 or partner in free, (kind, names))
+
+
+if __name__ == '__main__':
+    unittest.main()
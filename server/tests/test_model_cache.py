@@ -0,0 +1,64 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model_cache import structure_key
+from timetable_engine import MODEL_CACHE, build_and_solve
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        MODEL_CACHE.clear()
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '01:00 PM - 02:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}, {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1'}, {'id': 'I2', 'name': 'Inst2'}],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 2, 'labHours': 2, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1', 'C2']}],
+            'settings': {}
+        }
+
+    def tearDown(self):
+        MODEL_CACHE.clear()
+
+    def test_structure_key_ignores_soft_settings(self):
+        key = structure_key(self.data)
+        soft = dict(self.data, settings={'gapPriority': 2.0, 'fairWorkload': True}, institutionId='X')
+        self.assertEqual(structure_key(soft), key)
+        self.assertNotEqual(structure_key(dict(self.data, settings={'symmetryBreaking': False})), key)
+        self.assertNotEqual(structure_key(dict(self.data, days=['Mon'])), key)
+
+    def test_settings_change_reuses_hard_model(self):
+        debug_log = []
+        body, status = build_and_solve(self.data, debug_log, 1, time_limit=10)
+        self.assertEqual(status, 200)
+        self.assertFalse(any('Model cache hit' in msg for msg in debug_log))
+        cached = MODEL_CACHE.get(structure_key(self.data))
+        n_variables = len(cached.model.Proto().variables)
+
+        self.data['settings'] = {'gapPriority': 2.0, 'preferredMorningCourses': ['C1'], 'fairWorkload': True}
+        debug_log = []
+        body, status = build_and_solve(self.data, debug_log, 1, time_limit=10)
+        self.assertEqual(status, 200)
+        self.assertTrue(any('Model cache hit' in msg for msg in debug_log))
+        self.assertTrue(any('Warm-starting' in msg for msg in debug_log))
+        self.assertEqual(len(body['schedule']), 6)
+        # Objectives went to a fork; the cached hard model is unchanged.
+        self.assertEqual(len(cached.model.Proto().variables), n_variables)
+        self.assertFalse(cached.model.Proto().HasField('objective'))
+
+        MODEL_CACHE.clear()
+        uncached, status = build_and_solve(self.data, [], 1, time_limit=10)
+        morning = lambda schedule: sum('AM' in entry['timeslot'] for entry in schedule if entry['courseId'] == 'C1')
+        self.assertEqual(morning(body['schedule']), morning(uncached['schedule']))
+
+
+if __name__ == '__main__':
+    unittest.main()
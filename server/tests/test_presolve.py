@@ -0,0 +1,109 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from feasibility import hall_violator, max_matching
+from timetable_engine import build_and_solve, build_model
+
+
+class TestForcedAssignmentPresolve(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'days': ['Mon'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [
+                {'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': [1, 0, 0]}},
+                {'id': 'I2', 'name': 'Inst2', 'availability': {'Mon': [1, 1, 0]}},
+                {'id': 'I3', 'name': 'Inst3'},
+            ],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I2']},
+                {'id': 'C3', 'name': 'Course3', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I3']},
+            ],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1', 'C2', 'C3']}],
+            'settings': {}
+        }
+
+    def test_forced_placements_propagate_to_a_fixed_point(self):
+        tm = build_model(self.data, [])
+        self.assertIsNone(tm.contradiction)
+        # C1 can only go at 9:00, which forces C2 to 10:00 and C3 to 11:00.
+        for task_id, slot in (('G1_C1_lec_0', 0), ('G1_C2_lec_0', 1), ('G1_C3_lec_0', 2)):
+            entries = tm.entries(tm.task_index[task_id])
+            self.assertEqual(len(entries), 1, task_id)
+            self.assertEqual(tm.var_slot[entries[0]], slot)
+
+    def test_contradiction_is_reported_without_solving(self):
+        self.data['instructors'][1]['availability'] = {'Mon': [1, 0, 0]}
+        body, status = build_and_solve(self.data, [])
+        self.assertEqual(status, 400)
+        self.assertIn("no feasible slot left", body['message'])
+        self.assertIn("Mon 09:00 AM - 10:00 AM", body['message'])
+
+    def test_task_without_any_placement_is_reported(self):
+        self.data['rooms'][0]['capacity'] = 10
+        body, status = build_and_solve(self.data, [])
+        self.assertEqual(status, 400)
+        self.assertIn("No instructor, room and timeslot", body['message'])
+
+
+class TestBottleneckCheck(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '01:00 PM - 02:00 PM', '02:00 PM - 03:00 PM'],
+            'rooms': [
+                {'id': 'R1', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'R2', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab', 'availability': {'Mon': [1, 1, 0, 0], 'Tue': [0, 0, 0, 0]}},
+            ],
+            'instructors': [
+                {'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': [1, 0, 1, 0], 'Tue': [0, 0, 0, 0]}},
+                {'id': 'I2', 'name': 'Inst2'},
+                {'id': 'I3', 'name': 'Inst3'},
+            ],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 0, 'labHours': 2, 'qualifiedInstructors': ['I2', 'I3']},
+            ],
+            'student_groups': [
+                {'id': 'G1', 'size': 20, 'enrolledCourses': ['C1']},
+                {'id': 'G2', 'size': 20, 'enrolledCourses': ['C1']},
+            ],
+            'settings': {}
+        }
+
+    def test_matching_and_hall_violator(self):
+        adjacency = [['a'], ['a', 'b'], ['b'], ['c']]
+        match = max_matching(adjacency)
+        self.assertEqual(len(match), 3)
+        left, right = hall_violator(adjacency, match)
+        self.assertEqual((len(left), right), (3, {'a', 'b'}))
+        self.assertIsNone(hall_violator([['a'], ['b']], max_matching([['a'], ['b']])))
+
+    def test_feasible_payload_passes(self):
+        tm = build_model(self.data, [])
+        self.assertIsNone(tm.contradiction)
+
+    def test_overbooked_instructor_is_named(self):
+        self.data['student_groups'].append({'id': 'G3', 'size': 20, 'enrolledCourses': ['C1']})
+        body, status = build_and_solve(self.data, [])
+        self.assertEqual(status, 400)
+        self.assertIn("Instructor 'Inst1' is the only option for 3 hours", body['message'])
+
+    def test_overbooked_lab_room_is_named(self):
+        for group in self.data['student_groups']:
+            group['enrolledCourses'] = ['C2']
+        body, status = build_and_solve(self.data, [])
+        self.assertEqual(status, 400)
+        self.assertIn("2 lab hours", body['message'])
+        self.assertIn("lab rooms L1", body['message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from model_cache import structure_key
+from problem_store import ProblemNotFound, ProblemStore, VersionConflict, apply_patch
+
+
+def master_data():
+    available = {'Mon': [1, 1, 1], 'Tue': [1, 1, 1]}
+    return {
+        'days': ['Mon', 'Tue'],
+        'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM'],
+        'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}],
+        'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available}, {'id': 'I2', 'name': 'Inst2', 'availability': available}],
+        'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I1']}],
+        'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1'], 'availability': available}],
+        'settings': {'gapPriority': 1.0},
+    }
+
+
+class TestProblemStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ProblemStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_apply_patch_by_id(self):
+        data = master_data()
+        patched = apply_patch(data, {
+            'instructors': {'I2': {'availability': {'Mon': [0, 1, 1]}}, 'I1': None, 'I3': {'name': 'Inst3'}},
+            'settings': {'fairWorkload': True},
+            'days': ['Mon'],
+        })
+        self.assertEqual(patched['instructors'], [
+            {'id': 'I2', 'name': 'Inst2', 'availability': {'Mon': [0, 1, 1], 'Tue': [1, 1, 1]}},
+            {'id': 'I3', 'name': 'Inst3'},
+        ])
+        self.assertEqual(patched['settings'], {'gapPriority': 1.0, 'fairWorkload': True})
+        self.assertEqual(patched['days'], ['Mon'])
+        self.assertEqual(data, master_data())  # input untouched
+        with self.assertRaises(ValueError):
+            apply_patch(data, {'instructors': [{'id': 'I1'}]})
+
+    def test_versions_and_conflicts(self):
+        meta = self.store.create('uni', master_data())
+        problem_id = meta['problemId']
+        patched = self.store.patch('uni', problem_id, {'rooms': {'R2': {'capacity': 30, 'type': 'Classroom'}}}, base_version=1)
+        self.assertEqual(patched['version'], 2)
+        self.assertNotEqual(patched['hash'], meta['hash'])
+
+        with self.assertRaises(VersionConflict):
+            self.store.patch('uni', problem_id, {'days': ['Mon']}, base_version=1)
+        self.assertEqual(len(self.store.get('uni', problem_id, 1)[0]['rooms']), 1)
+        # A fresh store reads the same versions back from disk.
+        data, latest = ProblemStore(self.directory).get('uni', problem_id)
+        self.assertEqual((latest['version'], len(data['rooms'])), (2, 2))
+        with self.assertRaises(ProblemNotFound):
+            self.store.get('other-tenant', problem_id)
+
+    def test_resolve_request(self):
+        meta = self.store.create('uni', master_data())
+        payload = self.store.resolve('uni', {'problemId': meta['problemId'], 'settings': {'fairWorkload': True}, 'async': True})
+        self.assertEqual(payload['settings'], {'gapPriority': 1.0, 'fairWorkload': True})
+        self.assertEqual(payload['problemRef']['hash'], meta['hash'])
+        self.assertTrue(payload['async'])
+        # Soft settings don't change the model cache key; an inline structural patch does.
+        self.assertEqual(structure_key(payload), structure_key(dict(payload, settings={})))
+        patched = self.store.resolve('uni', {'problemId': meta['problemId'], 'patch': {'days': ['Mon']}})
+        self.assertNotIn('hash', patched['problemRef'])
+        self.assertEqual(patched['days'], ['Mon'])
+        self.assertNotEqual(structure_key(patched), structure_key(payload))
+
+
+class TestProblemEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original_store = app_module.problem_store
+        app_module.problem_store = ProblemStore(self.directory)
+        self.client = app_module.app.test_client()
+
+    def tearDown(self):
+        app_module.problem_store = self.original_store
+        shutil.rmtree(self.directory)
+
+    def test_upload_patch_and_solve_by_reference(self):
+        response = self.client.post('/problems', json=master_data())
+        self.assertEqual(response.status_code, 201)
+        problem_id = response.get_json()['problemId']
+
+        response = self.client.patch(f'/problems/{problem_id}', json={'courses': {'C1': {'qualifiedInstructors': ['I2']}}},
+                                     headers={'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], '"2"')
+        response = self.client.patch(f'/problems/{problem_id}', json={'days': ['Mon']}, headers={'If-Match': '"1"'})
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.post('/generate-timetable', json={'problemId': problem_id})
+        self.assertEqual(response.status_code, 200, response.get_json())
+        schedule = response.get_json()['schedule']
+        self.assertEqual({entry['instructorId'] for entry in schedule}, {'I2'})
+
+        response = self.client.post('/generate-timetable', json={'problemId': problem_id, 'version': 1})
+        self.assertEqual({entry['instructorId'] for entry in response.get_json()['schedule']}, {'I1'})
+
+        self.assertEqual(self.client.post('/generate-timetable', json={'problemId': 'missing'}).status_code, 404)
+        versions = self.client.get(f'/problems/{problem_id}/versions').get_json()['versions']
+        self.assertEqual([v['version'] for v in versions], [1, 2])
+
+    def test_problems_belong_to_the_header_institution(self):
+        headers = {'X-Institution-Id': 'uniX'}
+        response = self.client.post('/problems', json=dict(master_data(), institutionId='uniX'), headers=headers)
+        self.assertEqual(response.status_code, 201)
+        problem_id = response.get_json()['problemId']
+
+        self.assertEqual(self.client.get(f'/problems/{problem_id}', headers=headers).status_code, 200)
+        response = self.client.patch(f'/problems/{problem_id}', json={'courses': {'C1': {'qualifiedInstructors': ['I2']}}},
+                                     headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['version'], 2)
+        versions = self.client.get(f'/problems/{problem_id}/versions', headers=headers).get_json()['versions']
+        self.assertEqual(len(versions), 2)
+        response = self.client.post('/generate-timetable', json={'problemId': problem_id, 'institutionId': 'uniX'},
+                                    headers=headers)
+        self.assertEqual(response.status_code, 200, response.get_json())
+
+        # Other institutions can't see it.
+        self.assertEqual(self.client.get(f'/problems/{problem_id}').status_code, 404)
+        # A body institutionId alone would store the problem where reads can't find it, so it is refused.
+        response = self.client.post('/problems', json=dict(master_data(), institutionId='uniX'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('X-Institution-Id', response.get_json()['message'])
+        response = self.client.post('/generate-timetable', json={'problemId': problem_id, 'institutionId': 'uniX'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from profiler import profile_call
+
+
+class TestRequestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        available = {'Mon': [1, 1, 1]}
+        self.data = {
+            'days': ['Mon'],
+            'timeslots': ['09:00 AM - 10:00 AM', '11:00 AM - 12:00 PM', '01:00 PM - 02:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available}],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1'], 'availability': available}],
+            'settings': {}
+        }
+
+    def test_profile_call_adds_summaries(self):
+        body, status = profile_call('timetable_engine:build_and_solve', {'memory': True, 'limit': 50}, self.data, [], 1)
+        self.assertEqual(status, 200)
+        functions = [row['function'] for row in body['profile']['cpu']['functions']]
+        self.assertTrue(any('build_hard_model' in name for name in functions))
+        self.assertLessEqual(len(functions), 50)
+        self.assertTrue(body['profile']['memory']['sites'])
+        self.assertIn('schedule', body)
+
+    def test_profiling_requires_token(self):
+        with mock.patch.dict(os.environ, {'TIMELY_PROFILE_TOKEN': ''}):
+            response = self.client.post('/generate-timetable?profile=1', json=self.data)
+            self.assertEqual(response.status_code, 403)
+        with mock.patch.dict(os.environ, {'TIMELY_PROFILE_TOKEN': 'secret'}):
+            response = self.client.post('/generate-timetable?profile=1', json=self.data, headers={'X-Profile-Token': 'wrong'})
+            self.assertEqual(response.status_code, 403)
+            response = self.client.post('/generate-timetable', json=self.data,
+                                        headers={'X-Timely-Profile': '1', 'X-Profile-Token': 'secret'})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.get_json()['profile']['cpu']['functions'])
+
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertNotIn('profile', response.get_json())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+
+
+class TestReschedule(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        full_day = [1, 1, 1, 1]
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [
+                {'id': 'CR1', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'CR2', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'LAB1', 'capacity': 50, 'type': 'Computer Lab'},
+            ],
+            'instructors': [
+                {'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': full_day, 'Tue': full_day}},
+                {'id': 'I2', 'name': 'Inst2', 'availability': {'Mon': full_day, 'Tue': full_day}},
+                {'id': 'I3', 'name': 'Inst3', 'availability': {'Mon': full_day, 'Tue': full_day}},
+            ],
+            'courses': [
+                {'id': 'C1', 'name': 'Maths', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I1', 'I3']},
+                {'id': 'C2', 'name': 'Physics', 'lectureHours': 1, 'labHours': 2, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [
+                {'id': 'G1', 'size': 30, 'enrolledCourses': ['C1', 'C2'], 'availability': {'Mon': full_day, 'Tue': full_day},
+                 'instructorPreferences': {'C1': 'I1'}},
+                {'id': 'G2', 'size': 30, 'enrolledCourses': ['C1'], 'availability': {'Mon': full_day, 'Tue': full_day}},
+            ],
+            'settings': {}
+        }
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 200, response.get_json().get('message'))
+        self.schedule = response.get_json()['schedule']
+
+    def test_room_outage_moves_only_affected_sessions(self):
+        used = [s for s in self.schedule if s['room'] == 'CR1' and s['day'] == 'Mon']
+        if not used:
+            self.skipTest('Solver did not use CR1 on Monday')
+
+        payload = dict(self.data, schedule=self.schedule,
+                       event={'type': 'roomOutage', 'roomId': 'CR1', 'days': ['Mon']})
+        response = self.client.post('/reschedule', json=payload)
+        result = response.get_json()
+        self.assertEqual(response.status_code, 200, result.get('message'))
+        self.assertEqual(len(result['schedule']), len(self.schedule))
+        self.assertFalse([s for s in result['schedule'] if s['room'] == 'CR1' and s['day'] == 'Mon'])
+        self.assertEqual(result['neighbourhood'], 'affected')
+        self.assertLessEqual(len(result['changed']), result['freedSessions'])
+
+        # Sessions outside the neighbourhood keep their placement.
+        moved = {(s['group'], s['courseId'], s['type']) for s in used}
+        kept_before = sorted((s['group'], s['courseId'], s['day'], s['timeslot'], s['room'])
+                             for s in self.schedule if (s['group'], s['courseId'], s['type']) not in moved)
+        kept_after = sorted((s['group'], s['courseId'], s['day'], s['timeslot'], s['room'])
+                            for s in result['schedule'] if (s['group'], s['courseId'], s['type']) not in moved)
+        self.assertEqual(kept_before, kept_after)
+
+    def test_instructor_absence_widens_neighbourhood_when_needed(self):
+        # G1 must be taught C1 by I1, so a full-week absence of I1 is infeasible.
+        payload = dict(self.data, schedule=self.schedule,
+                       event={'type': 'instructorAbsence', 'instructorId': 'I1'})
+        response = self.client.post('/reschedule', json=payload)
+        self.assertEqual(response.status_code, 400)
+
+        # With G1's preference dropped, I3 can take over I1's sessions.
+        self.data['student_groups'][0]['instructorPreferences'] = {}
+        payload = dict(self.data, schedule=self.schedule,
+                       event={'type': 'instructorAbsence', 'instructorId': 'I1', 'days': ['Mon', 'Tue']})
+        response = self.client.post('/reschedule', json=payload)
+        result = response.get_json()
+        self.assertEqual(response.status_code, 200, result.get('message'))
+        self.assertFalse([s for s in result['schedule'] if s['instructorId'] == 'I1'])
+        self.assertEqual(len(result['schedule']), len(self.schedule))
+
+    def test_outage_of_a_room_named_like_an_instructor(self):
+        # A room whose id is also an instructor id: its outage leaves the instructor's sessions alone.
+        taught = [s for s in self.schedule if s['instructorId'] == 'I2']
+        self.data['rooms'] = self.data['rooms'] + [{'id': 'I2', 'capacity': 50, 'type': 'Classroom'}]
+        payload = dict(self.data, schedule=self.schedule,
+                       event={'type': 'roomOutage', 'roomId': 'I2', 'days': [taught[0]['day']]})
+        response = self.client.post('/reschedule', json=payload)
+        result = response.get_json()
+        self.assertEqual(response.status_code, 200, result.get('message'))
+        self.assertEqual(result['changed'], [])
+        self.assertEqual(result['freedSessions'], 0)
+
+    def test_unknown_event(self):
+        payload = dict(self.data, schedule=self.schedule, event={'type': 'fire'})
+        response = self.client.post('/reschedule', json=payload)
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_limits(self):
+        payload = dict(self.data, schedule=self.schedule, maxFreeSessions='ten',
+                       event={'type': 'roomOutage', 'roomId': 'CR1', 'days': ['Mon']})
+        response = self.client.post('/reschedule', json=payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('maxFreeSessions', response.get_json()['message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
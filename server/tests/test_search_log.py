@@ -0,0 +1,97 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from search_log import parse_search_log
+from timetable_engine import build_and_solve
+
+SAMPLE_LOG = """
+Starting CP-SAT solver v9.8.3296
+
+Initial optimization model '': (model_fingerprint: 0x606c29d52da75da9)
+#Variables: 1'658 (#bools: 152 #ints: 6 in objective)
+  - 634 Booleans in [0,1]
+#kAtMostOne: 116 (#literals: 1'836)
+#kExactlyOne: 20 (#literals: 614)
+
+Starting presolve at 0.00s
+Presolve summary:
+  - 1 affine relations were detected.
+  - rule 'at_most_one: removed literals' was applied 114 times.
+  - rule 'linear: empty' was applied 1 time.
+
+Presolved optimization model '': (model_fingerprint: 0x71407611bb747fc)
+#Variables: 432 (#bools: 77 #ints: 6 in objective)
+#kAtMostOne: 85 (#literals: 1'336)
+
+#Bound   0.06s best:inf   next:[20,1085]  initial_domain
+Starting search at 0.07s with 8 workers.
+#1       0.17s best:315   next:[20,310]   no_lp (fixed_bools=0/470)
+#2       0.33s best:120   next:[20,115]   rnd_cst_lns (d=0.50 s=10 t=0.10)
+#Bound   1.55s best:120   next:[60,115]   max_lp (initial_propagation)
+#Done    4.35s core
+
+LNS stats           Improv/Calls  Closed  Difficulty  TimeLimit
+  'graph_arc_lns':           0/6    100%        0.96       0.10
+    'rnd_cst_lns':           2/7     86%        0.94       0.10
+
+CpSolverResponse summary:
+status: OPTIMAL
+objective: 120
+best_bound: 120
+walltime: 4.36748
+""".split('\n')
+
+
+class TestSearchLog(unittest.TestCase):
+    def test_parse_search_log(self):
+        run = parse_search_log(SAMPLE_LOG)
+        self.assertEqual(run['model']['initial'], {'variables': 1658, 'constraints': 136})
+        self.assertEqual(run['model']['presolved'], {'variables': 432, 'constraints': 85})
+        self.assertEqual(run['presolve']['seconds'], 0.07)
+        self.assertEqual(run['presolve']['affineRelations'], 1)
+        self.assertEqual(list(run['presolve']['rules']), ['at_most_one: removed literals', 'linear: empty'])
+        self.assertEqual(run['search'], {'startedAt': 0.07, 'workers': 8, 'doneAt': 4.35, 'closedBy': 'core'})
+        self.assertEqual(run['solutions'], [
+            {'time': 0.17, 'objective': 315, 'bound': 20, 'worker': 'no_lp'},
+            {'time': 0.33, 'objective': 120, 'bound': 20, 'worker': 'rnd_cst_lns'},
+        ])
+        self.assertEqual([b['bound'] for b in run['bounds']], [20, 60])
+        self.assertIsNone(run['bounds'][0]['objective'])
+        self.assertEqual(run['lns']['rnd_cst_lns'], {'improvements': 2, 'calls': 7, 'closedPercent': 86, 'difficulty': 0.94, 'timeLimit': 0.1})
+        self.assertEqual(run['response']['status'], 'OPTIMAL')
+        self.assertEqual(run['response']['best_bound'], 120)
+        self.assertEqual((run['firstSolutionAt'], run['bestSolutionAt'], run['numSolutions']), (0.17, 0.33, 2))
+
+    def test_solve_returns_search_log_when_enabled(self):
+        data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '01:00 PM - 02:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1'}],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I1']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1'], 'preferredRoomId': 'R1'}],
+            'settings': {'logSearchProgress': True, 'preferredMorningCourses': ['C1']}
+        }
+        body, status = build_and_solve(data, [], 1, time_limit=10)
+        self.assertEqual(status, 200)
+        runs = body['diagnostics']['searchLog']['runs']
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0]['response']['status'], 'OPTIMAL')
+
+        data['settings'] = dict(data['settings'], optimizationMode='lexicographic', gapPriority=1.0)
+        body, status = build_and_solve(data, [], 1, time_limit=10)
+        self.assertEqual(status, 200)
+        stages = [run['stage'] for run in body['diagnostics']['searchLog']['runs']]
+        self.assertEqual(stages, [stage['objective'] for stage in body['objectiveStages']])
+
+        data['settings'] = {}
+        body, status = build_and_solve(data, [], 1, time_limit=10)
+        self.assertNotIn('diagnostics', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
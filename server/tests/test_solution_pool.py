@@ -0,0 +1,69 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from solution_pool import SolutionPool, hamming_distance
+from timetable_engine import MODEL_CACHE, build_and_solve, build_model
+
+
+class TestSolutionPool(unittest.TestCase):
+    def setUp(self):
+        MODEL_CACHE.clear()
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '11:00 AM - 12:00 PM', '01:00 PM - 02:00 PM', '03:00 PM - 04:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}, {'id': 'R2', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1'}, {'id': 'I2', 'name': 'Inst2'}],
+            'courses': [
+                {'id': 'C1', 'name': 'Course1', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I1', 'I2']},
+                {'id': 'C2', 'name': 'Course2', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1', 'C2'], 'preferredRoomId': 'R1'}],
+            'settings': {'preferredMorningCourses': ['C1', 'C2']}
+        }
+
+    def solution(self, tm, choose):
+        """Solution values picking entry choose(k, entries) for every task."""
+        values = [0] * len(tm.model.Proto().variables)
+        for k in range(len(tm.task_ids)):
+            values[tm.var_lit[choose(k, list(tm.entries(k)))].Index()] = 1
+        return values
+
+    def test_pool_keeps_distinct_better_solutions(self):
+        tm = build_model(self.data, [])
+        pool = SolutionPool(tm, tm.objective_tiers, k=2, min_distance=2)
+        first = self.solution(tm, lambda k, entries: entries[0])
+        pool.offer(first)
+        pool.offer(first)
+        self.assertEqual(len(pool.kept), 1)
+        # Differs in one task only: dropped, as the kept one is at least as good.
+        pool.offer(self.solution(tm, lambda k, entries: entries[1] if k == 0 else entries[0]))
+        self.assertEqual(len(pool.kept), 1)
+        pool.offer(self.solution(tm, lambda k, entries: entries[-1]))
+        self.assertEqual(len(pool.kept), 2)
+        objectives = [item[0] for item in pool.kept]
+        self.assertEqual(objectives, sorted(objectives))
+        self.assertGreaterEqual(hamming_distance(pool.kept[0][1], pool.kept[1][1]), 2)
+
+    def test_solve_returns_alternatives(self):
+        self.data['settings'].update({'alternatives': 3, 'alternativesMinDistance': 1})
+        body, status = build_and_solve(self.data, [], 1, time_limit=10)
+        self.assertEqual(status, 200)
+        alternatives = body['alternatives']
+        self.assertTrue(1 <= len(alternatives) <= 3)
+        self.assertEqual(alternatives[0]['objective'], 0)
+        self.assertEqual([a['rank'] for a in alternatives], list(range(1, len(alternatives) + 1)))
+        for alternative in alternatives:
+            self.assertEqual(len(alternative['schedule']), 4)
+            self.assertEqual(sum(alternative['objectiveBreakdown'].values()), alternative['objective'])
+
+        del self.data['settings']['alternatives']
+        body, status = build_and_solve(self.data, [], 1, time_limit=10)
+        self.assertNotIn('alternatives', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
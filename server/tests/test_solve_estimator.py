@@ -0,0 +1,84 @@
+import sys
+import os
+import math
+import unittest
+from unittest import mock
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from app import app
+from solve_estimator import FEATURES, SOLVE_TIME_LIMIT, SolveEstimator, instance_features
+
+
+class TestSolveEstimator(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        available = {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 0, 0]}
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}, {'id': 'L1', 'capacity': 50, 'type': 'Computer Lab'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': available},
+                            {'id': 'I2', 'name': 'Inst2', 'availability': {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 1, 1]}}],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 2, 'labHours': 2, 'qualifiedInstructors': ['I1', 'I2']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1'], 'availability': {'Mon': [1, 1, 1, 1]}}],
+            'settings': {}
+        }
+
+    def test_features_describe_the_instance(self):
+        features = instance_features(self.data)
+        self.assertEqual(features['counts']['tasks'], 4)
+        self.assertAlmostEqual(features['logTasks'], math.log1p(4), places=4)
+        self.assertEqual(features['labShare'], 0.5)
+        # I1 is available for 6 slots and I2 for all 8; each gets half of the 4 hours.
+        self.assertEqual(features['maxInstructorLoad'], round(2 / 6, 4))
+        self.assertEqual(features['counts']['estimatedVariables'], 2 * (6 + 8) + 2 * (6 + 8))
+        self.assertEqual(features['labRoomLoad'], 0.25)
+
+    def test_training_follows_the_history(self):
+        samples = []
+        for n in range(1, 21):
+            features = {name: 0.0 for name in FEATURES}
+            features['logVariables'] = n / 2
+            features['maxInstructorLoad'] = n / 20
+            samples.append((features, math.exp(n / 4), n < 15))
+        estimator = SolveEstimator.train(samples)
+        small, large = (estimator.estimate(samples[i][0]) for i in (2, 17))
+        self.assertTrue(estimator.model['trained'])
+        self.assertAlmostEqual(small['seconds'], math.exp(3 / 4), delta=0.5)
+        self.assertGreater(large['seconds'], 10 * small['seconds'])
+        self.assertLessEqual(large['seconds'], SOLVE_TIME_LIMIT)
+        self.assertLess(small['infeasibilityRisk'], 0.1)
+        self.assertGreater(large['infeasibilityRisk'], 0.7)
+
+    def test_estimate_endpoint(self):
+        response = self.client.post('/estimate', json=self.data)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertGreater(body['seconds'], 0)
+        self.assertTrue(0 <= body['infeasibilityRisk'] <= 1)
+        self.assertEqual(body['features']['counts']['tasks'], 4)
+        self.assertGreaterEqual(body['etaSeconds'], body['seconds'])
+
+        # A payload pre-validation rejects is certain to fail.
+        self.data['student_groups'][0]['availability'] = {'Mon': [0, 0, 0, 0], 'Tue': [0, 0, 0, 0]}
+        body = self.client.post('/estimate', json=self.data).get_json()
+        self.assertEqual(body['infeasibilityRisk'], 1.0)
+        self.assertIn('Scheduling Failed', body['message'])
+
+    def test_solve_carries_its_estimate_and_survives_feature_errors(self):
+        response = self.client.post('/generate-timetable?async=1', json=self.data)
+        self.assertEqual(response.status_code, 202)
+        self.assertIn('seconds', response.get_json()['estimate'])
+
+        # The estimate is advisory: the solve goes ahead without one.
+        with mock.patch.object(app_module, 'instance_features', side_effect=KeyError('labType')):
+            response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'success')
+
+
+if __name__ == '__main__':
+    unittest.main()
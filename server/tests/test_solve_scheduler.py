@@ -0,0 +1,170 @@
+import sys
+import os
+import threading
+import time
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from solve_scheduler import QueueFullError, SolveScheduler
+
+
+class TestSolveScheduler(unittest.TestCase):
+    def setUp(self):
+        self.gate = threading.Event()
+        self.order = []
+
+    def blocking_solve(self, name):
+        self.gate.wait(5)
+        self.order.append(name)
+        return name
+
+    def test_round_robin_between_tenants(self):
+        """
+        Tenant A floods the queue before tenant B submits.
+        B's job must be dispatched right after A's first queued job, not after all of A's.
+        """
+        scheduler = SolveScheduler(max_concurrent=1, max_queue=10, max_queue_per_tenant=10)
+        first = scheduler.submit('A', self.blocking_solve, 'A0')
+        time.sleep(0.05)  # let the worker pick up A0
+        a_jobs = [scheduler.submit('A', self.blocking_solve, f'A{i}') for i in range(1, 4)]
+        b_job = scheduler.submit('B', self.blocking_solve, 'B1')
+
+        self.assertEqual(scheduler.position(a_jobs[0]), 1)
+        self.assertEqual(scheduler.position(b_job), 2)
+        self.assertEqual(scheduler.position(a_jobs[2]), 4)
+
+        self.gate.set()
+        for job in [first, b_job] + a_jobs:
+            self.assertTrue(job.wait(5))
+        self.assertEqual(self.order, ['A0', 'A1', 'B1', 'A2', 'A3'])
+
+    def test_queue_full_raises_with_retry_after(self):
+        scheduler = SolveScheduler(max_concurrent=1, max_queue=1, initial_solve_seconds=10)
+        running = scheduler.submit('A', self.blocking_solve, 'A0')
+        time.sleep(0.05)
+        queued = scheduler.submit('B', self.blocking_solve, 'B0')
+
+        with self.assertRaises(QueueFullError) as ctx:
+            scheduler.submit('C', self.blocking_solve, 'C0')
+        self.assertGreaterEqual(ctx.exception.retry_after, 10)
+
+        self.gate.set()
+        self.assertTrue(running.wait(5))
+        self.assertTrue(queued.wait(5))
+
+    def test_per_tenant_limit(self):
+        scheduler = SolveScheduler(max_concurrent=1, max_queue=10, max_queue_per_tenant=1)
+        running = scheduler.submit('A', self.blocking_solve, 'A0')
+        time.sleep(0.05)
+        scheduler.submit('A', self.blocking_solve, 'A1')
+
+        with self.assertRaises(QueueFullError):
+            scheduler.submit('A', self.blocking_solve, 'A2')
+        # Another institution can still queue.
+        other = scheduler.submit('B', self.blocking_solve, 'B0')
+
+        self.gate.set()
+        self.assertTrue(running.wait(5))
+        self.assertTrue(other.wait(5))
+
+    def test_eta_uses_the_job_estimate(self):
+        scheduler = SolveScheduler(max_concurrent=1, initial_solve_seconds=30)
+        running = scheduler.submit('A', self.blocking_solve, 'A0', estimate={'seconds': 4.0, 'infeasibilityRisk': 0.1})
+        time.sleep(0.05)
+        queued = scheduler.submit('B', self.blocking_solve, 'B0', estimate={'seconds': 2.0, 'infeasibilityRisk': 0.1})
+
+        self.assertLessEqual(scheduler.eta_seconds(running), 4)
+        self.assertEqual(scheduler.eta_seconds(queued), 32)  # one average solve ahead, then its own
+        self.assertEqual(scheduler.describe(queued)['estimate']['seconds'], 2.0)
+        self.assertEqual(scheduler.wait_seconds(), 60)
+
+        self.gate.set()
+        self.assertTrue(running.wait(5))
+        self.assertTrue(queued.wait(5))
+
+
+class TestSchedulerEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+        self.original_scheduler = app_module.scheduler
+        self.original_waiters = app_module.sync_waiters
+        self.data = {
+            'days': ['Mon'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': [1, 1]}}],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1'], 'availability': {'Mon': [1, 1]}}],
+            'settings': {}
+        }
+
+    def tearDown(self):
+        app_module.scheduler = self.original_scheduler
+        app_module.sync_waiters = self.original_waiters
+
+    def poll(self, response):
+        self.assertEqual(response.status_code, 202)
+        location = response.headers['Location']
+        for _ in range(100):
+            job = self.client.get(location).get_json()
+            if job['state'] == 'done':
+                return job
+            time.sleep(0.05)
+        self.fail(f'{location} did not finish')
+
+    def test_async_job_polling(self):
+        response = self.client.post('/generate-timetable?async=1', json=self.data)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['jobId']
+        self.assertIn('infeasibilityRisk', response.get_json()['estimate'])
+
+        for _ in range(100):
+            job = self.client.get(f'/jobs/{job_id}').get_json()
+            if job['state'] == 'done':
+                break
+            time.sleep(0.05)
+        self.assertEqual(job['state'], 'done')
+        self.assertEqual(job['resultStatus'], 200)
+        self.assertEqual(len(job['result']['schedule']), 1)
+
+    def test_sync_requests_over_the_waiter_cap_get_429(self):
+        app_module.sync_waiters = threading.BoundedSemaphore(1)
+        app_module.sync_waiters.acquire()
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertIn('message', response.get_json())
+
+        # Async requests don't need a waiter slot; /reschedule takes async too.
+        job = self.poll(self.client.post('/generate-timetable?async=1', json=self.data))
+        self.assertEqual(job['resultStatus'], 200)
+        schedule = job['result']['schedule']
+        payload = dict(self.data, schedule=schedule, event={'type': 'roomOutage', 'roomId': 'R1', 'days': ['Mon'],
+                                                            'timeslots': [schedule[0]['timeslot']]})
+        self.assertEqual(self.client.post('/reschedule', json=payload).status_code, 429)
+        job = self.poll(self.client.post('/reschedule?async=1', json=payload))
+        self.assertEqual(job['resultStatus'], 200)
+        self.assertNotEqual(job['result']['schedule'][0]['timeslot'], schedule[0]['timeslot'])
+
+    def test_busy_returns_429(self):
+        gate = threading.Event()
+        app_module.scheduler = SolveScheduler(max_concurrent=1, max_queue=0)
+        app_module.scheduler.submit('other', gate.wait, 5)
+        time.sleep(0.05)
+
+        response = self.client.post('/generate-timetable', json=self.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+        # Cheap endpoints keep answering while the solver is saturated.
+        health = self.client.get('/health')
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(health.get_json()['scheduler']['running'], 1)
+        gate.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+import unittest
+
+# Add server directory to path so we can import the solver modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from solver_pool import SolverPool, SolverProcessError
+
+
+# Solve entry points run in the worker by the debug_log tests.
+def log_then_sleep(data, debug_log, num_workers=None):
+    debug_log.append('Building the model.')
+    time.sleep(10)
+
+
+def log_then_fail(data, debug_log, num_workers=None):
+    debug_log.extend(['Building the model.', 'Solving.'])
+    raise ValueError('no luck')
+
+
+class TestSolverPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = SolverPool(processes=1, timeout_seconds=2, poll_interval=0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_solve_in_worker_process(self):
+        data = {
+            'days': ['Mon'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM'],
+            'rooms': [{'id': 'R1', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [{'id': 'I1', 'name': 'Inst1'}],
+            'courses': [{'id': 'C1', 'name': 'Course1', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['I1']}],
+            'student_groups': [{'id': 'G1', 'size': 20, 'enrolledCourses': ['C1']}],
+            'settings': {}
+        }
+        body, status_code = self.pool.solve(data, [])
+        self.assertEqual(status_code, 200)
+        self.assertEqual(body['status'], 'success')
+        self.assertEqual(len(body['schedule']), 1)
+
+    def test_worker_is_reused(self):
+        first_pid = self.pool.call('os:getpid')
+        self.assertNotEqual(first_pid, os.getpid())
+        self.assertEqual(self.pool.call('os:getpid'), first_pid)
+
+    def test_hard_timeout_kills_worker(self):
+        before = self.pool.call('os:getpid')
+        with self.assertRaises(SolverProcessError) as ctx:
+            self.pool.call('time:sleep', 10)
+        self.assertEqual(ctx.exception.status_code, 504)
+        # The stuck worker is replaced by a fresh one.
+        self.assertNotEqual(self.pool.call('os:getpid'), before)
+
+    def test_worker_crash_is_reported(self):
+        with self.assertRaises(SolverProcessError) as ctx:
+            self.pool.call('os:_exit', 3)
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertEqual(self.pool.call('operator:add', 1, 2), 3)
+
+    def test_debug_log_survives_a_killed_worker(self):
+        debug_log = []
+        body, status_code = self.pool.run('test_solver_pool:log_then_sleep', {}, debug_log)
+        self.assertEqual(status_code, 504)
+        self.assertEqual(debug_log, ['Building the model.'])
+        self.assertEqual(body['debug_log'], ['Building the model.'])
+
+        debug_log = []
+        body, status_code = self.pool.run('test_solver_pool:log_then_fail', {}, debug_log)
+        self.assertEqual(status_code, 500)
+        self.assertEqual(body['debug_log'], ['Building the model.', 'Solving.'])
+
+
+if __name__ == '__main__':
+    unittest.main()
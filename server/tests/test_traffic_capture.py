@@ -0,0 +1,93 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from timetable_engine import MODEL_CACHE
+from traffic_capture import TrafficCapture, sanitize
+
+
+class TestTrafficCapture(unittest.TestCase):
+    def setUp(self):
+        MODEL_CACHE.clear()
+        self.client = app_module.app.test_client()
+        self.directory = tempfile.mkdtemp()
+        available = {'Mon': [1, 1, 1]}
+        self.data = {
+            'days': ['Mon'],
+            'timeslots': ['09:00 AM - 10:00 AM', '11:00 AM - 12:00 PM', '01:00 PM - 02:00 PM'],
+            'rooms': [{'id': 'Room 101', 'capacity': 50, 'type': 'Classroom'}],
+            'instructors': [{'id': 'jane.doe', 'name': 'Jane Doe', 'email': 'jane@example.edu', 'availability': available}],
+            'courses': [{'id': 'MATH1', 'name': 'Calculus', 'lectureHours': 1, 'labHours': 0, 'qualifiedInstructors': ['jane.doe']}],
+            'student_groups': [{'id': 'CS-A', 'size': 20, 'enrolledCourses': ['MATH1'], 'preferredRoomId': 'Room 101',
+                                'availability': available}],
+            'settings': {'preferredMorningCourses': ['MATH1']},
+            'institutionId': 'Springfield College',
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def captured(self):
+        entries = []
+        for name in sorted(os.listdir(self.directory)):
+            with open(os.path.join(self.directory, name)) as f:
+                entries.extend(json.loads(line) for line in f)
+        return entries
+
+    def test_sanitize_replaces_ids_and_names_consistently(self):
+        self.data['schedule'] = [{'day': 'Mon', 'timeslot': '09:00 AM - 10:00 AM', 'courseId': 'MATH1', 'course': 'Calculus',
+                                  'instructor': 'Jane Doe', 'instructorId': 'jane.doe', 'room': 'Room 101', 'group': 'CS-A'}]
+        clean = sanitize(self.data, b'salt')
+        text = json.dumps(clean)
+        for secret in ('jane', 'Jane', 'Calculus', 'MATH1', 'Room 101', 'CS-A', 'Springfield'):
+            self.assertNotIn(secret, text)
+        course_id = clean['courses'][0]['id']
+        self.assertEqual(clean['student_groups'][0]['enrolledCourses'], [course_id])
+        self.assertEqual(clean['settings']['preferredMorningCourses'], [course_id])
+        self.assertEqual(clean['schedule'][0]['instructorId'], clean['instructors'][0]['id'])
+        self.assertEqual(clean['schedule'][0]['instructor'], clean['instructors'][0]['name'])
+        self.assertEqual(clean['timeslots'], self.data['timeslots'])
+        self.assertEqual(clean['instructors'][0]['availability'], {'Mon': [1, 1, 1]})
+        self.assertEqual(sanitize(self.data, b'salt'), clean)
+        self.assertNotEqual(sanitize(self.data, b'other')['courses'][0]['id'], course_id)
+
+    def test_app_captures_solves_and_rejections(self):
+        capture = TrafficCapture(self.directory)
+        with mock.patch.object(app_module, 'traffic_capture', capture):
+            response = self.client.post('/generate-timetable', json=self.data)
+            self.assertEqual(response.status_code, 200)
+            group = dict(self.data['student_groups'][0], availability={'Mon': [0, 0, 0]})
+            invalid = dict(self.data, student_groups=[group])
+            response = self.client.post('/generate-timetable', json=invalid)
+            self.assertEqual(response.status_code, 400)
+
+        solved, rejected = self.captured()
+        self.assertEqual((solved['endpoint'], solved['status'], solved['resultStatus'], solved['sessions']),
+                         ('/generate-timetable', 200, 'success', 1))
+        self.assertGreater(solved['seconds'], 0)
+        self.assertEqual(rejected['status'], 400)
+        self.assertNotIn('Calculus', json.dumps(solved['payload']))
+
+        # The sanitised payload still solves to the same result.
+        response = self.client.post('/generate-timetable', json=solved['payload'])
+        self.assertEqual(len(response.get_json()['schedule']), 1)
+
+    def test_capture_is_off_by_default_and_rolls_files(self):
+        self.assertFalse(TrafficCapture().sampled())
+        capture = TrafficCapture(self.directory, max_bytes=1, max_files=2)
+        for _ in range(4):
+            capture.record('/generate-timetable', self.data, 200, 0.5, {'status': 'success'})
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertEqual(len(self.captured()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
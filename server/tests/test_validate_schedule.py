@@ -0,0 +1,102 @@
+import sys
+import os
+import unittest
+
+# Add server directory to path so we can import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+
+
+class TestValidateSchedule(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.data = {
+            'days': ['Mon', 'Tue'],
+            'timeslots': ['09:00 AM - 10:00 AM', '10:00 AM - 11:00 AM', '11:00 AM - 12:00 PM', '12:00 PM - 01:00 PM'],
+            'rooms': [
+                {'id': 'CR1', 'capacity': 50, 'type': 'Classroom'},
+                {'id': 'LAB1', 'capacity': 50, 'type': 'Computer Lab'},
+            ],
+            'instructors': [
+                {'id': 'I1', 'name': 'Inst1', 'availability': {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 1, 0]}},
+                {'id': 'I2', 'name': 'Inst2', 'availability': {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 1, 1]}},
+            ],
+            'courses': [
+                {'id': 'C1', 'name': 'Maths', 'lectureHours': 2, 'labHours': 0, 'qualifiedInstructors': ['I1']},
+                {'id': 'C2', 'name': 'Physics', 'lectureHours': 0, 'labHours': 2, 'qualifiedInstructors': ['I2']},
+            ],
+            'student_groups': [
+                {'id': 'G1', 'size': 30, 'enrolledCourses': ['C1', 'C2'], 'preferredRoomId': 'CR1',
+                 'availability': {'Mon': [1, 1, 1, 1], 'Tue': [1, 1, 1, 1]}},
+            ],
+            'settings': {'gapPriority': 1.0}
+        }
+
+    def entry(self, course_id, session_type, inst_id, room, day, timeslot):
+        return {'group': 'G1', 'courseId': course_id, 'type': session_type, 'instructorId': inst_id,
+                'room': room, 'day': day, 'timeslot': timeslot}
+
+    def check(self, schedule):
+        response = self.client.post('/validate-schedule', json=dict(self.data, schedule=schedule))
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_generated_schedule_is_valid(self):
+        generated = self.client.post('/generate-timetable', json=self.data).get_json()
+        self.assertEqual(generated['status'], 'success', generated.get('message'))
+
+        result = self.check(generated['schedule'])
+        self.assertTrue(result['valid'], result['violations'])
+        self.assertEqual(set(result['penalties']), {'lab830', 'gaps', 'workload', 'preferences', 'total'})
+
+    def test_hard_rule_violations(self):
+        schedule = [
+            # Two Maths lectures on the same day, one in a lab room, back-to-back for I1.
+            self.entry('C1', 'lecture', 'I1', 'CR1', 'Mon', '09:00 AM - 10:00 AM'),
+            self.entry('C1', 'lecture', 'I1', 'LAB1', 'Mon', '10:00 AM - 11:00 AM'),
+            # Lab split across days.
+            self.entry('C2', 'lab', 'I2', 'LAB1', 'Mon', '11:00 AM - 12:00 PM'),
+            self.entry('C2', 'lab', 'I2', 'LAB1', 'Tue', '12:00 PM - 01:00 PM'),
+        ]
+        result = self.check(schedule)
+        self.assertFalse(result['valid'])
+        rules = {v['rule'] for v in result['violations']}
+        self.assertEqual(rules, {'lecture_per_day', 'lab_room', 'faculty_break', 'lab_continuity'})
+
+    def test_availability_and_double_booking(self):
+        schedule = [
+            self.entry('C1', 'lecture', 'I1', 'CR1', 'Mon', '09:00 AM - 10:00 AM'),
+            self.entry('C1', 'lecture', 'I1', 'CR1', 'Tue', '12:00 PM - 01:00 PM'),
+            self.entry('C2', 'lab', 'I2', 'LAB1', 'Mon', '09:00 AM - 10:00 AM'),
+            self.entry('C2', 'lab', 'I2', 'LAB1', 'Mon', '10:00 AM - 11:00 AM'),
+        ]
+        result = self.check(schedule)
+        rules = sorted(v['rule'] for v in result['violations'])
+        self.assertEqual(rules, ['availability', 'double_booking'])
+        double = next(v for v in result['violations'] if v['rule'] == 'double_booking')
+        self.assertEqual(double['entries'], [0, 2])
+
+    def test_penalties(self):
+        schedule = [
+            self.entry('C1', 'lecture', 'I1', 'CR1', 'Mon', '09:00 AM - 10:00 AM'),
+            self.entry('C1', 'lecture', 'I1', 'CR1', 'Tue', '09:00 AM - 10:00 AM'),
+            self.entry('C2', 'lab', 'I2', 'LAB1', 'Tue', '11:00 AM - 12:00 PM'),
+            self.entry('C2', 'lab', 'I2', 'LAB1', 'Tue', '12:00 PM - 01:00 PM'),
+        ]
+        result = self.check(schedule)
+        self.assertTrue(result['valid'], result['violations'])
+        # Tuesday has one empty slot between classes (gap weight 10);
+        # both lab hours are outside the preferred room (weight 5 each).
+        self.assertEqual(result['penalties']['gaps'], 10)
+        self.assertEqual(result['penalties']['preferences'], 10)
+        self.assertEqual(result['penalties']['total'], 20)
+
+    def test_missing_sessions_and_unknown_references(self):
+        result = self.check([self.entry('C9', 'lecture', 'I1', 'CR1', 'Mon', '09:00 AM - 10:00 AM')])
+        rules = sorted(v['rule'] for v in result['violations'])
+        self.assertEqual(rules, ['session_count', 'session_count', 'unknown_reference'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1578 @@
+import copy
+import json
+import os
+import time
+from array import array
+from datetime import datetime
+from ortools.sat.python import cp_model
+from feasibility import bottleneck_check
+from model_cache import ModelCache, structure_key
+from search_log import SearchLog
+from solution_pool import SolutionPool
+
+# Objective tiers in the default lexicographic order (most important first).
+# Weighted mode just sums all of them.
+DEFAULT_OBJECTIVE_PRIORITY = ['lab830', 'gaps', 'workload', 'preferences']
+
+# Rule families build_model can leave out (disabled=...), for ablation studies
+# (benchmarks/ablation.py). Production solves always use all of them.
+CONSTRAINT_FAMILIES = ('labContinuity', 'facultyBreak', 'oneLabPerDay', 'lecturePerDay', 'afternoonLabs',
+                       'gaps', 'fairWorkload')
+
+# Number of CP-SAT search workers used by a single solve.
+# The solve scheduler sizes its concurrency from this, so keep it in sync with the box.
+SOLVER_THREADS = int(os.environ.get('TIMELY_SOLVER_THREADS', min(8, os.cpu_count() or 1)))
+
+# Hard-constraint models of recent payloads, reused when only soft settings change.
+MODEL_CACHE = ModelCache.from_env()
+
+def parse_timeslot(ts_str):
+    """
+    Parses a timeslot string like "08:30 AM - 09:30 AM"
+    Returns (start_minutes, end_minutes) from midnight.
+    """
+    try:
+        parts = ts_str.split('-')
+        if len(parts) != 2:
+            return 0, 0
+        
+        start_str = parts[0].strip()
+        end_str = parts[1].strip()
+        
+        fmt = "%I:%M %p"
+        start_dt = datetime.strptime(start_str, fmt)
+        end_dt = datetime.strptime(end_str, fmt)
+        
+        start_min = start_dt.hour * 60 + start_dt.minute
+        end_min = end_dt.hour * 60 + end_dt.minute
+        
+        return start_min, end_min
+    except Exception as e:
+        print(f"Error parsing timeslot '{ts_str}': {e}")
+        return 0, 0
+
+
+def is_valid_lab_room(lab_type, room):
+    """Whether a lab of lab_type ('Hardware Lab' or 'Computer Lab') can run in room."""
+    room_type = room.get('type', '').lower()
+    if lab_type == 'Hardware Lab':
+        return 'hardware' in room_type
+    # Computer Lab
+    return 'computer' in room_type or ('lab' in room_type and 'hardware' not in room_type)
+
+
+def is_lab_room(room):
+    """Lab rooms are reserved for labs; lectures can't use them."""
+    room_type = room.get('type', '').lower()
+    return 'lab' in room_type or 'computer' in room_type
+
+
+def make_logger(debug_log):
+    """Returns log(msg): prints msg, keeps it for the response's debug_log and appends it to server_debug.log."""
+    def log(msg):
+        print(f"DEBUG: {msg}")
+        debug_log.append(msg)
+        try:
+            with open("server_debug.log", "a") as f:
+                f.write(f"{datetime.now()}: {msg}\n")
+        except: pass
+    return log
+
+
+def unpack_payload(data):
+    """
+    Builds the id lookups and parsed timeslot data shared by validation and model building.
+    Returns (all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps).
+    """
+    all_instructors = {i['id']: i for i in data.get('instructors', [])}
+    all_courses = {c['id']: c for c in data.get('courses', [])}
+    all_rooms = {r['id']: r for r in data.get('rooms', [])}
+    all_student_groups = {sg['id']: sg for sg in data.get('student_groups', [])}
+    all_days = data.get('days', [])
+    all_timeslots = data.get('timeslots', [])
+    settings = data.get('settings', {})
+
+    # ts_parsed: list of (start, end)
+    ts_parsed = [parse_timeslot(ts) for ts in all_timeslots]
+
+    # Calculate gaps between adjacent slots i and i+1
+    # gaps[i] = start[i+1] - end[i]
+    ts_gaps = []
+    for i in range(len(ts_parsed) - 1):
+        end_current = ts_parsed[i][1]
+        start_next = ts_parsed[i+1][0]
+        gap = start_next - end_current
+        ts_gaps.append(gap)
+
+    return all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps
+
+
+def crash_response(e, debug_log):
+    import traceback
+    traceback.print_exc()
+    # This will now give a more descriptive error message in the app
+    return {'status': 'error', 'message': f"Server crashed: {str(e)}", 'debug_log': debug_log}, 500
+
+
+def validate_timetable(data, debug_log):
+    """
+    Cheap pre-solve checks (group load, lab slots, instructor overlap, room capacity).
+    Returns None if the payload can go to the solver, otherwise (response_body, http_status).
+    """
+    with open("server_debug.log", "a") as f:
+        f.write(f"\n{datetime.now()} - Request received\n")
+        f.write(f"Parsed JSON keys: {list(data.keys())}\n")
+
+    all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+    student_groups = data.get('student_groups', [])
+    log = make_logger(debug_log)
+
+    # Open log file for this request
+    with open("server_debug.log", "a") as f:
+        f.write(f"\n\n--- NEW REQUEST {datetime.now()} ---\n")
+
+    # DEBUG: Print received data
+    print(f"DEBUG: Received {len(student_groups)} student groups.")
+    for sg in student_groups:
+         print(f"DEBUG: Group {sg.get('id')} enrolled: {sg.get('enrolledCourses')}")
+
+    log(f"Received {len(student_groups)} student groups.")
+
+
+    # --- VALIDATION: PRE-CHECK CONSTRAINT SATISFACTION ---
+    # 1. Check if Student Groups have enough available slots for their requirements
+    for sg_id, group in all_student_groups.items():
+        enrolled_courses = group.get('enrolledCourses', [])
+        total_required_hours = 0
+        for c_id in enrolled_courses:
+            course = all_courses.get(c_id)
+            if not course: continue
+            try:
+                total_required_hours += int(course.get('lectureHours', 0))
+                total_required_hours += int(course.get('labHours', 0))
+            except (ValueError, TypeError):
+                pass
+        
+        # Calculate available slots for this group
+        # Start with max possible
+        total_available_slots = len(all_days) * len(all_timeslots)
+        
+        # Subtract unavailable slots
+        availability = group.get('availability', {})
+        unavailable_count = 0
+        if availability:
+            for day in all_days:
+                slots = availability.get(day, [])
+                # Count 0s in valid range
+                for i in range(min(len(slots), len(all_timeslots))):
+                     if slots[i] == 0:
+                         unavailable_count += 1
+        
+        total_available_slots -= unavailable_count
+        
+        # DEBUG: Log values for each group to trace the issue
+        print(f"DEBUG: Group {sg_id} - Required: {total_required_hours}, Available: {total_available_slots}")
+
+        if total_required_hours > total_available_slots:
+            msg = f"Scheduling Failed: Student Group '{group.get('id')}' requires {total_required_hours} hours, but only has {total_available_slots} available slots. Please increase availability or reduce course load."
+            log(msg)
+            return {
+                'status': 'error', 
+                'message': msg
+            }, 400
+
+        # 1.1 Check for Impossible Lab Constraints (Consecutive Slots & Instructor Availability)
+        # This checks for ALL labs, ensuring there are valid consecutive slots where both Group and Instructor are available.
+        lab_prefs = group.get('labTimingPreferences', {})
+        for c_id in enrolled_courses:
+            course = all_courses.get(c_id)
+            if not course: continue
+            try:
+                lab_hours = int(course.get('labHours', 0))
+            except: lab_hours = 0
+            
+            # Check for labs (assuming they need at least 2 consecutive hours)
+            if lab_hours >= 2: 
+                # Check preferences
+                pref = lab_prefs.get(c_id)
+                is_afternoon = (pref == 'Afternoon')
+                
+                specific_start_min = None
+                if pref and not is_afternoon:
+                    # Heuristic to find start time from strings like "11:00 - 1:00", "2 to 4", "8:30 - 10:30"
+                    p_lower = pref.lower()
+                    if '8:30' in p_lower: specific_start_min = 510  # 8:30 AM
+                    elif '11' in p_lower: specific_start_min = 660  # 11:00 AM
+                    elif '2' in p_lower and '12' not in p_lower: specific_start_min = 840   # 2:00 PM
+                    elif '3' in p_lower and '13' not in p_lower: specific_start_min = 900   # 3:00 PM
+                    elif '1' in p_lower and '11' not in p_lower and '12' not in p_lower: specific_start_min = 780 # 1:00 PM
+
+
+                disallow_830 = settings.get('disallow830Labs', False)
+
+                valid_lab_starts = []
+                for t_idx in range(len(all_timeslots) - 1): # Check for 2-hour blocks
+                    t_start_min = ts_parsed[t_idx][0]
+                    
+                    # Filtering
+                    if is_afternoon and t_start_min < 720: continue
+                    if specific_start_min is not None and t_start_min != specific_start_min: continue
+                    
+                    # New Global Setting: Disallow 8:30 AM Labs
+                    # 8:30 AM is 510 minutes from midnight
+                    if disallow_830 and t_start_min == 510:
+                        continue
+                    
+                    # Check if t_idx and t_idx+1 are continuous (gap must be 0)
+                    if ts_gaps[t_idx] == 0:
+                        valid_lab_starts.append(t_idx)
+
+                if not valid_lab_starts:
+                     msg = f"Scheduling Failed: Course '{course['name']}' requires a {lab_hours}-hour lab ({pref if pref else 'Any Time'}), but no consecutive slots exist starting at the preferred time (check breaks or timeslots)."
+                     log(msg)
+                     return {'status': 'error', 'message': msg, 'debug_log': debug_log}, 400
+                
+                # Check Instructor Availability for these slots
+                # Needs at least ONE valid start slot where instructor is available for BOTH hours
+                
+                # Get qualified/preferred instructor
+                instructor_id = None
+                inst_prefs = group.get('instructorPreferences', {})
+                if c_id in inst_prefs:
+                    instructor_id = inst_prefs[c_id]
+                
+                instructors_to_check = []
+                if instructor_id:
+                     instructors_to_check = [all_instructors.get(instructor_id)]
+                else:
+                     q_ids = course.get('qualifiedInstructors', [])
+                     instructors_to_check = [all_instructors.get(qid) for qid in q_ids]
+                
+                instructors_to_check = [i for i in instructors_to_check if i] # Filter None
+
+                if not instructors_to_check:
+                    log(f"Warning: No valid instructors found for {c_id}")
+                    continue
+
+                can_schedule = False
+                
+                # Check if ANY instructor can teach in ANY valid slot on ANY day
+                for inst in instructors_to_check:
+                    inst_avail = inst.get('availability', {})
+                    for day in all_days:
+                        # Group must also be available!
+                        group_avail = availability.get(day, [])
+                        inst_day_avail = inst_avail.get(day, [])
+                        
+                        for start_idx in valid_lab_starts:
+                            # Check slot 1 and slot 2 (indices start_idx and start_idx+1)
+                            
+                            # Check Group Avail
+                            g_ok = True
+                            if start_idx < len(group_avail) and group_avail[start_idx] == 0: g_ok = False
+                            if (start_idx+1) < len(group_avail) and group_avail[start_idx+1] == 0: g_ok = False
+                            
+                            if not g_ok: continue
+
+                            # Check Inst Avail
+                            i_ok = True
+                            if start_idx < len(inst_day_avail) and inst_day_avail[start_idx] == 0: i_ok = False
+                            if (start_idx+1) < len(inst_day_avail) and inst_day_avail[start_idx+1] == 0: i_ok = False
+
+                            if i_ok:
+                                can_schedule = True
+                                # log(f"Found VALID slot for {c_id}: Day {day}, Index {start_idx}")
+                                break
+                        if can_schedule: break
+                    if can_schedule: break
+                
+                if not can_schedule:
+                     inst_names = ", ".join([i['name'] for i in instructors_to_check])
+                     msg = f"Scheduling Failed: Course '{course['name']}' ({group.get('id')}) requires a Lab{' (Afternoon)' if is_afternoon else ''}, but no assigned instructor ({inst_names}) is available for 2 consecutive slots where the group is also available."
+                     log(msg)
+                     log(f"Validation Detail: {c_id}, Group {group['id']}, Insts: {inst_names}")
+                     log(f"Valid Lab Starts: {valid_lab_starts}")
+                     return {
+                        'status': 'error', 
+                        'message': msg,
+                        'debug_log': debug_log
+                    }, 400
+
+        # 1.2 Check Per-Course Instructor-Group Availability Overlap
+        # Ensure that for each course, there are enough slots where BOTH Group and Instructor are available.
+        for c_id in enrolled_courses:
+            course = all_courses.get(c_id)
+            if not course: continue
+            
+            try:
+                req_hours = int(course.get('lectureHours', 0)) + int(course.get('labHours', 0))
+            except: req_hours = 0
+            
+            if req_hours == 0: continue
+
+            # Get Instructors
+            inst_prefs = group.get('instructorPreferences', {})
+            instructor_id = inst_prefs.get(c_id)
+            
+            check_instructors = []
+            if instructor_id:
+                 check_instructors = [all_instructors.get(instructor_id)]
+            else:
+                 q_ids = course.get('qualifiedInstructors', [])
+                 check_instructors = [all_instructors.get(qid) for qid in q_ids]
+            
+            check_instructors = [i for i in check_instructors if i]
+            if not check_instructors: continue
+
+            # Calculate valid overlap count
+            overlap_count = 0
+            # We can sum overlap across all days/slots. 
+            # If ANY instructor is available at (day, slot), and Group is available, it counts.
+            
+            for day in all_days:
+                group_day_avail = group.get('availability', {}).get(day, [])
+                
+                # Compute union of instructor availability for this day
+                inst_union_avail = [0] * len(all_timeslots)
+                for inst in check_instructors:
+                    inst_day_avail = inst.get('availability', {}).get(day, [])
+                    for i in range(min(len(inst_day_avail), len(all_timeslots))):
+                        if inst_day_avail[i] == 1:
+                            inst_union_avail[i] = 1
+                
+                # Intersect with Group
+                for i in range(min(len(group_day_avail), len(all_timeslots))):
+                    if group_day_avail[i] == 1 and inst_union_avail[i] == 1:
+                        overlap_count += 1
+            
+            print(f"DEBUG: Course {c_id} ({course['name']}) Overlap: {overlap_count}, Required: {req_hours}")
+            
+            if overlap_count < req_hours:
+                 msg = f"Scheduling Failed: Course '{course['name']}' requires {req_hours} hours. Based on Student Group '{group.get('id')}' availability and Instructor availability, only {overlap_count} valid slots exist. Please increase availability."
+                 print(f"DEBUG: {msg}")
+                 return {
+                    'status': 'error', 
+                    'message': msg
+                }, 400
+
+
+    # 2. Check Global Room Capacity vs Total Requirements
+    total_global_required_hours = 0
+    for sg_id, group in all_student_groups.items():
+        enrolled_courses = group.get('enrolledCourses', [])
+        for c_id in enrolled_courses:
+            course = all_courses.get(c_id)
+            if not course: continue
+            try:
+                total_global_required_hours += int(course.get('lectureHours', 0))
+                total_global_required_hours += int(course.get('labHours', 0))
+            except: pass
+    
+    total_global_room_slots = 0
+    for r_id, room in all_rooms.items():
+        room_slots = len(all_days) * len(all_timeslots)
+        availability = room.get('availability', {})
+        unavailable_count = 0
+        if availability:
+            for day in all_days:
+                slots = availability.get(day, [])
+                for i in range(min(len(slots), len(all_timeslots))):
+                    if slots[i] == 0:
+                        unavailable_count += 1
+        
+        total_global_room_slots += (room_slots - unavailable_count)
+        
+    print(f"DEBUG: Global Check - Required: {total_global_required_hours}, Room Capacity: {total_global_room_slots}")
+
+    if total_global_required_hours > total_global_room_slots:
+         msg = f"Scheduling Failed: Total class hours required ({total_global_required_hours}) exceed the total capacity of all rooms ({total_global_room_slots}). Please add more rooms or extend working hours."
+         print(f"DEBUG: {msg}")
+         return {
+            'status': 'error', 
+            'message': msg
+        }, 400
+
+    return None
+
+
+def build_tasks(all_student_groups, all_courses):
+    """
+    Creates one task per required session hour.
+    Returns {task_id: {'course_id', 'type', 'group_id'}} in group/course/type/index order.
+    """
+    # Create unique tasks for each required session (lecture or lab)
+    # REFACTOR: Tasks are now specific to a Student Group.
+    # Task ID format: {sg_id}_{c_id}_{type}_{index}
+    tasks = {}
+
+    for sg_id, group in all_student_groups.items():
+        enrolled_courses = group.get('enrolledCourses', [])
+        for c_id in enrolled_courses:
+            course = all_courses.get(c_id)
+            if not course:
+                continue
+            
+            try:
+                lec_hours = int(course.get('lectureHours', 0))
+            except (ValueError, TypeError):
+                lec_hours = 0
+            
+            try:
+                lab_hours = int(course.get('labHours', 0))
+            except (ValueError, TypeError):
+                lab_hours = 0
+
+            for i in range(lec_hours):
+                task_id = f'{sg_id}_{c_id}_lec_{i}'
+                tasks[task_id] = {
+                    'course_id': c_id, 
+                    'type': 'lecture',
+                    'group_id': sg_id
+                }
+            for i in range(lab_hours):
+                task_id = f'{sg_id}_{c_id}_lab_{i}'
+                tasks[task_id] = {
+                    'course_id': c_id, 
+                    'type': 'lab',
+                    'group_id': sg_id
+                }
+    return tasks
+
+
+def identical_group_classes(all_student_groups):
+    """
+    Groups student groups that differ only in id/name (same courses, size, availability
+    and preferences), e.g. parallel sections of one programme. Any schedule stays valid,
+    with the same objective, when two such groups swap timetables.
+    Returns lists of group ids (2 or more per class) in payload order.
+    """
+    classes = {}
+    for sg_id, group in all_student_groups.items():
+        signature = {k: v for k, v in group.items() if k not in ('id', 'name')}
+        signature['enrolledCourses'] = sorted(set(group.get('enrolledCourses', [])))
+        classes.setdefault(json.dumps(signature, sort_keys=True, default=str), []).append(sg_id)
+    return [ids for ids in classes.values() if len(ids) > 1]
+
+
+def symmetry_classes(tm, fixed_assignments=None):
+    """
+    The task sets build_hard_model's symmetry breaking orders, as (interchangeable, group_classes):
+    interchangeable - lists of task indices (a group's lectures of one course, or the first hours of
+                      its 2-hour lab blocks) to be placed in strictly increasing (day, slot) order;
+    group_classes   - per class of identical groups, one {session: task index} per group, where
+                      session is the task id without the group id; the groups are ordered, with
+                      ties, by where their first session lands.
+    Sets and groups containing a task pinned by fixed_assignments keep their numbering and are left out.
+    """
+    tasks = tm.tasks
+    interchangeable = {}
+    for k, task_id in enumerate(tm.task_ids):
+        if tm.task_pair_first[k] >= 0 or (tm.task_is_lab[k] and not tm.task_pair_start[k]):
+            continue  # second lab hours follow their first hour; unpaired lab hours are unique
+        if not tm.entries(k):
+            continue  # left unscheduled (no qualified instructor): no position to order by
+        interchangeable.setdefault((tm.task_group[k], tm.task_course[k], tm.task_is_lab[k]), []).append(k)
+    interchangeable = [ks for ks in interchangeable.values()
+                       if len(ks) > 1 and not (fixed_assignments and any(tm.task_ids[k] in fixed_assignments for k in ks))]
+
+    group_sessions = {}
+    pinned_groups = set()
+    for k, task_id in enumerate(tm.task_ids):
+        sg_id = tasks[task_id]['group_id']
+        group_sessions.setdefault(sg_id, {})[task_id[len(sg_id) + 1:]] = k
+        if fixed_assignments and task_id in fixed_assignments:
+            pinned_groups.add(sg_id)
+    # With a subset of tasks, only groups left with the same sessions can still swap.
+    group_classes = []
+    for sg_ids in identical_group_classes(tm.all_student_groups):
+        same_sessions = {}
+        for sg_id in sg_ids:
+            same_sessions.setdefault(tuple(group_sessions.get(sg_id, ())), []).append(sg_id)
+        group_classes.extend([group_sessions[sg_id] for sg_id in ids] for key, ids in same_sessions.items()
+                             if key and len(ids) > 1 and not pinned_groups.intersection(ids))
+    return interchangeable, group_classes
+
+
+class TimetableModel:
+    """
+    CP-SAT model for one payload with an integer-indexed, CSR-style variable layout.
+
+    Instructors, rooms, days, timeslots, groups, courses and tasks are interned to ints
+    (inst_ids[i], room_ids[r], all_days[d], all_timeslots[s], task_ids[k], ...).
+    The placement candidates of task k are entries task_start[k]:task_start[k+1] of the
+    flat arrays var_inst/var_room/var_day/var_slot/var_lit; ids are only translated back
+    to names when a solution is read.
+    The second hour of a 2-hour lab shares the literal of the first hour shifted by one slot.
+    """
+
+    def __init__(self, data, tasks):
+        self.model = cp_model.CpModel()
+        (self.all_instructors, self.all_courses, self.all_rooms, self.all_student_groups,
+         self.all_days, self.all_timeslots, self.settings, self.ts_parsed, self.ts_gaps) = unpack_payload(data)
+        self.tasks = tasks
+
+        self.inst_ids = list(self.all_instructors)
+        self.room_ids = list(self.all_rooms)
+        self.group_ids = list(self.all_student_groups)
+        self.course_ids = list(self.all_courses)
+        self.task_ids = list(tasks)
+        self.inst_index = {inst_id: i for i, inst_id in enumerate(self.inst_ids)}
+        self.room_index = {room_id: r for r, room_id in enumerate(self.room_ids)}
+        self.group_index = {sg_id: g for g, sg_id in enumerate(self.group_ids)}
+        self.course_index = {c_id: c for c, c_id in enumerate(self.course_ids)}
+        self.day_index = {day: d for d, day in enumerate(self.all_days)}
+        self.slot_index = {ts: s for s, ts in enumerate(self.all_timeslots)}
+        self.task_index = {task_id: k for k, task_id in enumerate(self.task_ids)}
+        self.n_days = len(self.all_days)
+        self.n_slots = len(self.all_timeslots)
+
+        self.task_group = array('i', (self.group_index[t['group_id']] for t in tasks.values()))
+        self.task_course = array('i', (self.course_index[t['course_id']] for t in tasks.values()))
+        self.task_is_lab = array('b', (t['type'] == 'lab' for t in tasks.values()))
+        # Index of the first hour of the lab block for the second hour, -1 otherwise.
+        self.task_pair_first = array('i', [-1] * len(tasks))
+        self.task_pair_start = array('b', [0] * len(tasks))
+
+        self.task_start = array('i', [0])
+        self.var_inst = array('i')
+        self.var_room = array('i')
+        self.var_day = array('i')
+        self.var_slot = array('i')
+        self.var_lit = []
+
+        self.decision_vars = []  # distinct assignment literals (lab second hours excluded)
+        self.lab_vars = []
+        self.objective_tiers = {name: [] for name in DEFAULT_OBJECTIVE_PRIORITY}
+        # Set instead of building the model when propagation proves the payload infeasible.
+        self.contradiction = None
+        self.named = False
+        self.disabled = frozenset()  # CONSTRAINT_FAMILIES left out of this model
+
+    def fork(self, settings):
+        """
+        Copy for a new objective overlay: shares the hard-constraint layout but works on its
+        own copy of the model proto, with fresh objective tiers for settings.
+        """
+        other = copy.copy(self)
+        other.model = cp_model.CpModel()
+        other.model.Proto().CopyFrom(self.model.Proto())
+        other.settings = settings
+        other.objective_tiers = {name: [] for name in DEFAULT_OBJECTIVE_PRIORITY}
+        for name in ('inst_occupancy', 'room_occupancy', 'group_occupancy', 'lab_start_occupancy'):
+            setattr(other, name, getattr(self, name).fork(other.model))
+        return other
+
+    def entries(self, k):
+        return range(self.task_start[k], self.task_start[k + 1])
+
+    def describe_task(self, k):
+        task_info = self.tasks[self.task_ids[k]]
+        course = self.all_courses[task_info['course_id']]
+        return f"{task_info['type']} of '{course['name']}' for group '{task_info['group_id']}'"
+
+    def describe_placement(self, placement):
+        i, r, d, s = placement
+        instructor = self.all_instructors[self.inst_ids[i]]
+        return f"{self.all_days[d]} {self.all_timeslots[s]} with {instructor['name']} in {self.room_ids[r]}"
+
+    def extract_schedule(self, solver):
+        """Reads the chosen placements back into the response's schedule entries."""
+        return self.schedule_from_entries(e for e, lit in enumerate(self.var_lit) if solver.Value(lit) == 1)
+
+    def schedule_from_entries(self, chosen):
+        """Schedule entries for the chosen placement entries (indices into the var_* arrays), in task order."""
+        chosen = set(chosen)
+        schedule = []
+        for k, task_id in enumerate(self.task_ids):
+            task_info = self.tasks[task_id]
+            course_id = task_info['course_id']
+            sg_id = task_info['group_id']
+            for e in self.entries(k):
+                if e in chosen:
+                    inst_id = self.inst_ids[self.var_inst[e]]
+                    schedule.append({
+                        'day': self.all_days[self.var_day[e]],
+                        'timeslot': self.all_timeslots[self.var_slot[e]],
+                        'courseId': course_id,
+                        'course': self.all_courses[course_id]['name'],
+                        'instructor': self.all_instructors[inst_id]['name'],
+                        'instructorId': inst_id,
+                        'room': self.room_ids[self.var_room[e]],
+                        'group': self.all_student_groups[sg_id]['id'],
+                        'type': task_info['type'] # 'lecture' or 'lab'
+                    })
+        return schedule
+
+
+def _add_linear(model, terms, lb, ub):
+    """
+    Posts lb <= sum(coeff * lit) <= ub for (lit, coeff) terms straight into the model proto.
+    Integer "literals" are constants. Same constraint as model.AddLinearConstraint, without
+    building a Python expression tree, which dominates build time on large payloads.
+    """
+    constraint = model.Proto().constraints.add().linear
+    for lit, coeff in terms:
+        if isinstance(lit, int):
+            lb -= lit * coeff
+            ub -= lit * coeff
+        else:
+            constraint.vars.append(lit.Index())
+            constraint.coeffs.append(coeff)
+    constraint.domain.extend([lb, ub])
+
+
+class Occupancy:
+    """
+    Busy indicators for one kind of entity (instructor, room, group) over (day, slot) cells.
+
+    Placement literals are collected per cell, keyed by ((entity * n_days + d) * n_slots + s).
+    indicator() turns a cell into a single literal the first time it is needed: 0 if nothing
+    can be placed there, the placement literal itself if only one can, otherwise a Boolean
+    equal to the sum of the cell (at most one once at_most_one() has been posted).
+    Constraints and objectives share these indicators instead of re-summing placements.
+    """
+
+    def __init__(self, model, entity_ids, all_days, n_slots, label, named=False):
+        self.model = model
+        self.entity_ids = entity_ids
+        self.all_days = all_days
+        self.n_days = len(all_days)
+        self.n_slots = n_slots
+        self.label = label
+        self.named = named
+        self.cells = {}
+        self.indicators = {}
+
+    def fork(self, model):
+        """Same cells on a copy of the model; indicators created from now on go to model only."""
+        other = copy.copy(self)
+        other.model = model
+        other.indicators = dict(self.indicators)
+        return other
+
+    def key(self, entity, d, s):
+        return (entity * self.n_days + d) * self.n_slots + s
+
+    def add(self, entity, d, s, lit):
+        self.cells.setdefault(self.key(entity, d, s), []).append(lit)
+
+    def lits(self, entity, d, s):
+        return self.cells.get(self.key(entity, d, s), [])
+
+    def entity_lits(self, entity):
+        """All placement literals of one entity, in (day, slot) order."""
+        first = self.key(entity, 0, 0)
+        return [lit for key in range(first, first + self.n_days * self.n_slots) for lit in self.cells.get(key, ())]
+
+    def at_most_one(self):
+        for lits in self.cells.values():
+            if len(lits) > 1:
+                self.model.AddAtMostOne(lits)
+
+    def indicator(self, entity, d, s):
+        key = self.key(entity, d, s)
+        if key not in self.indicators:
+            lits = self.cells.get(key)
+            if not lits:
+                self.indicators[key] = 0
+            elif len(lits) == 1:
+                self.indicators[key] = lits[0]
+            else:
+                name = f'{self.label}_{self.entity_ids[entity]}_{self.all_days[d]}_{s}' if self.named else ''
+                occupied = self.model.NewBoolVar(name)
+                _add_linear(self.model, [(lit, 1) for lit in lits] + [(occupied, -1)], 0, 0)
+                self.indicators[key] = occupied
+        return self.indicators[key]
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+def propagate_domains(tm, domains, ts_gaps):
+    """
+    Forced-assignment propagation over the candidate placements, before any variable exists.
+
+    A task left with a single candidate is placed: its instructor, room and group cells
+    (both hours for a lab block), the instructor's adjacent slots without a 1-hour break,
+    its group/course/day for lectures and its group/day for other lab courses are removed
+    from every other task's domain. Newly forced tasks are propagated in the next round
+    until nothing changes. domains ({k: [(i, r, d, s)]} for every task that is not a second
+    lab hour) is narrowed in place.
+    Returns (forced_count, removed_count, contradiction message or None).
+    """
+    n_slots = tm.n_slots
+    lecture_count = {}
+    for k in domains:
+        if not tm.task_is_lab[k]:
+            key = (tm.task_group[k], tm.task_course[k])
+            lecture_count[key] = lecture_count.get(key, 0) + 1
+
+    faculty_break = 'facultyBreak' not in tm.disabled
+    one_lab_per_day = 'oneLabPerDay' not in tm.disabled
+    lecture_per_day = 'lecturePerDay' not in tm.disabled
+
+    def occupied(k, s):
+        return (s, s + 1) if tm.task_pair_start[k] else (s,)
+
+    owner = {}  # blocked cell -> forcing task (lab days: (task, course))
+    forced = set()
+    removed = 0
+    pending = [k for k, domain in domains.items() if len(domain) == 1]
+    while pending:
+        for k in pending:
+            forced.add(k)
+            i, r, d, s = domains[k][0]
+            g, c = tm.task_group[k], tm.task_course[k]
+            for slot in occupied(k, s):
+                owner.setdefault(('inst', i, d, slot), k)
+                owner.setdefault(('room', r, d, slot), k)
+                owner.setdefault(('group', g, d, slot), k)
+                # 8. Faculty break: the same instructor can't teach right before/after without a gap.
+                if faculty_break and slot > 0 and ts_gaps[slot - 1] < 60:
+                    owner.setdefault(('inst', i, d, slot - 1), k)
+                if faculty_break and slot + 1 < n_slots and ts_gaps[slot] < 60:
+                    owner.setdefault(('inst', i, d, slot + 1), k)
+            if tm.task_is_lab[k]:
+                if one_lab_per_day:
+                    owner.setdefault(('lab', g, d), (k, c))
+            elif lecture_count[(g, c)] > 1 and lecture_per_day:
+                owner.setdefault(('lecture', g, c, d), k)
+
+        def blocker(k, placement):
+            """The forced task that rules placement out for task k, or None."""
+            i, r, d, s = placement
+            g, c = tm.task_group[k], tm.task_course[k]
+            for slot in occupied(k, s):
+                for cell in (('inst', i, d, slot), ('room', r, d, slot), ('group', g, d, slot)):
+                    other = owner.get(cell, k)
+                    if other != k:
+                        return other
+            if tm.task_is_lab[k]:
+                other, other_course = owner.get(('lab', g, d), (k, c))
+                if other != k and other_course != c:
+                    return other
+            else:
+                other = owner.get(('lecture', g, c, d), k)
+                if other != k:
+                    return other
+            return None
+
+        pending = []
+        for k, domain in domains.items():
+            if not domain:
+                continue
+            kept = []
+            last_blocker = None
+            for placement in domain:
+                other = blocker(k, placement)
+                if other is None:
+                    kept.append(placement)
+                else:
+                    last_blocker = other
+            if len(kept) == len(domain):
+                continue
+            removed += len(domain) - len(kept)
+            domains[k] = kept
+            if not kept:
+                forced_placement = domains[last_blocker][0] if domains[last_blocker] else None
+                message = f"Scheduling Failed: The {tm.describe_task(k)} has no feasible slot left once the {tm.describe_task(last_blocker)}"
+                if forced_placement:
+                    message += f" is placed on {tm.describe_placement(forced_placement)}, its only option"
+                else:
+                    message += " is placed"
+                return len(forced), removed, message + ". Please increase availability or add qualified instructors/rooms."
+            if len(kept) == 1 and k not in forced:
+                pending.append(k)
+    return len(forced), removed, None
+
+
+def add_faculty_break(tm):
+    """
+    An instructor busy in two adjacent slots less than 60 minutes apart must be teaching
+    one 2-hour lab block across them. Posted once per such instructor cell pair as
+    busy[s] + busy[s+1] <= 1 + lab_start[s] on the occupancy indicators, so the cost is
+    linear in the placement variables. Returns the number of constraints added.
+    """
+    inst, lab_start = tm.inst_occupancy, tm.lab_start_occupancy
+    count = 0
+    for key in sorted(inst.cells):
+        s = key % tm.n_slots
+        # If gap >= 60 minutes, then they ALREADY have a break.
+        if s == tm.n_slots - 1 or tm.ts_gaps[s] >= 60 or key + 1 not in inst.cells:
+            continue
+        entity, d = divmod(key // tm.n_slots, tm.n_days)
+        _add_linear(tm.model, [(inst.indicator(entity, d, s), 1), (inst.indicator(entity, d, s + 1), 1),
+                               (lab_start.indicator(entity, d, s), -1)], -1, 1)
+        count += 1
+    return count
+
+
+def build_model(data, debug_log, fixed_assignments=None, hint_assignments=None, disabled=(), tasks=None):
+    """
+    Builds the CP-SAT model (hard constraints and objectives) for an already validated payload.
+    disabled names CONSTRAINT_FAMILIES to leave out (ablation only).
+    Returns a TimetableModel.
+    """
+    tm = build_hard_model(data, debug_log, fixed_assignments, hint_assignments, disabled, tasks)
+    if not tm.contradiction:
+        add_objectives(tm)
+    return tm
+
+
+def build_model_cached(data, debug_log):
+    """
+    build_model through MODEL_CACHE: the hard constraints come from the cache when a payload
+    with the same structure (see model_cache.structure_key) was built before, and only the
+    objectives for this request's settings are added, on a fork of the cached model.
+    A cached model's last solution is added as a solution hint.
+    Returns (tm, cache_key); cache_key is None when the cache is disabled.
+    """
+    if not MODEL_CACHE.enabled:
+        return build_model(data, debug_log), None
+    log = make_logger(debug_log)
+    start = time.time()
+    key = structure_key(data)
+    hard = MODEL_CACHE.get(key)
+    if hard is None:
+        hard = build_hard_model(data, debug_log)
+        MODEL_CACHE.put(key, hard)
+        if hard.contradiction:
+            return hard, key
+    elif hard.contradiction:
+        log(f"Model cache hit ({key[:12]}): {hard.contradiction}")
+        return hard, key
+    else:
+        log(f"Model cache hit ({key[:12]}): reusing {len(hard.decision_vars)} assignment variables and the hard constraints.")
+
+    tm = hard.fork(data.get('settings', {}))
+    if MODEL_CACHE.apply_hints(key, tm.model):
+        log("Warm-starting from the last solution of this model.")
+    add_objectives(tm)
+    log(f"Model ready in {time.time() - start:.2f}s.")
+    return tm, key
+
+
+def build_hard_model(data, debug_log, fixed_assignments=None, hint_assignments=None, disabled=(), tasks=None):
+    """
+    Builds the variables and hard constraints for an already validated payload.
+
+    Availability, capacity, equipment, lab-room and afternoon-lab rules are applied
+    while enumerating each task's candidate placements, so forbidden placements never
+    become variables. Variables are unnamed unless TIMELY_NAMED_VARIABLES=1 (handy
+    when exporting a model for debugging).
+    fixed_assignments pins tasks to a single (inst_id, room_id, day, timeslot);
+    hint_assignments only warm-starts them.
+    tasks limits the model to a subset of build_tasks() (both hours of a lab block or neither).
+    Returns a TimetableModel.
+    """
+    all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+    log = make_logger(debug_log)
+
+    if tasks is None:
+        tasks = build_tasks(all_student_groups, all_courses)
+    msg_tasks = f"Created {len(tasks)} tasks."
+    print(f"DEBUG: {msg_tasks}")
+    with open("server_debug.log", "a") as f:
+        f.write(f"{datetime.now()}: {msg_tasks}\n")
+
+    tm = TimetableModel(data, tasks)
+    unknown = set(disabled) - set(CONSTRAINT_FAMILIES)
+    if unknown:
+        raise ValueError(f"Unknown constraint families: {', '.join(sorted(unknown))}")
+    tm.disabled = frozenset(disabled)
+    model = tm.model
+    n_days, n_slots = tm.n_days, tm.n_slots
+    named = tm.named = os.environ.get('TIMELY_NAMED_VARIABLES') == '1'
+
+    # --- AVAILABILITY MASKS ---
+    # blocked[d * n_slots + s] == 1 when the entity is unavailable.
+    # availability is a map: { "Monday": [1, 1, 0, ...], ... }; missing days/slots are available.
+    def blocked_mask(entity):
+        blocked = bytearray(n_days * n_slots)
+        for day, slots in (entity.get('availability') or {}).items():
+            d = tm.day_index.get(day)
+            if d is None:
+                continue
+            for t_idx, is_available in enumerate(slots):
+                if t_idx >= n_slots:
+                    break
+                if is_available == 0:
+                    blocked[d * n_slots + t_idx] = 1
+        return blocked
+
+    inst_blocked = [blocked_mask(all_instructors[inst_id]) for inst_id in tm.inst_ids]
+    room_blocked = [blocked_mask(all_rooms[room_id]) for room_id in tm.room_ids]
+    group_blocked = [blocked_mask(all_student_groups[sg_id]) for sg_id in tm.group_ids]
+
+    # Afternoon starts at 12:00 PM (720 minutes)
+    morning = [ts_parsed[s][0] < 720 for s in range(n_slots)]
+
+    # --- ROOM ELIGIBILITY ---
+    # Capacity, equipment, lab room type and specific lab room preference only depend on
+    # (group, course, type), so they are computed once per combination.
+    room_cache = {}
+    def eligible_rooms(task_info):
+        key = (task_info['group_id'], task_info['course_id'], task_info['type'])
+        if key in room_cache:
+            return room_cache[key]
+        group = all_student_groups[task_info['group_id']]
+        course = all_courses[task_info['course_id']]
+        group_size = _to_int(group.get('size', 0))
+        required_equipment = set(course.get('equipment', []))
+        lab_type = course.get('labType', 'Computer Lab') # Default to Computer Lab
+        preferred_lab_room = group.get('labRoomPreferences', {}).get(task_info['course_id'])
+
+        rooms_ok = []
+        for r, room_id in enumerate(tm.room_ids):
+            room = all_rooms[room_id]
+            # 3. Room capacity constraint
+            if group_size > _to_int(room.get('capacity', 0)):
+                continue
+            # 4. Equipment constraint
+            if required_equipment and not required_equipment.issubset(set(room.get('equipment', []))):
+                continue
+            # 6. Lab Room Constraint
+            if task_info['type'] == 'lab':
+                if preferred_lab_room and room_id != preferred_lab_room:
+                    continue
+                if not is_valid_lab_room(lab_type, room):
+                    continue
+            elif is_lab_room(room):
+                continue
+            rooms_ok.append(r)
+        room_cache[key] = rooms_ok
+        return rooms_ok
+
+    def target_instructors(task_info):
+        # A group's instructor preference replaces the course's qualified instructors.
+        group = all_student_groups[task_info['group_id']]
+        course = all_courses[task_info['course_id']]
+        preferred_inst_id = group.get('instructorPreferences', {}).get(task_info['course_id'])
+        targets = [preferred_inst_id] if preferred_inst_id else course.get('qualifiedInstructors', [])
+        return list(dict.fromkeys(tm.inst_index[i] for i in targets if i in tm.inst_index))
+
+    def candidates(k, task_id, task_info):
+        """(i, r, d, s) placements allowed by every per-placement rule, in instructor/room/day/slot order."""
+        g = tm.task_group[k]
+        afternoon_only = ('afternoonLabs' not in tm.disabled and task_info['type'] == 'lab' and
+                          all_student_groups[task_info['group_id']].get('labTimingPreferences', {}).get(task_info['course_id']) == 'Afternoon')
+        rooms_ok = eligible_rooms(task_info)
+        if fixed_assignments and task_id in fixed_assignments:
+            inst_id, room_id, day, timeslot = fixed_assignments[task_id]
+            i, r = tm.inst_index.get(inst_id), tm.room_index.get(room_id)
+            d, s = tm.day_index.get(day), tm.slot_index.get(timeslot)
+            if None in (i, r, d, s) or r not in rooms_ok:
+                return []
+            insts, rooms, days, slots = [i], [r], [d], [s]
+        else:
+            insts, rooms, days, slots = target_instructors(task_info), rooms_ok, range(n_days), range(n_slots)
+
+        result = []
+        for i in insts:
+            i_blocked = inst_blocked[i]
+            for r in rooms:
+                r_blocked = room_blocked[r]
+                for d in days:
+                    base = d * n_slots
+                    for s in slots:
+                        ds = base + s
+                        if i_blocked[ds] or r_blocked[ds] or group_blocked[g][ds]:
+                            continue
+                        # 10. Lab Afternoon Preference (Hard Constraint)
+                        if afternoon_only and morning[s]:
+                            continue
+                        result.append((i, r, d, s))
+        return result
+
+    # 7. Consecutive Labs: lab_{2j} and lab_{2j+1} form one 2-hour block in the same room
+    # with the same instructor, not spanning a break.
+    pair_second = {}
+    for task_id, task_info in tasks.items():
+        if task_info['type'] != 'lab':
+            continue
+        prefix, index = task_id.rsplit('_', 1)
+        index = int(index)
+        second_id = f'{prefix}_{index + 1}'
+        if index % 2 == 0 and second_id in tasks and 'labContinuity' not in tm.disabled:
+            k1, k2 = tm.task_index[task_id], tm.task_index[second_id]
+            pair_second[k1] = k2
+            tm.task_pair_first[k2] = k1
+            tm.task_pair_start[k1] = 1
+
+    # --- CREATE VARIABLES ---
+    domains = {}
+    for k, task_id in enumerate(tm.task_ids):
+        task_info = tasks[task_id]
+        if tm.task_pair_first[k] >= 0:
+            continue  # second lab hours are laid out together with their first hour below
+        domain = candidates(k, task_id, task_info)
+        if k in pair_second:
+            k2 = pair_second[k]
+            second = set(candidates(k2, tm.task_ids[k2], tasks[tm.task_ids[k2]]))
+            domain = [(i, r, d, s) for (i, r, d, s) in domain
+                      if s + 1 < n_slots and ts_gaps[s] == 0 and (i, r, d, s + 1) in second]
+        domains[k] = domain
+        if not domain and (target_instructors(task_info) or (fixed_assignments and task_id in fixed_assignments)):
+            tm.contradiction = (f"Scheduling Failed: No instructor, room and timeslot satisfy availability, capacity, "
+                                f"equipment and lab rules for the {tm.describe_task(k)}.")
+            log(tm.contradiction)
+            return tm
+
+    # --- PRESOLVE ---
+    forced, removed, tm.contradiction = propagate_domains(tm, domains, ts_gaps)
+    if tm.contradiction:
+        log(tm.contradiction)
+        return tm
+    if forced:
+        log(f"Presolve: {forced} tasks have a single placement; removed {removed} conflicting candidates.")
+    tm.contradiction = bottleneck_check(tm, domains)
+    if tm.contradiction:
+        log(tm.contradiction)
+        return tm
+
+    pair_lits = {}
+    for k, task_id in enumerate(tm.task_ids):
+        k1 = tm.task_pair_first[k]
+        if k1 >= 0:
+            # Second lab hour: same instructor, room and day, one slot later, same literal.
+            for (i, r, d, s), lit in pair_lits[k1]:
+                tm.var_inst.append(i); tm.var_room.append(r); tm.var_day.append(d); tm.var_slot.append(s + 1)
+                tm.var_lit.append(lit)
+        else:
+            lits = []
+            for (i, r, d, s) in domains[k]:
+                name = f'assign_{task_id}_{tm.inst_ids[i]}_{tm.room_ids[r]}_{all_days[d]}_{all_timeslots[s]}' if named else ''
+                lit = model.NewBoolVar(name)
+                tm.var_inst.append(i); tm.var_room.append(r); tm.var_day.append(d); tm.var_slot.append(s)
+                tm.var_lit.append(lit)
+                tm.decision_vars.append(lit)
+                if tm.task_is_lab[k]:
+                    tm.lab_vars.append(lit)
+                lits.append(((i, r, d, s), lit))
+            if k in pair_second:
+                pair_lits[k] = lits
+        tm.task_start.append(len(tm.var_lit))
+    log(f"Model has {len(tm.decision_vars)} assignment variables for {len(tasks)} tasks.")
+
+    # --- PRIORITIZE LAB ALLOCATION ---
+    # Force the solver to branch on lab variables first.
+    if tm.lab_vars:
+         model.AddDecisionStrategy(tm.lab_vars, cp_model.CHOOSE_FIRST, cp_model.SELECT_MIN_VALUE)
+
+    if hint_assignments:
+        for task_id, (inst_id, room_id, day, timeslot) in hint_assignments.items():
+            k = tm.task_index.get(task_id)
+            if k is None or tm.task_pair_first[k] >= 0:
+                continue
+            target = (tm.inst_index.get(inst_id), tm.room_index.get(room_id), tm.day_index.get(day), tm.slot_index.get(timeslot))
+            for e in tm.entries(k):
+                if (tm.var_inst[e], tm.var_room[e], tm.var_day[e], tm.var_slot[e]) == target:
+                    model.AddHint(tm.var_lit[e], 1)
+                    break
+
+    # --- HARD CONSTRAINTS ---
+
+    # 1. Each task must be scheduled exactly once
+    for k in range(len(tm.task_ids)):
+        lits = tm.var_lit[tm.task_start[k]:tm.task_start[k + 1]]
+        if lits:
+            model.AddExactlyOne(lits)
+
+    # Occupancy layer: placement literals per (instructor | room | group, day, slot) cell,
+    # plus the instructor cells where a 2-hour lab block starts. Shared by the constraints
+    # and objectives below through Occupancy.lits()/indicator().
+    tm.inst_occupancy = Occupancy(model, tm.inst_ids, all_days, n_slots, 'busy_inst', named)
+    tm.room_occupancy = Occupancy(model, tm.room_ids, all_days, n_slots, 'busy_room', named)
+    tm.group_occupancy = Occupancy(model, tm.group_ids, all_days, n_slots, 'busy_group', named)
+    tm.lab_start_occupancy = Occupancy(model, tm.inst_ids, all_days, n_slots, 'lab_start', named)
+    for k in range(len(tm.task_ids)):
+        g = tm.task_group[k]
+        is_pair_start = tm.task_pair_start[k]
+        for e in tm.entries(k):
+            i, d, s, lit = tm.var_inst[e], tm.var_day[e], tm.var_slot[e], tm.var_lit[e]
+            tm.inst_occupancy.add(i, d, s, lit)
+            if is_pair_start:
+                tm.lab_start_occupancy.add(i, d, s, lit)
+            tm.room_occupancy.add(tm.var_room[e], d, s, lit)
+            tm.group_occupancy.add(g, d, s, lit)
+
+    # 2. No double booking (instructor, room and student group)
+    for occupancy in (tm.inst_occupancy, tm.room_occupancy, tm.group_occupancy):
+        occupancy.at_most_one()
+
+    # 6. No Repeating Classes per Day for a Student Group (Lectures)
+    # 9. Max One Lab Per Day per Student Group
+    lecture_day = {}
+    lab_course_day = {}
+    lecture_count = {}
+    for k in range(len(tm.task_ids)):
+        gc = (tm.task_group[k], tm.task_course[k])
+        if tm.task_is_lab[k]:
+            if tm.task_pair_first[k] >= 0:
+                continue  # same literals (and day) as the first hour of the block
+            for e in tm.entries(k):
+                lab_course_day.setdefault(gc + (tm.var_day[e],), []).append(tm.var_lit[e])
+        else:
+            lecture_count[gc] = lecture_count.get(gc, 0) + 1
+            for e in tm.entries(k):
+                lecture_day.setdefault(gc + (tm.var_day[e],), []).append(tm.var_lit[e])
+
+    for (g, c, d), lits in lecture_day.items():
+        # Sum of assignments for this course for this group on this day must be <= 1
+        if lecture_count[(g, c)] > 1 and len(lits) > 1 and 'lecturePerDay' not in tm.disabled:
+            model.Add(sum(lits) <= 1)
+
+    lab_courses = {}
+    for g, sg_id in enumerate(tm.group_ids):
+        for c_id in dict.fromkeys(all_student_groups[sg_id].get('enrolledCourses', [])):
+            course = all_courses.get(c_id)
+            if course and _to_int(course.get('labHours', 0)) > 0:
+                lab_courses.setdefault(g, []).append(tm.course_index[c_id])
+    for g, course_list in lab_courses.items():
+        if len(course_list) < 2 or 'oneLabPerDay' in tm.disabled:
+            continue
+        # If group has multiple lab courses, ensure only 1 is scheduled per day
+        for d in range(n_days):
+            course_active_vars = []
+            for c in course_list:
+                course_day_assigns = lab_course_day.get((g, c, d))
+                if course_day_assigns:
+                    is_active = model.NewBoolVar(f'lab_active_{tm.group_ids[g]}_{tm.course_ids[c]}_{all_days[d]}' if named else '')
+                    # Only "lab placed => active" is needed: the sum below keeps is_active down.
+                    for lit in course_day_assigns:
+                        model.AddImplication(lit, is_active)
+                    course_active_vars.append(is_active)
+            if course_active_vars:
+                # At most 1 lab course can be active on this day
+                model.Add(sum(course_active_vars) <= 1)
+
+    # 8. Faculty Break Constraint (Minimum 1 hour break between classes)
+    # Exception: Continuous Lab sessions (which are effectively one long class)
+    if 'facultyBreak' not in tm.disabled:
+        start = time.time()
+        count = add_faculty_break(tm)
+        log(f"Faculty break: {count} constraints in {time.time() - start:.2f}s.")
+
+    # 12. Symmetry Breaking (settings.symmetryBreaking, on by default)
+    # lec_0..lec_n of a group/course have identical domains, as do its 2-hour lab blocks,
+    # so any permutation of a schedule is an equivalent schedule. Requiring them to be placed
+    # in (day, slot) order keeps one representative and saves the solver proving the rest.
+    # Tasks pinned by fixed_assignments keep their numbering from the existing schedule,
+    # so sets containing one are left alone.
+    if settings.get('symmetryBreaking', True):
+        interchangeable, group_classes = symmetry_classes(tm, fixed_assignments)
+
+        def position(k, sign):
+            return [(tm.var_lit[e], sign * (tm.var_day[e] * n_slots + tm.var_slot[e])) for e in tm.entries(k)]
+
+        for ks in interchangeable:
+            for before, after in zip(ks, ks[1:]):
+                _add_linear(model, position(before, 1) + position(after, -1), -n_days * n_slots, -1)
+
+        # Identical groups (parallel sections) can swap whole timetables, so order each class
+        # of them by where the same session (e.g. their first lecture of one course) lands.
+        # Ties are allowed: the sections can sit in parallel.
+        identical = []
+        for sessions in group_classes:
+            anchors = [group_sessions[next(iter(sessions[0]))] for group_sessions in sessions]
+            identical.append(', '.join(tm.group_ids[tm.task_group[k]] for k in anchors))
+            for before, after in zip(anchors, anchors[1:]):
+                _add_linear(model, position(before, 1) + position(after, -1), -n_days * n_slots, 0)
+        if identical:
+            log(f"Identical student groups: {'; '.join(identical)}")
+
+    return tm
+
+
+def add_objectives(tm):
+    """
+    Adds the soft constraints for tm.settings to a model built by build_hard_model.
+    Terms are grouped into tiers so they can be optimised either as one weighted
+    sum or lexicographically (settings.optimizationMode == 'lexicographic').
+    """
+    model, objective_tiers, settings = tm.model, tm.objective_tiers, tm.settings
+    all_days, all_timeslots, all_student_groups = tm.all_days, tm.all_timeslots, tm.all_student_groups
+    n_days, n_slots, ts_parsed, named = tm.n_days, tm.n_slots, tm.ts_parsed, tm.named
+
+    # --- SOFT CONSTRAINTS (OBJECTIVES) ---
+
+    # 11. Disallow 8:30 AM Labs (Soft Constraint / Penalty)
+    # A MASSIVE penalty (1000) on lab hours in the 8:30 AM - 10:30 AM range (510 to 630 minutes),
+    # so it's avoided unless absolutely necessary (strict enforcement caused failures).
+    if settings.get('disallow830Labs', False):
+        forbidden = [ts_parsed[s][0] >= 510 and ts_parsed[s][1] <= 630 for s in range(n_slots)]
+        penalty_weight = 1000 # Very high penalty
+        for k in range(len(tm.task_ids)):
+            if tm.task_is_lab[k]:
+                for e in tm.entries(k):
+                    if forbidden[tm.var_slot[e]]:
+                        objective_tiers['lab830'].append(tm.var_lit[e] * penalty_weight)
+
+    # 6. Minimize Gaps for Students
+    # Idle slots between a group's first and last class of the day, weighted by gapPriority.
+    # Default encoding ('prefix'), on the shared occupancy layer: before[s] >= busy at or before s,
+    # after[s] >= busy at or after s, and gap[s] >= before[s-1] + after[s+1] - busy[s] - 1.
+    # Only lower bounds are needed since the objective pushes all of them down, so at the
+    # optimum gap[s] is 1 exactly for a free slot between two classes.
+    # settings.gapEncoding = 'span' keeps the older min/max slot formulation for comparison.
+    gap_priority = settings.get('gapPriority', 0.0)
+    if gap_priority > 0 and 'gaps' not in tm.disabled:
+        weight = int(gap_priority * 10) # 10 or 20
+
+        def running_or(busy):
+            """Lower bound of "busy here or earlier", folding slots where nothing can be placed."""
+            result = []
+            previous = 0
+            for occupied in busy:
+                if isinstance(occupied, int):
+                    current = previous
+                elif isinstance(previous, int):
+                    current = occupied
+                else:
+                    current = model.NewBoolVar('')
+                    model.Add(current >= previous)
+                    model.Add(current >= occupied)
+                result.append(current)
+                previous = current
+            return result
+
+        for g, sg_id in enumerate(tm.group_ids):
+            for d, day in enumerate(all_days):
+                busy = [tm.group_occupancy.indicator(g, d, s) for s in range(n_slots)]
+                if sum(1 for occupied in busy if not isinstance(occupied, int)) < 2:
+                    continue  # at most one class possible: no gap
+
+                if settings.get('gapEncoding', 'prefix') != 'span':
+                    before = running_or(busy)
+                    after = running_or(busy[::-1])[::-1]
+                    for s in range(1, n_slots - 1):
+                        if isinstance(before[s - 1], int) or isinstance(after[s + 1], int):
+                            continue  # nothing can be placed on one side
+                        gap = model.NewBoolVar(f'gap_{sg_id}_{day}_{s}' if named else '')
+                        model.Add(gap >= before[s - 1] + after[s + 1] - busy[s] - 1)
+                        objective_tiers['gaps'].append(gap * weight)
+                    continue
+
+                slot_active = [model.NewBoolVar(f'active_{sg_id}_{day}_{s}' if named else '') for s in range(n_slots)]
+                for s in range(n_slots):
+                    model.Add(slot_active[s] == busy[s])
+
+                # Calculate span: max_index - min_index
+                has_classes = model.NewBoolVar(f'has_classes_{sg_id}_{day}' if named else '')
+                model.AddMaxEquality(has_classes, slot_active)
+
+                min_slot = model.NewIntVar(0, n_slots, f'min_slot_{sg_id}_{day}' if named else '')
+                max_slot = model.NewIntVar(0, n_slots, f'max_slot_{sg_id}_{day}' if named else '')
+                for s in range(n_slots):
+                    model.Add(min_slot <= s).OnlyEnforceIf(slot_active[s])
+                    model.Add(max_slot >= s).OnlyEnforceIf(slot_active[s])
+
+                total_active = sum(slot_active)
+                span = model.NewIntVar(0, n_slots, f'span_{sg_id}_{day}' if named else '')
+                model.Add(span == max_slot - min_slot + 1).OnlyEnforceIf(has_classes)
+                model.Add(span == 0).OnlyEnforceIf(has_classes.Not())
+
+                gaps = model.NewIntVar(0, n_slots, f'gaps_{sg_id}_{day}' if named else '')
+                model.Add(gaps == span - total_active)
+
+                objective_tiers['gaps'].append(gaps * weight)
+
+    # 7. Fair Instructor Workload
+    if settings.get('fairWorkload', False) and 'fairWorkload' not in tm.disabled:
+        weight = 5
+        instructor_hours = []
+        for i, inst_id in enumerate(tm.inst_ids):
+            hours = model.NewIntVar(0, n_slots * n_days, f'hours_{inst_id}' if named else '')
+            _add_linear(model, [(lit, 1) for lit in tm.inst_occupancy.entity_lits(i)] + [(hours, -1)], 0, 0)
+            instructor_hours.append(hours)
+
+        if instructor_hours:
+            min_h = model.NewIntVar(0, 100, 'min_hours')
+            max_h = model.NewIntVar(0, 100, 'max_hours')
+            model.AddMinEquality(min_h, instructor_hours)
+            model.AddMaxEquality(max_h, instructor_hours)
+
+            diff = model.NewIntVar(0, 100, 'diff_hours')
+            model.Add(diff == max_h - min_h)
+            objective_tiers['workload'].append(diff * weight)
+
+    # 8. Preferred Morning Classes
+    # Penalize PM slots (12 PM is noon, not penalised) for the preferred courses.
+    preferred_courses = {tm.course_index[c] for c in settings.get('preferredMorningCourses', []) if c in tm.course_index}
+    if preferred_courses:
+        weight = 2
+        afternoon = [('PM' in ts and not ts.startswith('12') and 'AM' not in ts) for ts in all_timeslots]
+        for k in range(len(tm.task_ids)):
+            if tm.task_course[k] in preferred_courses:
+                for e in tm.entries(k):
+                    if afternoon[tm.var_slot[e]]:
+                        objective_tiers['preferences'].append(tm.var_lit[e] * weight)
+
+    # 9. Preferred Common Room (Soft Constraint)
+    # If a student group has a preferred room, prioritize it for their lectures.
+    room_pref_weight = 5 # Adjust weight as needed (higher than others to prioritize)
+    preferred_room = []
+    for sg_id in tm.group_ids:
+        preferred_room_id = all_student_groups[sg_id].get('preferredRoomId')
+        preferred_room.append(tm.room_index.get(preferred_room_id, -1) if preferred_room_id else -1)
+    for k in range(len(tm.task_ids)):
+        r_pref = preferred_room[tm.task_group[k]]
+        if r_pref < 0:
+            continue
+        for e in tm.entries(k):
+            if tm.var_room[e] != r_pref:
+                # Penalize
+                objective_tiers['preferences'].append(tm.var_lit[e] * room_pref_weight)
+
+
+def infeasibility_message(data):
+    """Heuristic, user friendly explanation of why no solution was found."""
+    all_instructors, all_courses, all_rooms, all_student_groups, all_days, all_timeslots, settings, ts_parsed, ts_gaps = unpack_payload(data)
+
+    hints = []
+    
+    # 1. Check for "Tight Fit" Groups
+    for sg_id, group in all_student_groups.items():
+        # Re-calculate required
+        enrolled_courses = group.get('enrolledCourses', [])
+        req_hours = 0
+        for c_id in enrolled_courses:
+            course = all_courses.get(c_id)
+            if course:
+                try:
+                    req_hours += int(course.get('lectureHours', 0)) + int(course.get('labHours', 0))
+                except: pass
+        
+        # Re-calculate available
+        avail_slots = 0
+        availability = group.get('availability', {})
+        if availability:
+            for day in all_days:
+                slots = availability.get(day, [])
+                for i in range(min(len(slots), len(all_timeslots))):
+                    if slots[i] == 1:
+                        avail_slots += 1
+        else:
+            avail_slots = len(all_days) * len(all_timeslots)
+        
+        if avail_slots > 0 and (req_hours / avail_slots) >= 0.8: # Lowered to 80%
+             hints.append(f"Student Group '{group.get('id')}' is very busy (Needs {req_hours} slots, Has {avail_slots} available). Any mismatch in lab hours or instructor availability will cause failure. Try freeing up more slots for this group.")
+
+    # 2. Check for Overworked Instructors
+    # This is an estimation, as we don't know exactly which instructor is picked for every course (if multiple qualified).
+    # But we can check if a single instructor is the ONLY option for many courses.
+    inst_load = {}
+    for sg_id, group in all_student_groups.items():
+        for c_id in group.get('enrolledCourses', []):
+            course = all_courses.get(c_id)
+            if not course: continue
+            
+            # Determine probable instructor
+            prob_inst_id = None
+            inst_prefs = group.get('instructorPreferences', {})
+            if c_id in inst_prefs:
+                prob_inst_id = inst_prefs[c_id]
+            else:
+                q_ids = course.get('qualifiedInstructors', [])
+                if len(q_ids) == 1:
+                    prob_inst_id = q_ids[0]
+            
+            if prob_inst_id:
+                try:
+                    hrs = int(course.get('lectureHours', 0)) + int(course.get('labHours', 0))
+                except: hrs = 0
+                inst_load[prob_inst_id] = inst_load.get(prob_inst_id, 0) + hrs
+
+    for inst_id, required_hours in inst_load.items():
+        instructor = all_instructors.get(inst_id)
+        if not instructor: continue
+        
+        # key 'availability'
+        avail_slots = 0
+        availability = instructor.get('availability', {})
+        if availability:
+            for day in all_days:
+                slots = availability.get(day, [])
+                for i in range(min(len(slots), len(all_timeslots))):
+                    if slots[i] == 1:
+                        avail_slots += 1
+        else:
+             avail_slots = len(all_days) * len(all_timeslots)
+        
+        if avail_slots > 0 and required_hours > avail_slots:
+            hints.append(f"Instructor '{instructor['name']}' is overloaded (Assigned {required_hours} hours, Available for {avail_slots} slots).")
+        elif avail_slots > 0 and (required_hours / avail_slots) > 0.8:
+             hints.append(f"Instructor '{instructor['name']}' has very high load (Assigned {required_hours} hours, Available for {avail_slots} slots).")
+
+
+    message = 'No solution found for the given constraints.'
+    if hints:
+        message += " Likely causes: " + " ".join(hints)
+    return message
+
+
+def build_and_solve(data, debug_log, num_workers=None, fixed_assignments=None, hint_assignments=None, time_limit=120.0,
+                    tasks=None):
+    """
+    Builds the CP-SAT model for an already validated payload and solves it.
+    fixed_assignments pins tasks to a single (inst_id, room_id, day, timeslot), so only
+    the remaining tasks are free; hint_assignments only warm-starts them.
+    tasks solves only a subset of the payload's sessions (see build_hard_model).
+    Returns (response_body, http_status).
+    """
+    log = make_logger(debug_log)
+    # Repairs and partial models bring their own placements or tasks, so only plain solves
+    # go through the model cache.
+    cache_key = None
+    if fixed_assignments or hint_assignments or tasks is not None:
+        tm = build_model(data, debug_log, fixed_assignments, hint_assignments, tasks=tasks)
+    else:
+        tm, cache_key = build_model_cached(data, debug_log)
+    if tm.contradiction:
+        return {'status': 'error', 'message': tm.contradiction, 'debug_log': debug_log}, 400
+    model, objective_tiers, settings = tm.model, tm.objective_tiers, tm.settings
+
+    # Minimize total penalty
+    objectives = [term for terms in objective_tiers.values() for term in terms]
+    lexicographic = settings.get('optimizationMode', 'weighted') == 'lexicographic'
+    if objectives and not lexicographic:
+        model.Minimize(sum(objectives))
+
+    # settings.logSearchProgress captures CP-SAT's search log for this request and
+    # returns its parsed summary under diagnostics.searchLog.
+    search_log = SearchLog() if settings.get('logSearchProgress', False) else None
+
+    # settings.alternatives = K keeps up to K good solutions seen during the solve that differ
+    # in at least settings.alternativesMinDistance session placements (default: 5% of them),
+    # returned best first under 'alternatives'. Weighted mode only.
+    pool = None
+    alternatives = _to_int(settings.get('alternatives', 0))
+    if alternatives > 1 and objectives and not lexicographic:
+        min_distance = _to_int(settings.get('alternativesMinDistance', 0)) or max(2, len(tm.task_ids) // 20)
+        pool = SolutionPool(tm, objective_tiers, alternatives, min_distance)
+
+    # --- SOLVE ---
+    objective_stages = None
+    if objectives and lexicographic:
+        priority = settings.get('objectivePriority') or DEFAULT_OBJECTIVE_PRIORITY
+        solver, status, objective_stages = solve_lexicographic(
+            model, objective_tiers, priority, tm.decision_vars, time_limit, num_workers or SOLVER_THREADS, log,
+            search_log=search_log)
+    else:
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_search_workers = num_workers or SOLVER_THREADS
+        if search_log:
+            search_log.attach(solver)
+        if pool:
+            solver.parameters.fill_additional_solutions_in_response = True
+            solver.parameters.solution_pool_size = max(pool.k * 4, 8)
+        status = solver.Solve(model, pool)
+        if pool:
+            pool.harvest(solver.ResponseProto())
+    status_msg = f"Solver Status: {status} (Optimal={cp_model.OPTIMAL}, Feasible={cp_model.FEASIBLE})"
+    print(f"DEBUG: {status_msg}")
+    with open("server_debug.log", "a") as f:
+        f.write(f"{datetime.now()}: {status_msg}\n")
+
+    diagnostics = None
+    if search_log:
+        for msg in search_log.describe():
+            log(msg)
+        diagnostics = {'searchLog': search_log.summary()}
+        # TIMELY_SEARCH_LOG_DIR keeps payload + raw log of every logged solve for replay.
+        dump_dir = os.environ.get('TIMELY_SEARCH_LOG_DIR')
+        if dump_dir:
+            try:
+                diagnostics['dumpFile'] = search_log.dump(dump_dir, data)
+            except OSError as e:
+                log(f"Could not write search log dump: {e}")
+
+    # --- PROCESS RESULTS ---
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        result = {'status': 'success', 'schedule': tm.extract_schedule(solver)}
+        if cache_key:
+            MODEL_CACHE.record_solution(cache_key, tm.decision_vars, solver)
+        if objective_stages is not None:
+            result['objectiveStages'] = objective_stages
+        if pool:
+            result['alternatives'] = pool.alternatives()
+            log(f"Solution pool: kept {len(pool.kept)} of {pool.seen} solutions seen (min distance {pool.min_distance}).")
+    else:
+        result = {'status': 'error', 'message': infeasibility_message(data), 'debug_log': debug_log}
+    if diagnostics:
+        result['diagnostics'] = diagnostics
+    return result, 200 if result['status'] == 'success' else 400
+
+
+def solve_lexicographic(model, objective_tiers, priority, decision_vars, time_limit, num_workers, log, search_log=None):
+    """
+    Optimises the objective tiers one at a time in priority order instead of as one weighted sum.
+    Each stage's optimum is fixed as a constraint and its solution hints the next stage.
+    Unused time from a stage carries over to the later ones.
+    With a search_log, every stage's solver log is captured as a separate run.
+    Returns (solver, status, stages); solver holds the solution of the last completed stage.
+    """
+    order = [name for name in priority if objective_tiers.get(name)]
+    order += [name for name, terms in objective_tiers.items() if terms and name not in order]
+
+    deadline = time.monotonic() + time_limit
+    best_solver = None
+    all_optimal = True
+    stages = []
+    for i, name in enumerate(order):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            all_optimal = False
+            break
+
+        stage_objective = sum(objective_tiers[name])
+        model.Minimize(stage_objective)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = remaining / (len(order) - i)
+        solver.parameters.num_search_workers = num_workers
+        if search_log:
+            search_log.attach(solver, label=name)
+        status = solver.Solve(model)
+
+        if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+            if best_solver is None:
+                # Nothing feasible at all: report the first stage's status as-is.
+                return solver, status, stages
+            log(f"Lexicographic stage '{name}' found no solution in time; keeping the previous stage's schedule.")
+            all_optimal = False
+            break
+
+        value = int(round(solver.ObjectiveValue()))
+        stages.append({'objective': name, 'value': value, 'optimal': status == cp_model.OPTIMAL})
+        log(f"Lexicographic stage '{name}': {value} ({solver.StatusName(status)}, {solver.WallTime():.2f}s)")
+        all_optimal = all_optimal and status == cp_model.OPTIMAL
+        best_solver = solver
+
+        # Lock in this tier and warm-start the next stage from the current schedule.
+        model.Add(stage_objective <= value)
+        model.ClearHints()
+        for var in decision_vars:
+            model.AddHint(var, solver.Value(var))
+
+    return best_solver, cp_model.OPTIMAL if all_optimal else cp_model.FEASIBLE, stages
+
+
+def solve_timetable(data, num_workers=None):
+    """
+    Runs validation, model building and solving for one /generate-timetable payload in this process.
+    Returns (response_body, http_status) so it can run outside a Flask request context.
+    """
+    debug_log = []
+    try:
+        error = validate_timetable(data, debug_log)
+        if error:
+            return error
+        return build_and_solve(data, debug_log, num_workers)
+    except Exception as e:
+        return crash_response(e, debug_log)
@@ -0,0 +1,150 @@
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+from problem_store import COLLECTIONS
+
+# Free-text fields replaced by their hash wherever they occur.
+HASHED_FIELDS = ('name', 'email', 'phone', 'institutionId')
+# Request fields that only make sense on the server that received them.
+DROPPED_FIELDS = ('problemRef',)
+# Short prefixes keep hashed ids readable in replay reports.
+ID_PREFIXES = {'instructors': 'I', 'courses': 'C', 'rooms': 'R', 'student_groups': 'G'}
+
+
+def _digest(salt, value):
+    return hmac.new(salt, str(value).encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+
+def sanitize(data, salt):
+    """
+    Copy of a request payload with ids and names replaced by keyed hashes.
+    Ids of instructors, courses, rooms and groups, and their names, are replaced
+    consistently wherever they appear (references, settings, schedule entries, dict
+    keys), so the payload still solves the same problem. Days, timeslots, room types,
+    numbers and flags are kept.
+    """
+    if not isinstance(data, dict):
+        return data
+    keep = set(data.get('days') or []) | set(data.get('timeslots') or [])
+    replacements = {}
+    for collection in COLLECTIONS:
+        for item in data.get(collection) or []:
+            if isinstance(item, dict) and isinstance(item.get('id'), str) and item['id'] not in keep:
+                replacements[item['id']] = f"{ID_PREFIXES[collection]}-{_digest(salt, item['id'])}"
+    for collection in COLLECTIONS:
+        for item in data.get(collection) or []:
+            if isinstance(item, dict) and isinstance(item.get('name'), str):
+                replacements.setdefault(item['name'], f"name-{_digest(salt, item['name'])}")
+
+    def walk(value, key=None):
+        if isinstance(value, dict):
+            return {replacements.get(k, k): walk(v, k) for k, v in value.items() if k not in DROPPED_FIELDS}
+        if isinstance(value, list):
+            return [walk(v) for v in value]
+        if isinstance(value, str):
+            if value in replacements:
+                return replacements[value]
+            if key in HASHED_FIELDS:
+                return f"{key}-{_digest(salt, value)}"
+        return value
+
+    return walk(data)
+
+
+class TrafficCapture:
+    """
+    Opt-in capture of solve requests for replay (benchmarks/replay.py).
+
+    Each captured request is one JSON line with the sanitised payload, the endpoint,
+    the HTTP status, the result status, the number of scheduled sessions and the
+    seconds the server spent on it (validation plus solve, without queue wait).
+    Lines go to capture-<timestamp>.jsonl files in directory; a file is closed at
+    max_bytes and only the newest max_files are kept.
+    """
+
+    def __init__(self, directory=None, sample_rate=1.0, max_bytes=50 * 1024 * 1024, max_files=20, salt=None):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max(1, max_files)
+        # Without a configured salt, hashes are stable for the life of the process only.
+        self.salt = (salt or secrets.token_hex(16)).encode('utf-8')
+        self._lock = threading.Lock()
+        self._path = None
+        self._files = 0
+
+    @classmethod
+    def from_env(cls):
+        """Enabled by TIMELY_CAPTURE_DIR; see __init__ for the other TIMELY_CAPTURE_* settings."""
+        return cls(
+            directory=os.environ.get('TIMELY_CAPTURE_DIR') or None,
+            sample_rate=float(os.environ.get('TIMELY_CAPTURE_SAMPLE', 1.0)),
+            max_bytes=int(float(os.environ.get('TIMELY_CAPTURE_MAX_MB', 50)) * 1024 * 1024),
+            max_files=int(os.environ.get('TIMELY_CAPTURE_MAX_FILES', 20)),
+            salt=os.environ.get('TIMELY_CAPTURE_SALT') or None,
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.sample_rate > 0
+
+    def sampled(self):
+        """Whether to capture the current request."""
+        return self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def record(self, endpoint, data, status_code, seconds, body=None):
+        """Appends one request to the archive. Capture failures never fail the request."""
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'endpoint': endpoint,
+            'status': status_code,
+            'resultStatus': body.get('status') if isinstance(body, dict) else None,
+            'sessions': len(body['schedule']) if isinstance(body, dict) and isinstance(body.get('schedule'), list) else None,
+            'seconds': round(seconds, 3),
+        }
+        try:
+            entry['payload'] = sanitize(data, self.salt)
+            line = json.dumps(entry, separators=(',', ':')) + '\n'
+            with self._lock:
+                with open(self._current_file(), 'a') as f:
+                    f.write(line)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"DEBUG: Traffic capture failed: {e}")
+
+    def wrap(self, endpoint, data, fn, elapsed=0.0):
+        """
+        fn wrapped to record its (body, status) result, for solves that run on the
+        scheduler. elapsed is the time already spent on the request (validation).
+        """
+        def captured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                body, status_code = fn(*args, **kwargs)
+            except Exception:
+                self.record(endpoint, data, 500, elapsed + time.perf_counter() - start)
+                raise
+            self.record(endpoint, data, status_code, elapsed + time.perf_counter() - start, body)
+            return body, status_code
+        return captured
+
+    def _current_file(self):
+        if self._path is None or not os.path.exists(self._path) or os.path.getsize(self._path) >= self.max_bytes:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+            self._files += 1
+            self._path = os.path.join(self.directory, f"capture-{stamp}-{os.getpid()}-{self._files}.jsonl")
+            archive = sorted(name for name in os.listdir(self.directory)
+                             if name.startswith('capture-') and name.endswith('.jsonl'))
+            for name in archive[:max(0, len(archive) - self.max_files + 1)]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        return self._path